@@ -0,0 +1,509 @@
+"""
+Year-end salary statements: one PDF per employee covering every month sheet
+of a year ("January 2025" ... "December 2025").
+
+All twelve sheets are read in one batched request and kept in a local cache
+(cache_dir in config.json, default "cache"), so a second run for the same
+year does not read Google again while the spreadsheet is unchanged (or
+unless --refresh is given). Amounts are
+totalled column by column for each month, then each employee's months are
+drawn as a table on the letter head with the same stamps as the monthly slip.
+
+Usage:
+    python annual_statement.py --year 2025
+    python annual_statement.py --year 2025 --workers 4 --output-dir pdfs/annual_2025
+    python annual_statement.py --year 2025 --employees 35202-1234567-1 --refresh
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from google_sheets_reader import GoogleSheetsReader
+from pdf_generator import (PDFGenerator, EARNINGS_FIELDS, DEDUCTION_FIELDS, NET_SALARY_FIELDS,
+                           AMOUNT_PAID_FIELDS, PAGE_WIDTH, PAGE_HEIGHT, TEAL_PRIMARY,
+                           WHITE, BLACK, SOLID_BLACK, LIGHT_GRAY, DARK_TEAL)
+from record_fields import get_email, get_name, get_cnic, get_designation
+from record_validator import parse_amount, record_headers, resolve_columns, column_values
+from employee_table import EmployeeTable, normalize_cnic, normalize_email
+from employee_search import normalize_text
+from sheet_cache import SheetCache
+from payroll_cli import MONTHS, parse_month, parse_date, with_generation_date
+import instrumentation
+
+# The deduction shown in its own "Tax" column; other deductions are summed
+TAX_LABEL = 'Tax Deduction'
+
+# Per-month amounts kept for each employee
+AMOUNT_KEYS = ['earnings', 'tax', 'other_deductions', 'net']
+
+SUMMARY_FIELDS = ['name', 'cnic', 'email', 'designation', 'months'] + AMOUNT_KEYS
+
+
+def employee_key(record):
+    """A record's own identity: by CNIC, else email, else name"""
+    cnic = normalize_cnic(get_cnic(record))
+    if cnic:
+        return cnic
+    email = normalize_email(get_email(record))
+    if email:
+        return f"email:{email}"
+    return f"name:{normalize_text(get_name(record))}"
+
+
+def employee_keys(months):
+    """
+    Statement key of every record, so one employee gets one statement
+
+    A month where the CNIC (or email) cell was left blank is attached to the
+    statement its email or name already belongs to in other months. Only an
+    email or name that points to exactly one employee is followed; two
+    employees sharing a name stay apart. A name is not followed when the
+    record has an email the other statement does not: that record is kept
+    as its own statement and reported as ambiguous.
+
+    Args:
+        months: List of (month name, records)
+
+    Returns:
+        List with one list of keys per month, in record order
+    """
+    records = [record for _, month_records in months for record in month_records]
+    record_months = [month_name for month_name, month_records in months for _ in month_records]
+    own_keys = [employee_key(record) for record in records]
+
+    def owners(fallback):
+        """For each email (or name), the set of stronger keys it appears with, and each key's emails"""
+        found = {}
+        emails = {}
+        for record, key in zip(records, own_keys):
+            if not key.startswith(fallback):
+                email = normalize_email(get_email(record))
+                found.setdefault(email, set()).add(key)
+                found.setdefault(f"name:{normalize_text(get_name(record))}", set()).add(key)
+                if email:
+                    emails.setdefault(key, set()).add(email)
+        return found, emails
+
+    # CNIC-less records join a CNIC by email or name, then name-only records
+    # join an email-keyed statement by name
+    for fallback in ('email:', 'name:'):
+        found, emails = owners(fallback)
+        for index, (record, key) in enumerate(zip(records, own_keys)):
+            if not key.startswith(fallback):
+                continue
+            email = normalize_email(get_email(record))
+            by_email = found.get(email, set()) if email else set()
+            if len(by_email) == 1:
+                own_keys[index] = next(iter(by_email))
+                continue
+
+            by_name = found.get(f"name:{normalize_text(get_name(record))}", set())
+            if len(by_name) != 1:
+                continue
+            match = next(iter(by_name))
+            if email and (by_email or emails.get(match)):
+                # Same name, but the email belongs to someone else (or the
+                # named employee uses another one): may be a different person
+                print(f"  Warning: {get_name(record)} <{email}> in {record_months[index]} has no CNIC "
+                      f"and does not match the email of the employee with that name; "
+                      f"kept as a separate statement")
+                continue
+            own_keys[index] = match
+
+    keys = []
+    start = 0
+    for _, month_records in months:
+        keys.append(own_keys[start:start + len(month_records)])
+        start += len(month_records)
+    return keys
+
+
+def _month_amounts(records):
+    """
+    Earnings, tax, other deductions and net pay of every record in one month
+
+    Columns are matched once and read top to bottom; like the slip, only
+    positive amounts count, and Amount Paid replaces Net Salary when given.
+    """
+    headers = record_headers(records)
+    count = len(records)
+    totals = {key: [0.0] * count for key in AMOUNT_KEYS}
+
+    fields = ([(names, 'earnings') for names, _ in EARNINGS_FIELDS] +
+              [(names, 'tax' if label == TAX_LABEL else 'other_deductions') for names, label in DEDUCTION_FIELDS])
+    for field_names, key in fields:
+        columns = resolve_columns(headers, field_names)
+        if not columns:
+            continue
+        column = totals[key]
+        for index, value in enumerate(column_values(records, columns)):
+            amount, _ = parse_amount(value)
+            if amount and amount > 0:
+                column[index] += amount
+
+    net_columns = resolve_columns(headers, NET_SALARY_FIELDS)
+    paid_columns = resolve_columns(headers, AMOUNT_PAID_FIELDS)
+    net_values = column_values(records, net_columns) if net_columns else [None] * count
+    paid_values = column_values(records, paid_columns) if paid_columns else [None] * count
+    for index in range(count):
+        paid, _ = parse_amount(paid_values[index])
+        net, _ = parse_amount(net_values[index])
+        if paid and paid > 0:
+            totals['net'][index] = paid
+        elif net is not None:
+            totals['net'][index] = net
+        else:
+            # No net on the sheet: what the table adds up to
+            totals['net'][index] = (totals['earnings'][index] - totals['tax'][index]
+                                    - totals['other_deductions'][index])
+
+    return [{key: totals[key][index] for key in AMOUNT_KEYS} for index in range(count)]
+
+
+def build_statements(months):
+    """
+    Combine month records into one statement per employee
+
+    Args:
+        months: List of (month name, records) in date order
+
+    Returns:
+        List of statement dicts (name, cnic, email, designation, months,
+        totals), sorted by name. Details come from the latest month that
+        has them; two rows for one employee in the same month are added
+        together.
+    """
+    statements = {}
+    for (month_name, records), keys in zip(months, employee_keys(months)):
+        for record, key, amounts in zip(records, keys, _month_amounts(records)):
+            statement = statements.get(key)
+            if statement is None:
+                statement = statements[key] = {'key': key, 'months': {},
+                                               'name': 'Unknown', 'cnic': '', 'email': '', 'designation': ''}
+            # A blank cell in a later month keeps the value from an earlier one
+            for field, value in (('name', get_name(record)), ('cnic', get_cnic(record)),
+                                 ('email', get_email(record)), ('designation', get_designation(record))):
+                if value and value != 'Unknown':
+                    statement[field] = value
+            month = statement['months'].get(month_name)
+            if month is None:
+                statement['months'][month_name] = dict(amounts, month=month_name)
+            else:
+                for amount_key in AMOUNT_KEYS:
+                    month[amount_key] += amounts[amount_key]
+
+    result = []
+    for statement in statements.values():
+        statement['months'] = [statement['months'][month_name]
+                               for month_name, _ in months if month_name in statement['months']]
+        statement['totals'] = {key: sum(month[key] for month in statement['months']) for key in AMOUNT_KEYS}
+        result.append(statement)
+    result.sort(key=lambda statement: normalize_text(statement['name']))
+    return result
+
+
+def select_statements(statements, employees):
+    """Statements of the given employees (CNIC, email or name), using EmployeeTable lookups"""
+    table = EmployeeTable([{'Name': statement['name'], 'CNIC': statement['cnic'],
+                            'email address': statement['email']} for statement in statements])
+    return [statements[table.position_of(record)] for record in table.select(employees)]
+
+
+class AnnualStatementGenerator(PDFGenerator):
+    """Draws annual statements with the monthly slip's letter head, colors and stamps"""
+
+    def get_statement_filename(self, statement, year):
+        return self.get_pdf_filename({'Name': statement['name'], 'CNIC': statement['cnic']},
+                                     f"Annual Statement {year}")
+
+    def create_statement_pdf(self, statement, year, output_dir="pdfs"):
+        """Create one employee's annual statement on the letter head"""
+        pdf_path = os.path.join(output_dir, self.get_statement_filename(statement, year))
+
+        with BytesIO() as content_buffer:
+            with instrumentation.span('pdf.content'):
+                self._create_statement_content(content_buffer, statement, year)
+            content_buffer.seek(0)
+            self._merge_with_letterhead(content_buffer, pdf_path)
+
+        self.last_pdf_size = os.path.getsize(pdf_path)
+        instrumentation.count('pdf.statements')
+        instrumentation.count('pdf.bytes_written', self.last_pdf_size)
+        return pdf_path
+
+    def _create_statement_content(self, buffer, statement, year):
+        c = canvas.Canvas(buffer, pagesize=A4)
+
+        # Same starting point as the monthly slip
+        y_pos = PAGE_HEIGHT - 190
+
+        c.setFont('Helvetica-Bold', 18)
+        c.setFillColor(SOLID_BLACK)
+        c.drawString(50, y_pos, "ANNUAL STATEMENT")
+
+        label_x = PAGE_WIDTH - 280
+        value_x = PAGE_WIDTH - 175
+        for label, value in (("Employee Name:", statement['name'] or '___________________'),
+                             ("Designation:", statement['designation'] or '___________________'),
+                             ("CNIC:", statement['cnic'] or '-'),
+                             ("Year:", str(year))):
+            c.setFont('Helvetica-Bold', 10)
+            c.setFillColor(SOLID_BLACK)
+            c.drawString(label_x, y_pos, label)
+            c.setFont('Helvetica', 10)
+            c.drawString(value_x, y_pos, str(value))
+            y_pos -= 20
+
+        y_pos -= 15
+        y_pos, table_x, table_width = self._draw_months_table(c, statement, y_pos)
+        y_pos = self._draw_total_net(c, statement, year, y_pos)
+
+        with instrumentation.span('pdf.stamp'):
+            self._draw_stamp(c, table_x, table_width, y_pos)
+            self._draw_company_stamp_section(c)
+
+        c.setFont('Helvetica', 8)
+        c.setFillColor(BLACK)
+        c.drawString(50, 87, f"Generated on: {self.generation_date().strftime('%B %d, %Y')}")
+
+        c.save()
+
+    def _draw_months_table(self, c, statement, y_start):
+        """Month by month amounts with a totals row"""
+        table_x = 50
+        table_width = PAGE_WIDTH - 100
+        row_height = 20
+        header_height = 25
+        month_width = table_width * 0.24
+        amount_width = (table_width - month_width) / 4
+        headers = ["Earnings", "Tax", "Other Deductions", "Net Salary"]
+
+        def amount_right(column):
+            return table_x + month_width + amount_width * (column + 1) - 10
+
+        y = y_start
+        c.setFillColor(TEAL_PRIMARY)
+        c.rect(table_x, y - header_height, table_width, header_height, fill=1, stroke=0)
+        c.setFillColor(WHITE)
+        c.setFont('Helvetica-Bold', 10)
+        c.drawString(table_x + 10, y - 17, "Month")
+        for column, header in enumerate(headers):
+            c.drawRightString(amount_right(column), y - 17, header)
+        y -= header_height
+
+        for i, month in enumerate(statement['months']):
+            c.setFillColor(LIGHT_GRAY if i % 2 == 0 else WHITE)
+            c.rect(table_x, y - row_height, table_width, row_height, fill=1, stroke=0)
+            c.setFillColor(SOLID_BLACK)
+            c.setFont('Helvetica', 9)
+            c.drawString(table_x + 10, y - 14, month['month'])
+            for column, key in enumerate(AMOUNT_KEYS):
+                c.drawRightString(amount_right(column), y - 14, self._format_amount(month[key]))
+            y -= row_height
+
+        c.setFillColor(colors.HexColor('#E0E0E0'))
+        c.rect(table_x, y - row_height, table_width, row_height, fill=1, stroke=0)
+        c.setFillColor(SOLID_BLACK)
+        c.setFont('Helvetica-Bold', 9)
+        c.drawString(table_x + 10, y - 14, "Total")
+        for column, key in enumerate(AMOUNT_KEYS):
+            c.drawRightString(amount_right(column), y - 14, self._format_amount(statement['totals'][key]))
+        y -= row_height
+
+        c.setStrokeColor(DARK_TEAL)
+        c.setLineWidth(1)
+        c.rect(table_x, y, table_width, y_start - y, fill=0, stroke=1)
+
+        return y - 15, table_x, table_width
+
+    def _draw_total_net(self, c, statement, year, y_pos):
+        box_x = 50
+        box_width = PAGE_WIDTH - 100
+        box_height = 30
+
+        c.setFillColor(TEAL_PRIMARY)
+        c.rect(box_x, y_pos - box_height, box_width, box_height, fill=1, stroke=0)
+        c.setFillColor(WHITE)
+        c.setFont('Helvetica-Bold', 12)
+        c.drawString(box_x + 15, y_pos - 20, f"TOTAL NET SALARY {year}")
+        c.drawRightString(box_x + box_width - 15, y_pos - 20, self._format_amount(statement['totals']['net']))
+
+        return y_pos - box_height - 15
+
+
+# Statement generator of a pool worker process
+_worker_generator = None
+
+
+def _init_worker(config_file, company_info):
+    # Drop spans inherited from the parent so each statement ships only its own
+    instrumentation.take()
+    instrumentation.collect()
+    _load_generator(config_file, company_info)
+
+
+def _load_generator(config_file, company_info):
+    global _worker_generator
+    _worker_generator = AnnualStatementGenerator(config_file)
+    _worker_generator.set_company_info(company_info.get('company_name', ''), company_info.get('app_name', ''))
+
+
+def _render_statement(job):
+    statement, year, output_dir = job
+    try:
+        _worker_generator.create_statement_pdf(statement, year, output_dir)
+        return _worker_generator.last_pdf_size, None, instrumentation.take()
+    except Exception as e:
+        return 0, f"{statement['name']}: {str(e)}", instrumentation.take()
+
+
+def generate_statements(statements, year, company_info, config_file="config.json",
+                        output_dir="pdfs", workers=1):
+    """
+    Render every statement, across worker processes when workers > 1
+
+    Returns:
+        Dict with rendered, failed, bytes_written and errors
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [(statement, year, output_dir) for statement in statements]
+
+    if workers <= 1:
+        _load_generator(config_file, company_info)
+        jobs_map = map
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(config_file, company_info))
+        chunksize = max(1, len(jobs) // (workers * 4))
+        jobs_map = lambda func, items: pool.map(func, items, chunksize=chunksize)
+
+    results = []
+    try:
+        for size, error, (spans, counters) in jobs_map(_render_statement, jobs):
+            instrumentation.merge(spans, counters)
+            results.append((size, error))
+    finally:
+        if workers > 1:
+            pool.shutdown()
+
+    errors = [error for _, error in results if error]
+    return {
+        'rendered': len(results) - len(errors),
+        'failed': len(errors),
+        'bytes_written': sum(size for size, _ in results),
+        'errors': errors
+    }
+
+
+def write_statement_summary(statements, year, output_dir):
+    """Annual totals of every employee as CSV, for checking against the ledger"""
+    path = os.path.join(output_dir, f"annual_{year}_summary.csv")
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        for statement in statements:
+            row = {key: statement[key] for key in ('name', 'cnic', 'email', 'designation')}
+            row['months'] = len(statement['months'])
+            row.update({key: round(statement['totals'][key], 2) for key in AMOUNT_KEYS})
+            writer.writerow(row)
+    return path
+
+
+def run_annual_statements(year, config_file="config.json", output_dir=None, workers=1,
+                          employees=None, refresh=False, through_month=None):
+    """
+    Read the year's month sheets (cached), build and render the statements
+
+    Args:
+        employees: CNICs, email addresses or names; None for everyone
+        refresh: Read every month from Google even if it is cached
+        through_month: Last month to include (e.g. "June"); default December
+
+    Returns:
+        Summary dict for the run
+    """
+    start = time.perf_counter()
+    output_dir = output_dir or os.path.join('pdfs', f"annual_{year}")
+    last = MONTHS.index(through_month) + 1 if through_month else len(MONTHS)
+    month_names = [f"{month} {year}" for month in MONTHS[:last]]
+
+    run = instrumentation.begin_run(f"annual {year}")
+    try:
+        print(f"Reading {len(month_names)} month sheets for {year}...")
+        reader = GoogleSheetsReader(config_file)
+        cache = SheetCache(reader.config.get('cache_dir', 'cache'), reader.config['spreadsheet_id'])
+        months = reader.get_months_data(month_names, cache=cache, refresh=refresh)
+        if not months:
+            raise Exception(f"No month sheets found for {year}")
+        print(f"  Found {', '.join(months)}")
+        if reader.cached_months:
+            print("  From cache (spreadsheet unchanged since): " + ", ".join(
+                f"{month_name} (read {fetched_at})" for month_name, fetched_at in reader.cached_months.items()))
+
+        statements = build_statements(list(months.items()))
+        if employees:
+            statements = select_statements(statements, employees)
+        print(f"  {len(statements)} employees")
+
+        print(f"Rendering statements with {workers} worker(s)...")
+        result = generate_statements(statements, year, reader.get_company_info(), config_file,
+                                     output_dir, workers)
+        for error in result['errors']:
+            print(f"  Error generating {error}")
+        summary_path = write_statement_summary(statements, year, output_dir)
+        print(f"  {result['rendered']} rendered, {result['failed']} failed, "
+              f"{result['bytes_written'] / 1024:.0f} KB written to {output_dir}/ (totals: {summary_path})")
+    finally:
+        run.finish()
+
+    print(run.format_summary())
+    return {
+        'year': year,
+        'months': list(months),
+        'employees': len(statements),
+        'rendered': result['rendered'],
+        'failed': result['failed'],
+        'bytes_written': result['bytes_written'],
+        'summary_csv': summary_path,
+        'elapsed_s': round(time.perf_counter() - start, 3),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate year-end salary statements")
+    parser.add_argument('--year', required=True, type=int)
+    parser.add_argument('--config', default='config.json', help="Path to config.json")
+    parser.add_argument('--output-dir', help="Where statements are written (default pdfs/annual_<year>)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Processes rendering statements")
+    parser.add_argument('--employees', nargs='+', metavar='ID',
+                        help="Only these employees (CNIC, email or name)")
+    parser.add_argument('--through', type=parse_month, help="Last month to include, e.g. June (default December)")
+    parser.add_argument('--refresh', action='store_true', help="Read every month from Google again, ignoring the cache")
+    parser.add_argument('--generated-on', type=parse_date, metavar='YYYY-MM-DD',
+                        help="Date printed on the statements (default: generated_on in config.json, else today)")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = run_annual_statements(args.year,
+                                        config_file=with_generation_date(args.config, args.generated_on), output_dir=args.output_dir,
+                                        workers=max(1, args.workers), employees=args.employees,
+                                        refresh=args.refresh, through_month=args.through)
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 2
+
+    print(f"Done in {summary['elapsed_s']:.1f}s")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+"""
+Prepared slip assets kept on disk, so a new app launch or pool worker loads
+them instead of building them again.
+
+Recoloring, rotating and encoding the stamps takes seconds, and embedding
+them in a PDF page costs more than drawing the rest of the slip. Each
+prepared asset is stored once under a key made from the SHA-256 of its
+source files, its processing parameters and ASSET_VERSION, so replacing a
+stamp or the letter head, or changing stamp_dpi, simply misses the cache.
+
+Every entry is <key>.bin (the asset) and <key>.json (what it was built
+from, plus values such as an image's aspect ratio). The folder can be
+deleted at any time; it is rebuilt on the next run.
+"""
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime
+
+# Bump when the way assets are prepared changes, so old entries are not used
+ASSET_VERSION = 1
+
+# (path, size, mtime) -> SHA-256, so a file is hashed once per process
+_file_hashes = {}
+
+
+def file_hash(path):
+    """SHA-256 of a file's contents"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _file_hashes:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        _file_hashes[key] = digest.hexdigest()
+    return _file_hashes[key]
+
+
+class AssetCache:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def key(self, kind, files=(), **params):
+        """Cache key of an asset built from files with the given parameters"""
+        description = {
+            'kind': kind,
+            'version': ASSET_VERSION,
+            'files': [file_hash(path) for path in files],
+            'params': params,
+        }
+        encoded = json.dumps(description, sort_keys=True, default=repr).encode('utf-8')
+        return f"{kind}_{hashlib.sha256(encoded).hexdigest()[:32]}"
+
+    def get(self, key):
+        """(data, meta) of a cached asset, or None if it has not been built"""
+        try:
+            with open(os.path.join(self.directory, f"{key}.json"), 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            with open(os.path.join(self.directory, f"{key}.bin"), 'rb') as f:
+                data = f.read()
+        except (OSError, ValueError):
+            return None
+        if len(data) != meta.get('size'):
+            return None
+        return data, meta
+
+    def put(self, key, data, **meta):
+        """
+        Store an asset; the .json file is written last, so a half-written
+        entry is never read back
+        """
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._write(f"{key}.bin", data)
+            meta = dict(meta, size=len(data), created=datetime.now().isoformat(timespec='seconds'))
+            self._write(f"{key}.json", json.dumps(meta, indent=2).encode('utf-8'))
+        except OSError as e:
+            # The asset is still used from memory; only the next launch pays again
+            print(f"Could not cache {key}: {str(e)}")
+
+    def _write(self, name, data):
+        fd, tmp_path = tempfile.mkstemp(prefix='.asset_', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, os.path.join(self.directory, name))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
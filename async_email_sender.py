@@ -0,0 +1,143 @@
+import asyncio
+import time
+import aiosmtplib
+from email_sender import EmailSender, EmailSendError
+from smtp_throttle import SendQuotaExceeded, SendCancelled
+
+
+class AsyncEmailSender(EmailSender):
+    """
+    Email sender that keeps many SMTP conversations in flight on one thread.
+
+    Uses the same config.json settings as EmailSender. The number of
+    simultaneous connections comes from 'async_concurrency' (default 10).
+    """
+
+    def __init__(self, config_file="config.json", concurrency=None):
+        super().__init__(config_file)
+        self.concurrency = concurrency
+
+    def get_concurrency(self):
+        """Get the number of SMTP conversations allowed at once"""
+        self._ensure_configured()
+        concurrency = self.concurrency or self.config.get('async_concurrency', 10)
+        return max(1, int(concurrency))
+
+    async def send_email_async(self, to_email, subject, body, pdf_path=None, stats=None):
+        """
+        Send an email with optional PDF attachment without blocking the loop
+
+        Accepts the same stats dict as EmailSender.send_email.
+
+        Returns:
+            True if successful
+        """
+        self._ensure_configured()
+
+        msg = self._build_message(to_email, subject, body, pdf_path)
+        self._start_stats(stats, pdf_path)
+
+        client = aiosmtplib.SMTP(
+            hostname=self.smtp_server,
+            port=self.smtp_port,
+            start_tls=self.smtp_starttls,
+            timeout=self.smtp_timeout
+        )
+
+        start = mark = time.perf_counter()
+        try:
+            # connect() includes STARTTLS, matching the sync sender's connect phase
+            await client.connect()
+            mark = self._record_phase(stats, 'connect', mark)
+
+            await client.login(self.sender_email, self.sender_password)
+            mark = self._record_phase(stats, 'auth', mark)
+
+            await client.send_message(msg)
+            self._record_phase(stats, 'transmit', mark)
+
+            await client.quit()
+            self._finish_stats(stats, start)
+            return True
+
+        except Exception as e:
+            client.close()
+            self._finish_stats(stats, start, e)
+            raise EmailSendError(f"Failed to send email: {str(e)}", original=e)
+
+    def send_batch(self, messages, throttle=None, progress_callback=None, should_stop=None):
+        """
+        Send a batch of emails and wait for all of them to finish
+
+        Runs its own event loop, so it can be called from any worker thread
+        (including the GUI's) but not from inside a running loop.
+
+        Args:
+            messages: List of dicts with send_email_async keyword arguments
+            throttle: Optional AdaptiveSendThrottle for pacing and retries
+            progress_callback: Optional callable(done, total, message)
+            should_stop: Optional callable; once it returns True no new
+                messages are started and the rest are marked 'not_sent'
+
+        Returns:
+            List of result dicts (to_email, status, error, stats) in input
+            order. status is 'sent', 'failed' or 'not_sent' (quota reached
+            or stopped)
+            and stats holds the send_email_async timings plus 'attempts',
+            the number of times the message was tried.
+        """
+        return asyncio.run(self._send_batch(messages, throttle, progress_callback, should_stop))
+
+    async def _send_batch(self, messages, throttle, progress_callback, should_stop):
+        semaphore = asyncio.Semaphore(self.get_concurrency())
+        quota_reached = asyncio.Event()
+        results = [None] * len(messages)
+        total = len(messages)
+        done = 0
+
+        async def deliver(index, message):
+            nonlocal done
+            stats = {}
+            result = {'to_email': message['to_email'], 'status': 'sent', 'error': None, 'stats': stats}
+            attempts = 0
+
+            async def send_once(**kwargs):
+                nonlocal attempts
+                # Runs holding a connection slot; checked here so messages
+                # still waiting for one see a quota error or a stop
+                if quota_reached.is_set():
+                    raise SendQuotaExceeded("Sending quota reached")
+                if should_stop and should_stop():
+                    raise SendCancelled("Cancelled")
+                attempts += 1
+                return await self.send_email_async(**kwargs)
+
+            try:
+                if throttle:
+                    # The throttle books each send slot inside the semaphore and
+                    # sleeps its retry pauses outside it
+                    await throttle.send_async(send_once, limiter=semaphore, stats=stats, **message)
+                else:
+                    async with semaphore:
+                        await send_once(stats=stats, **message)
+            except SendQuotaExceeded as e:
+                # Let the in-flight messages finish but start no new ones
+                quota_reached.set()
+                result['status'] = 'not_sent'
+                result['error'] = str(e)
+            except SendCancelled as e:
+                result['status'] = 'not_sent'
+                result['error'] = str(e)
+            except Exception as e:
+                result['status'] = 'failed'
+                result['error'] = str(e)
+            # send_email_async clears stats on every attempt, so this goes in last
+            stats['attempts'] = attempts
+
+            results[index] = result
+            done += 1
+            if progress_callback:
+                progress_callback(done, total, message)
+
+        await asyncio.gather(*(deliver(i, m) for i, m in enumerate(messages)))
+        return results
@@ -0,0 +1,293 @@
+"""
+Multi-company payroll batch: one payroll run per company, side by side.
+
+A batch file lists the companies, each with its own sheet, letter head,
+stamp and sender. Settings a company does not give come from its own
+config file ("config"), then from the batch's base config:
+
+    {
+      "base_config": "config.json",
+      "output_dir": "pdfs",
+      "companies": [
+        {"name": "Tech Emulsion", "spreadsheet_id": "...",
+         "letter_head_path": "letter_head/te.pdf", "stamp_path": "stamp/te.png",
+         "sender_email": "payroll@techemulsion.com", "sender_password": "..."},
+        {"name": "Other Company", "config": "other_config.json"}
+      ]
+    }
+
+Each company runs run_payroll in its own process and writes its slips and
+console output (run.log) to <output_dir>/<company>/, its reports to
+<report_dir>/<company>/. A company that fails (wrong sheet, bad password)
+does not stop the others.
+
+Usage:
+    python batch_runner.py --batch companies.json --month January --year 2025
+    python batch_runner.py --batch companies.json --month January --year 2025 --processes 2 --dry-run
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import redirect_stdout, redirect_stderr
+from datetime import datetime
+
+from payroll_cli import run_payroll, parse_month
+
+# Counts added up across companies for the batch totals
+TOTAL_KEYS = ['records', 'invalid', 'rendered', 'render_failed', 'bytes_written',
+              'sent', 'failed', 'skipped', 'not_sent']
+
+# Keys of a batch entry that describe the company rather than config settings
+ENTRY_KEYS = ['name', 'config', 'output_dir']
+
+
+def company_slug(name):
+    """Folder-safe version of a company name"""
+    slug = ''.join(ch if ch.isalnum() else '_' for ch in name.strip()).strip('_')
+    return slug or 'company'
+
+
+def _read_json(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _company_config(entry, base, slug):
+    """Base settings, then the company's config file, then its own keys"""
+    config = dict(base)
+    if entry.get('config'):
+        config.update(_read_json(entry['config']))
+    own = {key: value for key, value in entry.items() if key not in ENTRY_KEYS}
+    config.update(own)
+
+    # Keep companies from overwriting each other's reports, metrics and archives
+    if 'report_dir' not in own:
+        config['report_dir'] = os.path.join(config.get('report_dir', 'reports'), slug)
+    if config.get('archive_dir') and 'archive_dir' not in own:
+        config['archive_dir'] = os.path.join(config['archive_dir'], slug)
+    if config.get('metrics_path') and 'metrics_path' not in own:
+        stem, ext = os.path.splitext(config['metrics_path'])
+        config['metrics_path'] = f"{stem}_{slug}{ext}"
+    config['metrics_labels'] = dict(config.get('metrics_labels') or {}, company=entry['name'])
+    return config
+
+
+def load_batch(batch_file):
+    """
+    Read a batch file into one job description per company
+
+    Returns:
+        List of dicts with name, slug, output_dir and config (a settings dict),
+        or error instead of config when the company's settings could not be read
+    """
+    batch = _read_json(batch_file)
+    entries = batch.get('companies') or []
+    if not entries:
+        raise ValueError(f"No companies listed in '{batch_file}'")
+
+    base = _read_json(batch['base_config']) if batch.get('base_config') else {}
+    output_root = batch.get('output_dir', 'pdfs')
+
+    companies = []
+    seen = set()
+    for entry in entries:
+        name = str(entry.get('name', '')).strip()
+        if not name:
+            raise ValueError(f"Every company in '{batch_file}' needs a name")
+        slug = company_slug(name)
+        if slug in seen:
+            raise ValueError(f"Two companies in '{batch_file}' share the folder name '{slug}'")
+        seen.add(slug)
+
+        company = {
+            'name': name,
+            'slug': slug,
+            'output_dir': entry.get('output_dir') or os.path.join(output_root, slug),
+        }
+        try:
+            company['config'] = _company_config(entry, base, slug)
+        except (OSError, ValueError) as e:
+            company['error'] = f"Could not read config: {str(e)}"
+        companies.append(company)
+    return companies
+
+
+def _run_company(job):
+    """Run one company's payroll in this process, logging to <output_dir>/run.log"""
+    company, month, year, workers, dry_run, generate, send = job
+    os.makedirs(company['output_dir'], exist_ok=True)
+    log_path = os.path.join(company['output_dir'], 'run.log')
+    result = {'company': company['name'], 'output_dir': company['output_dir'], 'log': log_path}
+
+    with open(log_path, 'w', encoding='utf-8') as log, redirect_stdout(log), redirect_stderr(log):
+        print(f"Payroll for {company['name']}, {month} {year}")
+        try:
+            summary = run_payroll(month, year, config_file=company['config'],
+                                  output_dir=company['output_dir'], workers=workers,
+                                  dry_run=dry_run, generate=generate, send=send)
+        except Exception as e:
+            traceback.print_exc()
+            result.update(status='error', error=str(e))
+            return result
+
+    problems = (summary['invalid'] + summary['render_failed'] + summary['failed']
+                + summary['skipped'] + summary['not_sent'])
+    result.update(status='problems' if problems else 'ok', summary=summary)
+    return result
+
+
+def run_batch(companies, month, year, processes=None, workers=1, dry_run=False,
+              generate=True, send=True):
+    """
+    Run payroll for every company, up to `processes` companies at once
+
+    Args:
+        companies: Job descriptions from load_batch
+        workers: Slip generation processes and SMTP conversations per company
+
+    Returns:
+        Batch summary dict with one result per company (in batch order)
+        and totals across the companies that completed
+    """
+    start = time.perf_counter()
+    results = {}
+    runnable = []
+    for company in companies:
+        if company.get('error'):
+            results[company['name']] = {'company': company['name'], 'status': 'error',
+                                        'error': company['error'], 'output_dir': company['output_dir']}
+        else:
+            runnable.append(company)
+
+    if runnable:
+        processes = max(1, min(processes or os.cpu_count() or 1, len(runnable)))
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = {
+                pool.submit(_run_company, (company, month, year, workers, dry_run, generate, send)): company
+                for company in runnable
+            }
+            for future in as_completed(futures):
+                company = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # The company's process died (or its result could not be sent back)
+                    result = {'company': company['name'], 'status': 'error', 'error': str(e),
+                              'output_dir': company['output_dir']}
+                results[company['name']] = result
+                print(f"  {company['name']}: {_describe(result)}")
+
+    ordered = [results[company['name']] for company in companies]
+    totals = {key: 0 for key in TOTAL_KEYS}
+    for result in ordered:
+        for key in TOTAL_KEYS:
+            totals[key] += result.get('summary', {}).get(key, 0) or 0
+
+    return {
+        'sheet': f"{month} {year}",
+        'companies': ordered,
+        'totals': totals,
+        'succeeded': sum(1 for result in ordered if result['status'] == 'ok'),
+        'with_problems': sum(1 for result in ordered if result['status'] == 'problems'),
+        'errors': sum(1 for result in ordered if result['status'] == 'error'),
+        'elapsed_s': round(time.perf_counter() - start, 3),
+    }
+
+
+def _describe(result):
+    if result['status'] == 'error':
+        return f"ERROR {result['error']}"
+    summary = result['summary']
+    if summary['blocked']:
+        return f"BLOCKED {summary['invalid']} of {summary['records']} records failed validation"
+    return (f"{summary['records']} records ({summary['invalid']} invalid), "
+            f"{summary['rendered']} rendered, {summary['sent']} sent, "
+            f"{summary['failed'] + summary['render_failed']} failed ({summary['elapsed_s']:.1f}s)")
+
+
+def format_batch_summary(batch):
+    """Combined summary as a plain-text table"""
+    lines = [
+        f"Batch: {batch['sheet']} ({batch['elapsed_s']:.1f}s)",
+        f"{'Company':<24} {'Status':<9} {'Records':>8} {'Rendered':>9} {'Sent':>6} {'Failed':>7} {'Skipped':>8}",
+        "-" * 75,
+    ]
+    for result in batch['companies']:
+        summary = result.get('summary', {})
+        failed = summary.get('failed', 0) + summary.get('render_failed', 0)
+        lines.append(
+            f"{result['company'][:24]:<24} {result['status']:<9} {summary.get('records', 0):>8} "
+            f"{summary.get('rendered', 0):>9} {summary.get('sent', 0):>6} {failed:>7} "
+            f"{summary.get('skipped', 0) + summary.get('not_sent', 0):>8}"
+        )
+    totals = batch['totals']
+    lines.append("-" * 75)
+    lines.append(
+        f"{'Total':<24} {'':<9} {totals['records']:>8} {totals['rendered']:>9} {totals['sent']:>6} "
+        f"{totals['failed'] + totals['render_failed']:>7} {totals['skipped'] + totals['not_sent']:>8}"
+    )
+    for result in batch['companies']:
+        if result['status'] == 'error':
+            lines.append(f"{result['company']}: {result['error']}")
+    return "\n".join(lines)
+
+
+def write_batch_summary(batch, directory="reports"):
+    """
+    Write the combined summary as JSON
+
+    Returns:
+        Path of the summary file
+    """
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    sheet = ''.join(ch if ch.isalnum() else '_' for ch in batch['sheet'])
+    path = os.path.join(directory, f"batch_{sheet}_{stamp}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(batch, f, indent=2)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run payroll for several companies at once")
+    parser.add_argument('--batch', required=True, help="Batch file listing the companies")
+    parser.add_argument('--month', required=True, type=parse_month, help="Month name, e.g. January")
+    parser.add_argument('--year', required=True, type=int)
+    parser.add_argument('--processes', type=int, default=None,
+                        help="Companies run at once (default: one per CPU, at most one per company)")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Slip generation processes and SMTP conversations per company")
+    parser.add_argument('--dry-run', action='store_true', help="Generate slips but do not send any email")
+    parser.add_argument('--skip-generate', action='store_true', help="Send previously generated slips")
+    parser.add_argument('--skip-send', action='store_true', help="Only generate slips")
+    parser.add_argument('--summary-dir', default='reports', help="Where the combined summary is written")
+    args = parser.parse_args(argv)
+
+    try:
+        companies = load_batch(args.batch)
+    except (OSError, ValueError) as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 2
+
+    print(f"Running {args.month} {args.year} for {len(companies)} companies...")
+    batch = run_batch(companies, args.month, args.year, processes=args.processes,
+                      workers=max(1, args.workers), dry_run=args.dry_run,
+                      generate=not args.skip_generate, send=not args.skip_send)
+
+    print(format_batch_summary(batch))
+    try:
+        print(f"Summary: {write_batch_summary(batch, args.summary_dir)}")
+    except OSError as e:
+        print(f"Error writing summary: {str(e)}")
+
+    if batch['errors']:
+        return 2
+    return 1 if batch['with_problems'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Benchmark history and regression check.
+
+Runs the PDF, sheet-parsing and SMTP benchmarks with fixed settings, appends
+the results to a history file keyed by git revision and machine, and
+compares each run against a baseline from the same machine: by default the
+previous run, or the latest run of a given revision with --baseline.
+
+Usage:
+    python bench_history.py                        # run all, compare with the last run
+    python bench_history.py --only pdf sheets
+    python bench_history.py --baseline 1a2b3c4 --threshold 0.15
+
+Exits with status 1 if any tracked metric regressed by more than the threshold.
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import subprocess
+from datetime import datetime
+
+import bench_pdf
+import bench_sheets
+import bench_smtp
+
+HISTORY_PATH = os.path.join('benchmarks', 'history.jsonl')
+DEFAULT_THRESHOLD = 0.10
+
+# Fixed settings, so runs recorded at different revisions stay comparable
+BENCHMARKS = {
+    'pdf': (bench_pdf.run_benchmark, {'count': 100}),
+    'sheets': (bench_sheets.run_benchmark, {'rows': 5000, 'repeat': 10}),
+    'smtp': (bench_smtp.run_benchmark, {'count': 200, 'attachment_kb': 140}),
+}
+
+# Metrics compared with the baseline; True when higher is better
+TRACKED = {
+    'pdf': {'slips_per_sec': True, 'latency_ms_p50': False, 'latency_ms_p99': False, 'first_slip_ms': False,
+            'warm_start_ms': False},
+    'sheets': {'rows_per_sec': True},
+    'smtp': {'messages_per_sec': True, 'latency_ms_p50': False, 'latency_ms_p99': False,
+             'connect_setup_ms_mean': False},
+}
+
+
+def git_revision():
+    """Get (short revision, has uncommitted changes) for the code being benchmarked"""
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    try:
+        rev = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=repo_dir,
+                             capture_output=True, text=True, check=True).stdout.strip()
+        status = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=repo_dir,
+                                capture_output=True, text=True, check=True).stdout
+        return rev, bool(status.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown', False
+
+
+def machine_info():
+    """Describe this machine; machine_id groups runs that can be compared"""
+    info = {
+        'hostname': platform.node(),
+        'system': platform.system(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'python': platform.python_version(),
+        'cpu_count': os.cpu_count(),
+    }
+    key = '|'.join(str(info[name]) for name in ('hostname', 'system', 'machine', 'python', 'cpu_count'))
+    info['machine_id'] = hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+    return info
+
+
+def load_history(path=HISTORY_PATH):
+    if not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entries.append(json.loads(line))
+    return entries
+
+
+def append_history(entry, path=HISTORY_PATH):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def find_baseline(history, benchmark, machine_id, params, revision=None):
+    """Latest matching run on this machine, optionally of a given revision"""
+    for entry in reversed(history):
+        if (entry['benchmark'] == benchmark and entry['machine']['machine_id'] == machine_id
+                and entry['params'] == params):
+            if revision is None or entry['git_rev'].startswith(revision):
+                return entry
+    return None
+
+
+def compare(benchmark, results, baseline_results, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare tracked metrics with a baseline
+
+    Returns:
+        List of dicts with metric, baseline, current, change (fraction, positive
+        is better) and regressed
+    """
+    rows = []
+    for metric, higher_is_better in TRACKED[benchmark].items():
+        current = results.get(metric)
+        baseline = baseline_results.get(metric)
+        if not current or not baseline:
+            continue
+        change = (current - baseline) / baseline
+        if not higher_is_better:
+            change = -change
+        rows.append({
+            'metric': metric,
+            'baseline': baseline,
+            'current': current,
+            'change': round(change, 4),
+            'regressed': change < -threshold,
+        })
+    return rows
+
+
+def run(names, history_path=HISTORY_PATH, baseline_rev=None, threshold=DEFAULT_THRESHOLD, record=True):
+    """
+    Run benchmarks, record them and compare with their baselines
+
+    Returns:
+        True if no tracked metric regressed beyond the threshold
+    """
+    rev, dirty = git_revision()
+    machine = machine_info()
+    history = load_history(history_path)
+    ok = True
+
+    for name in names:
+        func, params = BENCHMARKS[name]
+        print(f"Running {name} benchmark {params}...")
+        results = func(**params)
+
+        entry = {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_rev': rev,
+            'git_dirty': dirty,
+            'machine': machine,
+            'benchmark': name,
+            'params': params,
+            'results': results,
+        }
+
+        baseline = find_baseline(history, name, machine['machine_id'], params, baseline_rev)
+        if baseline is None:
+            print(f"  No baseline for {name} on this machine yet")
+        else:
+            label = baseline['git_rev'] + (' (dirty)' if baseline.get('git_dirty') else '')
+            print(f"  Compared with {label} from {baseline['timestamp']}")
+            print(f"  {'Metric':<24} {'Baseline':>12} {'Current':>12} {'Change':>9}")
+            for row in compare(name, results, baseline['results'], threshold):
+                flag = '  REGRESSION' if row['regressed'] else ''
+                print(f"  {row['metric']:<24} {row['baseline']:>12} {row['current']:>12} "
+                      f"{row['change'] * 100:>+8.1f}%{flag}")
+                if row['regressed']:
+                    ok = False
+
+        if record:
+            append_history(entry, history_path)
+            history.append(entry)
+
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run benchmarks, keep their history and flag regressions")
+    parser.add_argument('--only', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS),
+                        help="Benchmarks to run (default: all)")
+    parser.add_argument('--history', default=HISTORY_PATH, help="History file (JSON lines)")
+    parser.add_argument('--baseline', help="Compare with the latest run of this git revision")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Flag changes worse than this fraction (default 0.10 = 10%%)")
+    parser.add_argument('--no-record', action='store_true', help="Compare only; do not add to the history")
+    args = parser.parse_args()
+
+    rev, dirty = git_revision()
+    print(f"Revision {rev}{' (uncommitted changes)' if dirty else ''} on {machine_info()['hostname']}")
+
+    ok = run(args.only, args.history, args.baseline, args.threshold, record=not args.no_record)
+    print("No regressions." if ok else "Regressions found.")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
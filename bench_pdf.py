@@ -0,0 +1,137 @@
+"""
+Salary slip generation benchmark on synthetic records.
+
+Renders N slips with PDFGenerator into a temporary folder and reports
+throughput, per-slip latency and slip size. The first slip is timed on its
+own since it pays for preparing the stamp images into an empty asset cache;
+warm_start_ms is the first slip of a second generator that finds them there,
+as a new app launch or pool worker would.
+
+Usage:
+    python bench_pdf.py --count 200
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from asset_cache import AssetCache
+from pdf_generator import PDFGenerator
+from bench_smtp import percentile, peak_rss_mb
+
+
+def make_records(count):
+    """Synthetic employee records with the usual salary fields filled in"""
+    return [{
+        'Name': f'Employee {i:05d}',
+        'email address': f'employee{i:05d}@example.com',
+        'CNIC': f'35202-{i:07d}-1',
+        'Designation': 'Software Engineer',
+        'Basic Salary': 50000 + i,
+        'Food Allowance': 5000,
+        'Travel Allowance': 3000,
+        'Medical Allowance': 2000,
+        'Tax Deductable': 1500,
+        'Net Salary': 58500 + i
+    } for i in range(count)]
+
+
+def make_letterhead(directory):
+    """Blank A4 page standing in for the letter head when it is not installed"""
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfgen import canvas
+
+    path = os.path.join(directory, 'letterhead.pdf')
+    c = canvas.Canvas(path, pagesize=A4)
+    c.drawString(50, 800, "Letter head stand-in")
+    c.save()
+    return path
+
+
+def run_benchmark(count=200, config_file=None):
+    """
+    Render `count` slips and return the measurements as a dict
+    """
+    work_dir = tempfile.mkdtemp(prefix='bench_pdf_')
+    try:
+        def make_generator():
+            generator = PDFGenerator(config_file)
+            generator.set_company_info("Benchmark Company")
+            if generator.asset_cache:
+                # Start from an empty cache so first_slip_ms stays a cold start
+                generator.asset_cache = AssetCache(os.path.join(work_dir, 'assets'))
+            if stand_in:
+                generator.letter_head_path = letter_head_path
+            return generator
+
+        letter_head_path = PDFGenerator(config_file).letter_head_path
+        stand_in = not os.path.exists(letter_head_path)
+        if stand_in:
+            letter_head_path = make_letterhead(work_dir)
+        generator = make_generator()
+
+        records = make_records(count + 1)
+
+        start = time.perf_counter()
+        os.remove(generator.create_pdf(records[0], "Benchmark 2025", work_dir))
+        first_slip = time.perf_counter() - start
+
+        start = time.perf_counter()
+        os.remove(make_generator().create_pdf(records[0], "Benchmark 2025", work_dir))
+        warm_start = time.perf_counter() - start
+
+        latencies = []
+        total_bytes = 0
+        start = time.perf_counter()
+        for record in records[1:]:
+            slip_start = time.perf_counter()
+            pdf_path = generator.create_pdf(record, "Benchmark 2025", work_dir)
+            latencies.append(time.perf_counter() - slip_start)
+            total_bytes += generator.last_pdf_size
+            os.remove(pdf_path)
+        elapsed = time.perf_counter() - start
+
+        return {
+            'slips': count,
+            'letterhead': 'stand-in' if stand_in else 'installed',
+            'stamp_dpi': generator.stamp_dpi,
+            'elapsed_s': round(elapsed, 4),
+            'slips_per_sec': round(count / elapsed, 2) if elapsed else 0.0,
+            'first_slip_ms': round(first_slip * 1000, 3),
+            'warm_start_ms': round(warm_start * 1000, 3),
+            'asset_cache': 'on' if generator.asset_cache else 'off',
+            'latency_ms_p50': round(percentile(latencies, 50) * 1000, 3),
+            'latency_ms_p90': round(percentile(latencies, 90) * 1000, 3),
+            'latency_ms_p99': round(percentile(latencies, 99) * 1000, 3),
+            'avg_slip_kb': round(total_bytes / count / 1024, 2) if count else 0.0,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Salary slip generation benchmark")
+    parser.add_argument('--count', type=int, default=200, help="Number of synthetic slips to render")
+    parser.add_argument('--config', default=None, help="config.json with stamp settings to benchmark")
+    parser.add_argument('--json', dest='json_path', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(count=args.count, config_file=args.config)
+
+    print("=" * 50)
+    print("PDF Generation Benchmark")
+    print("=" * 50)
+    for key, value in results.items():
+        print(f"  {key:<24} {value}")
+    print("=" * 50)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
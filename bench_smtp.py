@@ -0,0 +1,308 @@
+"""
+Email delivery load test against a local in-process SMTP server.
+
+Starts an aiosmtpd stand-in on 127.0.0.1, points EmailSender (or the async
+engine) at it and sends N synthetic salary slips, so send throughput can be
+measured without touching a real mailbox.
+
+The stand-in runs in this process, so its own parsing cost is part of the
+numbers; compare runs made with the same settings rather than reading the
+figures as absolute server capacity.
+
+Usage:
+    python bench_smtp.py --count 200 --latency 0.02 --error-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import shutil
+import smtplib
+import socket
+import tempfile
+import time
+import tracemalloc
+
+from aiosmtpd.controller import Controller
+from aiosmtpd.smtp import AuthResult
+
+from email_sender import EmailSender
+from async_email_sender import AsyncEmailSender
+from smtp_throttle import AdaptiveSendThrottle
+from metrics_export import peak_rss_bytes
+
+
+class StandInHandler:
+    """aiosmtpd handler that accepts mail with injected latency and failures"""
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.received = 0
+        self.received_bytes = 0
+        self.rejected = 0
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.rejected += 1
+            return '451 4.3.0 Injected temporary failure'
+        # Count the message but do not keep it, so the server's own memory
+        # does not show up in the sender's numbers
+        self.received += 1
+        self.received_bytes += len(envelope.content)
+        return '250 OK'
+
+
+def _accept_any_login(server, session, envelope, mechanism, auth_data):
+    return AuthResult(success=True)
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class LocalSMTPServer:
+    """
+    Context manager running the stand-in SMTP server on a free local port
+
+    Example:
+        with LocalSMTPServer(latency=0.01) as server:
+            sender = EmailSender(server.write_config(tmp_dir))
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, seed=None):
+        self.handler = StandInHandler(latency, error_rate, seed)
+        self.host = '127.0.0.1'
+        self.port = _free_port()
+        self.controller = Controller(
+            self.handler,
+            hostname=self.host,
+            port=self.port,
+            auth_require_tls=False,
+            authenticator=_accept_any_login
+        )
+
+    def __enter__(self):
+        # aiosmtpd logs a deprecation warning on every AUTH; keep output readable
+        logging.getLogger('mail.log').setLevel(logging.ERROR)
+        self.controller.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.controller.stop()
+
+    def write_config(self, directory, **extra):
+        """Write a config.json that points the email senders at this server"""
+        config = {
+            'sender_email': 'payroll@example.com',
+            'sender_password': 'benchmark',
+            'smtp_server': self.host,
+            'smtp_port': self.port,
+            'smtp_starttls': False,
+            'smtp_timeout': 30,
+        }
+        config.update(extra)
+        config_path = os.path.join(directory, 'config.json')
+        with open(config_path, 'w') as f:
+            json.dump(config, f)
+        return config_path
+
+
+def make_synthetic_slips(directory, count, size_kb):
+    """Create `count` fake slip records with PDF-sized attachments"""
+    payload = b'%PDF-1.4\n' + os.urandom(max(0, size_kb * 1024 - 9))
+    pdf_path = os.path.join(directory, 'synthetic_slip.pdf')
+    with open(pdf_path, 'wb') as f:
+        f.write(payload)
+
+    return [{
+        'to_email': f'employee{i:05d}@example.com',
+        'subject': 'Salary Statement - Benchmark 2025',
+        'body': f'Dear Employee {i},\n\nPlease find attached your salary statement.',
+        'pdf_path': pdf_path
+    } for i in range(count)]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unsupported)"""
+    peak = peak_rss_bytes()
+    return round(peak / (1024 * 1024), 1) if peak is not None else None
+
+
+def measure_connection_setup(server, config_path, samples=20):
+    """Time connect + EHLO + AUTH + QUIT without sending anything"""
+    sender = EmailSender(config_path)
+    sender._ensure_configured()
+    timings = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        with smtplib.SMTP(server.host, server.port, timeout=30) as smtp:
+            smtp.login(sender.sender_email, sender.sender_password)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _bench_throttle():
+    # Injected errors are random rather than rate-driven, so cap the backoff
+    # to keep a run bounded while still exercising the retry path
+    return AdaptiveSendThrottle(initial_delay=0.0, max_delay=0.2, deferral_floor=0.01, retry_delay=0.05)
+
+
+def run_sync(config_path, messages, use_throttle):
+    sender = EmailSender(config_path)
+    throttle = _bench_throttle() if use_throttle else None
+    latencies = []
+    failed = 0
+    for message in messages:
+        start = time.perf_counter()
+        try:
+            if throttle:
+                throttle.send(sender.send_email, **message)
+            else:
+                sender.send_email(**message)
+        except Exception:
+            failed += 1
+        latencies.append(time.perf_counter() - start)
+    return latencies, failed, throttle
+
+
+def run_async(config_path, messages, use_throttle, concurrency):
+    sender = AsyncEmailSender(config_path, concurrency=concurrency)
+    throttle = _bench_throttle() if use_throttle else None
+    latencies = []
+    original = sender.send_email_async
+
+    async def timed_send(**message):
+        start = time.perf_counter()
+        try:
+            return await original(**message)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    sender.send_email_async = timed_send
+    results = sender.send_batch(messages, throttle=throttle)
+    failed = sum(1 for r in results if r['status'] != 'sent')
+    return latencies, failed, throttle
+
+
+def run_benchmark(count=100, latency=0.0, error_rate=0.0, attachment_kb=60,
+                  backend='smtp', concurrency=10, use_throttle=False, seed=1):
+    """
+    Run one load test and return the measurements as a dict
+
+    The messages are sent twice: once timed without tracemalloc, and once
+    more with tracemalloc on to measure traced_peak_mb.
+    """
+    work_dir = tempfile.mkdtemp(prefix='bench_smtp_')
+    try:
+        with LocalSMTPServer(latency, error_rate, seed) as server:
+            config_path = server.write_config(work_dir, async_concurrency=concurrency)
+            messages = make_synthetic_slips(work_dir, count, attachment_kb)
+
+            setup_times = measure_connection_setup(server, config_path)
+
+            def send_all():
+                if backend == 'async':
+                    return run_async(config_path, messages, use_throttle, concurrency)
+                return run_sync(config_path, messages, use_throttle)
+
+            # Timed pass with tracing off; tracemalloc slows every allocation
+            # and would skew the throughput and latency figures
+            start = time.perf_counter()
+            latencies, failed, throttle = send_all()
+            elapsed = time.perf_counter() - start
+
+            delivered = server.handler.received
+            rejected = server.handler.rejected
+
+            # Separate pass for peak Python memory; only traced_peak_mb comes from it
+            tracemalloc.start()
+            try:
+                send_all()
+                _, traced_peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+        results = {
+            'backend': backend,
+            'concurrency': concurrency if backend == 'async' else 1,
+            'messages': count,
+            'delivered': delivered,
+            'rejected_by_server': rejected,
+            'failed': failed,
+            'attachment_kb': attachment_kb,
+            'injected_latency_s': latency,
+            'injected_error_rate': error_rate,
+            'elapsed_s': round(elapsed, 4),
+            'messages_per_sec': round(delivered / elapsed, 2) if elapsed else 0.0,
+            'connect_setup_ms_mean': round(sum(setup_times) / len(setup_times) * 1000, 3),
+            'connect_setup_ms_p95': round(percentile(setup_times, 95) * 1000, 3),
+            'latency_ms_p50': round(percentile(latencies, 50) * 1000, 3),
+            'latency_ms_p90': round(percentile(latencies, 90) * 1000, 3),
+            'latency_ms_p99': round(percentile(latencies, 99) * 1000, 3),
+            'latency_ms_max': round(max(latencies) * 1000, 3) if latencies else 0.0,
+            'traced_peak_mb': round(traced_peak / (1024 * 1024), 2),
+            'peak_rss_mb': peak_rss_mb(),
+        }
+        if throttle:
+            results.update({
+                'deferrals': throttle.deferrals,
+                'retries': throttle.retries,
+            })
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Email delivery load test with a local SMTP stand-in")
+    parser.add_argument('--count', type=int, default=100, help="Number of synthetic slips to send")
+    parser.add_argument('--latency', type=float, default=0.0, help="Injected server latency per message (seconds)")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of messages answered with 451")
+    parser.add_argument('--attachment-kb', type=int, default=60, help="Size of the synthetic PDF attachment")
+    parser.add_argument('--backend', choices=['smtp', 'async'], default='smtp')
+    parser.add_argument('--concurrency', type=int, default=10, help="Conversations in flight (async backend)")
+    parser.add_argument('--throttle', action='store_true', help="Send through AdaptiveSendThrottle with retries")
+    parser.add_argument('--json', dest='json_path', help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        count=args.count,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        attachment_kb=args.attachment_kb,
+        backend=args.backend,
+        concurrency=args.concurrency,
+        use_throttle=args.throttle
+    )
+
+    print("=" * 50)
+    print("Email Delivery Benchmark")
+    print("=" * 50)
+    for key, value in results.items():
+        print(f"  {key:<24} {value}")
+    print("=" * 50)
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+import csv
+import json
+import os
+import time
+from datetime import datetime
+
+# Columns written for every recipient
+REPORT_FIELDS = [
+    'name', 'email', 'status', 'smtp_code', 'attempts', 'attachment_bytes',
+    'connect_s', 'auth_s', 'transmit_s', 'total_s', 'error'
+]
+TIMING_FIELDS = ['connect_s', 'auth_s', 'transmit_s', 'total_s']
+
+
+class DeliveryReport:
+    """
+    Per-recipient results of one email run, written as CSV and JSON.
+
+    Status is one of 'sent', 'failed', 'skipped' (bad address or missing PDF)
+    or 'not_sent' (the run stopped before reaching the recipient).
+    """
+
+    def __init__(self, sheet_name, report_dir="reports"):
+        self.sheet_name = sheet_name
+        self.report_dir = report_dir
+        self.rows = []
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        self._elapsed = None
+
+    def add(self, name, email, status, stats=None, attempts=1, error=None):
+        """Record the outcome for one recipient"""
+        stats = stats or {}
+        row = {
+            'name': name,
+            'email': email,
+            'status': status,
+            'smtp_code': stats.get('smtp_code'),
+            'attempts': attempts if status in ('sent', 'failed') else 0,
+            'attachment_bytes': stats.get('attachment_bytes', 0),
+            'error': error or '',
+        }
+        for field in TIMING_FIELDS:
+            value = stats.get(field)
+            row[field] = round(value, 4) if value is not None else None
+        self.rows.append(row)
+
+    def finish(self):
+        """Stop the run clock"""
+        self._elapsed = time.perf_counter() - self._start
+
+    def count(self, status):
+        return sum(1 for row in self.rows if row['status'] == status)
+
+    def summary(self):
+        """Aggregate throughput and average timings for the run"""
+        elapsed = self._elapsed if self._elapsed is not None else time.perf_counter() - self._start
+        sent = [row for row in self.rows if row['status'] == 'sent']
+        bytes_sent = sum(row['attachment_bytes'] or 0 for row in sent)
+
+        summary = {
+            'sheet': self.sheet_name,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'recipients': len(self.rows),
+            'sent': len(sent),
+            'failed': self.count('failed'),
+            'skipped': self.count('skipped'),
+            'not_sent': self.count('not_sent'),
+            'elapsed_s': round(elapsed, 3),
+            'messages_per_sec': round(len(sent) / elapsed, 3) if elapsed else 0.0,
+            'attachment_bytes_sent': bytes_sent,
+            'attachment_kb_per_sec': round(bytes_sent / 1024 / elapsed, 2) if elapsed else 0.0,
+        }
+
+        # Averages over every attempted message, slowest total as a worst case
+        attempted = [row for row in self.rows if row['total_s'] is not None]
+        for field in TIMING_FIELDS:
+            values = [row[field] for row in attempted if row[field] is not None]
+            summary[f'avg_{field}'] = round(sum(values) / len(values), 4) if values else None
+        totals = [row['total_s'] for row in attempted]
+        summary['max_total_s'] = max(totals) if totals else None
+
+        return summary
+
+    def write(self):
+        """
+        Write the report as <report_dir>/delivery_<sheet>_<timestamp>.csv/.json
+
+        Returns:
+            (csv_path, json_path)
+        """
+        if self._elapsed is None:
+            self.finish()
+
+        os.makedirs(self.report_dir, exist_ok=True)
+        stamp = self.started_at.strftime('%Y%m%d_%H%M%S')
+        base = os.path.join(self.report_dir, f"delivery_{self.sheet_name.replace(' ', '_')}_{stamp}")
+
+        csv_path = base + '.csv'
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.rows)
+
+        json_path = base + '.json'
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump({'summary': self.summary(), 'recipients': self.rows}, f, indent=2)
+
+        return csv_path, json_path
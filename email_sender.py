@@ -5,6 +5,27 @@ from email.mime.base import MIMEBase
 from email import encoders
 import json
 import os
+import time
+import uuid
+from smtp_throttle import AdaptiveSendThrottle, get_smtp_code
+from instrumentation import record, count
+
+# Span names for the timed phases of one SMTP conversation
+SMTP_SPANS = {
+    'connect': 'smtp.connect',
+    'auth': 'smtp.login',
+    'transmit': 'smtp.send',
+    'total': 'smtp.total',
+}
+
+
+class EmailSendError(Exception):
+    """Raised when a message could not be delivered, keeping the SMTP reply code"""
+    def __init__(self, message, original=None):
+        super().__init__(message)
+        self.original = original
+        self.smtp_code = getattr(original, 'smtp_code', None)
+
 
 class EmailSender:
     def __init__(self, config_file="config.json"):
@@ -15,6 +36,8 @@ class EmailSender:
         self.config = None
         self.smtp_server = None
         self.smtp_port = None
+        self.smtp_timeout = None
+        self.smtp_starttls = True
         self.sender_email = None
         self.sender_password = None
         self.is_configured = False
@@ -27,6 +50,9 @@ class EmailSender:
         self.config = self._load_config(self.config_file)
         self.smtp_server = self.config.get('smtp_server', 'smtp.gmail.com')
         self.smtp_port = self.config.get('smtp_port', 587)
+        self.smtp_timeout = self.config.get('smtp_timeout', 60)
+        # Only plain internal relays (and the local test server) skip STARTTLS
+        self.smtp_starttls = self.config.get('smtp_starttls', True)
         self.sender_email = self.config.get('sender_email', '').strip()
         # Get app password (try both with and without spaces)
         self.sender_password = self.config.get('sender_password', '').strip()
@@ -38,7 +64,9 @@ class EmailSender:
         return True
     
     def _load_config(self, config_file):
-        """Load configuration from JSON file"""
+        """Load configuration from JSON file (or a dict of already loaded settings)"""
+        if isinstance(config_file, dict):
+            return dict(config_file)
         if not os.path.exists(config_file):
             raise FileNotFoundError(
                 f"Config file '{config_file}' not found. "
@@ -50,7 +78,7 @@ class EmailSender:
         
         return config
     
-    def send_email(self, to_email, subject, body, pdf_path=None):
+    def send_email(self, to_email, subject, body, pdf_path=None, stats=None):
         """
         Send an email with optional PDF attachment
 
@@ -59,6 +87,8 @@ class EmailSender:
             subject: Email subject
             body: Email body text
             pdf_path: Path to PDF file to attach (optional)
+            stats: Optional dict filled with the SMTP reply code, attachment
+                size and connect/auth/transmit/total timings in seconds
 
         Returns:
             True if successful
@@ -66,8 +96,63 @@ class EmailSender:
         # Ensure config is loaded
         self._ensure_configured()
 
-        # Create message
-        msg = MIMEMultipart()
+        msg = self._build_message(to_email, subject, body, pdf_path)
+        self._start_stats(stats, pdf_path)
+
+        # Create SMTP session
+        start = mark = time.perf_counter()
+        try:
+            # The context manager closes the socket even when the server
+            # rejects us part-way, so retried sends do not leak connections
+            with smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.smtp_timeout) as server:
+                if self.smtp_starttls:
+                    server.starttls()  # Enable security
+                mark = self._record_phase(stats, 'connect', mark)
+
+                server.login(self.sender_email, self.sender_password)
+                mark = self._record_phase(stats, 'auth', mark)
+
+                # Send email
+                text = msg.as_string()
+                server.sendmail(self.sender_email, to_email, text)
+                self._record_phase(stats, 'transmit', mark)
+
+            self._finish_stats(stats, start)
+            return True
+            
+        except Exception as e:
+            self._finish_stats(stats, start, e)
+            raise EmailSendError(f"Failed to send email: {str(e)}", original=e)
+
+    def _start_stats(self, stats, pdf_path):
+        """Reset the per-message stats dict (it is reused across retries)"""
+        if stats is None:
+            return
+        stats.clear()
+        stats['attachment_bytes'] = os.path.getsize(pdf_path) if pdf_path and os.path.exists(pdf_path) else 0
+
+    def _record_phase(self, stats, phase, since):
+        """Store how long an SMTP phase took and return the current time"""
+        now = time.perf_counter()
+        if stats is not None:
+            stats[f'{phase}_s'] = now - since
+        record(SMTP_SPANS[phase], now - since, since)
+        return now
+
+    def _finish_stats(self, stats, start, error=None):
+        """Store the total time and the final SMTP reply code"""
+        self._record_phase(stats, 'total', start)
+        count('smtp.failed' if error else 'smtp.sent')
+        if stats is None:
+            return
+        # sendmail only returns once the server accepted the message with 250
+        stats['smtp_code'] = get_smtp_code(error)[0] if error else 250
+
+    def _build_message(self, to_email, subject, body, pdf_path=None):
+        """Build the MIME message with optional PDF attachment"""
+        # A random boundary cannot clash with the body or base64 text, and
+        # setting it spares the generator a regex compile and scan per message
+        msg = MIMEMultipart(boundary='=' * 15 + uuid.uuid4().hex + '==')
         msg['From'] = self.sender_email
         msg['To'] = to_email
         msg['Subject'] = subject
@@ -91,21 +176,27 @@ class EmailSender:
             )
             
             msg.attach(part)
-        
-        # Create SMTP session
-        try:
-            server = smtplib.SMTP(self.smtp_server, self.smtp_port)
-            server.starttls()  # Enable security
-            server.login(self.sender_email, self.sender_password)
-            
-            # Send email
-            text = msg.as_string()
-            server.sendmail(self.sender_email, to_email, text)
-            server.quit()
-            
-            return True
-            
-        except Exception as e:
-            raise Exception(f"Failed to send email: {str(e)}")
+
+        return msg
+
+    def get_report_dir(self):
+        """
+        Get the directory for delivery reports and run traces
+
+        Reads 'report_dir' without requiring email credentials, and falls
+        back to 'reports' when config.json is missing or unreadable.
+        """
+        config = self.config
+        if config is None:
+            try:
+                config = self._load_config(self.config_file)
+            except (OSError, ValueError):
+                return 'reports'
+        return config.get('report_dir', 'reports')
+
+    def create_throttle(self):
+        """Create an adaptive send-rate throttle from the send_* config keys"""
+        self._ensure_configured()
+        return AdaptiveSendThrottle.from_config(self.config)
 
 
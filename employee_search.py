@@ -0,0 +1,67 @@
+import re
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_text(value):
+    """Lowercase and collapse whitespace for matching"""
+    return _WHITESPACE.sub(' ', str(value or '')).strip().casefold()
+
+
+class EmployeeSearchIndex:
+    """
+    Prebuilt search index over employee name, email, CNIC and designation.
+
+    Each employee is normalized once into a single search string. A query is
+    split into words and an employee matches when every word appears in it.
+    Typing more characters only searches the previous matches again.
+    """
+
+    def __init__(self, entries):
+        """
+        Args:
+            entries: List of (name, email, cnic, designation) tuples, in the
+                same order as the records they describe
+        """
+        self._haystacks = []
+        for name, email, cnic, designation in entries:
+            cnic_text = normalize_text(cnic)
+            cnic_digits = ''.join(ch for ch in cnic_text if ch.isdigit())
+            # \x00 keeps a query from matching across two fields
+            self._haystacks.append('\x00'.join([
+                normalize_text(name),
+                normalize_text(email),
+                cnic_text,
+                cnic_digits,
+                normalize_text(designation)
+            ]))
+        self._all = list(range(len(self._haystacks)))
+        self._last_query = ''
+        self._last_result = self._all
+
+    def __len__(self):
+        return len(self._haystacks)
+
+    def search(self, query):
+        """
+        Get the indices of employees matching every word in the query
+
+        Returns:
+            List of indices in original order (all employees for an empty query)
+        """
+        query = normalize_text(query)
+        if not query:
+            self._last_query, self._last_result = '', self._all
+            return self._all
+
+        # A longer version of the last query can only match a subset of it
+        candidates = self._all
+        if self._last_query and query.startswith(self._last_query):
+            candidates = self._last_result
+
+        words = query.split(' ')
+        haystacks = self._haystacks
+        result = [i for i in candidates if all(word in haystacks[i] for word in words)]
+
+        self._last_query, self._last_result = query, result
+        return result
@@ -0,0 +1,157 @@
+"""
+A month's employees keyed by CNIC, with lookups by email and name.
+
+Built once when the records are loaded. Rows that share a CNIC, an email
+address or a slip filename are found then, instead of one slip silently
+overwriting another on disk.
+
+    table = EmployeeTable(records, "January 2025", pdf_generator.get_pdf_filename)
+    record = table.get("35202-1234567-1")
+    records = table.select(["35202-1234567-1", "ali@example.com"])
+"""
+from employee_search import normalize_text
+from record_fields import get_email, get_name, get_cnic, describe_row
+
+
+def normalize_cnic(value):
+    """CNIC digits only, so 35202-1234567-1 and 3520212345671 are the same key"""
+    return ''.join(ch for ch in str(value or '') if ch.isdigit())
+
+
+def normalize_email(value):
+    return str(value or '').strip().casefold()
+
+
+class EmployeeTable:
+    """
+    Employee records with O(1) lookup by CNIC, email and name.
+
+    Each record has a unique key: its normalized CNIC, or "row<n>" when it
+    has none or repeats an earlier row's.
+    Later rows that repeat a CNIC or would be written to the same slip file
+    as an earlier row are conflicts (errors); a repeated email address is a
+    warning, since two employees can share an inbox.
+    """
+
+    def __init__(self, records, sheet_name="", filename_for=None):
+        """
+        Args:
+            records: The month's records, in sheet order
+            sheet_name: Month name used in slip filenames
+            filename_for: Optional function(record, sheet_name) giving the
+                slip filename, e.g. PDFGenerator.get_pdf_filename, to
+                detect filename collisions
+        """
+        self.sheet_name = sheet_name
+        self.records = list(records)
+        self.keys = []
+        self.by_cnic = {}
+        self.by_email = {}
+        self.by_name = {}
+        self.by_filename = {}
+        self._positions = {}
+        # position -> list of (severity, field, message)
+        self.conflicts = {}
+
+        for position, record in enumerate(self.records):
+            self._positions[id(record)] = position
+            cnic = normalize_cnic(get_cnic(record))
+            if cnic and cnic not in self.by_cnic:
+                self.by_cnic[cnic] = position
+                self.keys.append(cnic)
+            else:
+                if cnic:
+                    self._conflict(position, 'error', 'CNIC', "CNIC also belongs to", self.by_cnic[cnic])
+                self.keys.append(f"row{position + 1}")
+
+            email = normalize_email(get_email(record))
+            if email:
+                if email in self.by_email:
+                    self._conflict(position, 'warning', 'email address', "Email address also used by",
+                                   self.by_email[email][0])
+                self.by_email.setdefault(email, []).append(position)
+
+            name = normalize_text(get_name(record))
+            self.by_name.setdefault(name, []).append(position)
+
+            if filename_for is not None:
+                filename = filename_for(record, sheet_name)
+                if filename in self.by_filename:
+                    self._conflict(position, 'error', 'Name', f"Slip {filename} would overwrite the one for",
+                                   self.by_filename[filename][0])
+                self.by_filename.setdefault(filename, []).append(position)
+
+    def _conflict(self, position, severity, field, message, other):
+        other_record = self.records[other]
+        self.conflicts.setdefault(position, []).append(
+            (severity, field, f"{message} {describe_row(other_record, other)} {get_name(other_record)}")
+        )
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def position_of(self, record):
+        """Position of a record from this table, or None"""
+        return self._positions.get(id(record))
+
+    def conflicts_of(self, record):
+        """Conflicts found for a record at load time, as (severity, field, message)"""
+        position = self.position_of(record)
+        return self.conflicts.get(position, []) if position is not None else []
+
+    def get(self, cnic):
+        """Record with this CNIC (any formatting), or None"""
+        position = self.by_cnic.get(normalize_cnic(cnic))
+        return self.records[position] if position is not None else None
+
+    def by_key(self, key):
+        """Record for a key from self.keys, or None"""
+        if key.startswith('row'):
+            position = int(key[3:]) - 1
+            return self.records[position] if 0 <= position < len(self.records) else None
+        return self.get(key)
+
+    def find(self, identifier):
+        """
+        Records matching a CNIC, an email address or an exact name
+
+        Returns:
+            List of records (empty if nothing matches)
+        """
+        identifier = str(identifier or '').strip()
+        if '@' in identifier:
+            positions = self.by_email.get(normalize_email(identifier), [])
+        else:
+            cnic = normalize_cnic(identifier)
+            if cnic and cnic in self.by_cnic:
+                positions = [self.by_cnic[cnic]]
+            else:
+                positions = self.by_name.get(normalize_text(identifier), [])
+        return [self.records[position] for position in positions]
+
+    def select(self, identifiers):
+        """
+        Records for a list of CNICs, email addresses or names, in sheet order
+
+        Raises:
+            Exception if an identifier matches no employee, or a name matches several
+        """
+        positions = set()
+        unknown = []
+        ambiguous = []
+        for identifier in identifiers:
+            matches = self.find(identifier)
+            if not matches:
+                unknown.append(identifier)
+            elif len(matches) > 1 and '@' not in identifier:
+                ambiguous.append(identifier)
+            else:
+                positions.update(self.position_of(record) for record in matches)
+        if unknown:
+            raise Exception(f"No employee found for: {', '.join(unknown)}")
+        if ambiguous:
+            raise Exception(f"Several employees match: {', '.join(ambiguous)}; use their CNIC or email instead")
+        return [self.records[position] for position in sorted(positions)]
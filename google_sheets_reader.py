@@ -2,6 +2,55 @@ import gspread
 from google.oauth2.service_account import Credentials
 import json
 import os
+from instrumentation import span
+from record_fields import SHEET_ROW
+
+
+def parse_month_values(all_values):
+    """
+    Parse the raw values of a month's sheet
+
+    Row 1 holds the company name, row 2 the app name, row 3 the headers and
+    data starts at row 4.
+
+    Each record also carries its sheet row number under SHEET_ROW, so
+    problems can be reported where they are in the sheet.
+
+    Returns:
+        (records, company_name, app_name); a name is None when its row is empty
+    """
+    company_name = None
+    app_name = None
+
+    # First two rows are reserved: row 1 = company name, row 2 = app name
+    if len(all_values) >= 1 and all_values[0]:
+        company_name = all_values[0][0] if all_values[0][0] else ""
+    if len(all_values) >= 2 and all_values[1]:
+        app_name = all_values[1][0] if all_values[1][0] else ""
+
+    # Row 3 is the header row, data starts from row 4
+    if len(all_values) < 4:
+        return [], company_name, app_name
+
+    headers = all_values[2]  # Row 3 (index 2) is header
+    data_rows = all_values[3:]  # Data starts from row 4 (index 3)
+
+    # Convert to list of dictionaries
+    records = []
+    for sheet_row, row in enumerate(data_rows, start=4):
+        # Pad row with empty strings if it's shorter than headers
+        while len(row) < len(headers):
+            row.append('')
+
+        record = {headers[i]: row[i] for i in range(len(headers)) if headers[i]}
+
+        # Only include non-empty rows
+        if any(str(v).strip() for v in record.values() if v):
+            record[SHEET_ROW] = sheet_row
+            records.append(record)
+
+    return records, company_name, app_name
+
 
 class GoogleSheetsReader:
     def __init__(self, config_file="config.json"):
@@ -9,22 +58,28 @@ class GoogleSheetsReader:
         Initialize Google Sheets reader with credentials from config file
         """
         self.config = self._load_config(config_file)
-        self.client = self._authenticate()
+        with span('sheets.auth'):
+            self.client = self._authenticate()
         self.spreadsheet = None
         self.company_name = ""
         self.app_name = ""
-        self._open_spreadsheet()
+        # Months the last get_months_data call took from the cache
+        self.cached_months = {}
+        with span('sheets.open'):
+            self._open_spreadsheet()
     
     def _load_config(self, config_file):
-        """Load configuration from JSON file"""
-        if not os.path.exists(config_file):
+        """Load configuration from JSON file (or a dict of already loaded settings)"""
+        if isinstance(config_file, dict):
+            config = dict(config_file)
+        elif not os.path.exists(config_file):
             raise FileNotFoundError(
                 f"Config file '{config_file}' not found. "
                 "Please create it with your Google Sheets credentials."
             )
-        
-        with open(config_file, 'r') as f:
-            config = json.load(f)
+        else:
+            with open(config_file, 'r') as f:
+                config = json.load(f)
         
         required_keys = ['spreadsheet_id', 'credentials_file']
         for key in required_keys:
@@ -80,12 +135,13 @@ class GoogleSheetsReader:
         # Try different case variations
         variations = [month_name, month_name.lower(), month_name.upper(), month_name.capitalize()]
 
-        for variation in variations:
-            try:
-                worksheet = self.spreadsheet.worksheet(variation)
-                break
-            except gspread.exceptions.WorksheetNotFound:
-                continue
+        with span('sheets.open_worksheet'):
+            for variation in variations:
+                try:
+                    worksheet = self.spreadsheet.worksheet(variation)
+                    break
+                except gspread.exceptions.WorksheetNotFound:
+                    continue
 
         if worksheet is None:
             # List available worksheets
@@ -97,36 +153,91 @@ class GoogleSheetsReader:
 
         # Get all values from the sheet
         try:
-            all_values = worksheet.get_all_values()
+            with span('sheets.fetch'):
+                all_values = worksheet.get_all_values()
         except Exception as e:
             raise Exception(f"Error reading data from worksheet: {str(e)}")
 
-        # First two rows are reserved: row 1 = company name, row 2 = app name
-        if len(all_values) >= 1 and all_values[0]:
-            self.company_name = all_values[0][0] if all_values[0][0] else ""
-        if len(all_values) >= 2 and all_values[1]:
-            self.app_name = all_values[1][0] if all_values[1][0] else ""
-
-        # Row 3 is the header row, data starts from row 4
-        if len(all_values) < 4:
-            return []
-
-        headers = all_values[2]  # Row 3 (index 2) is header
-        data_rows = all_values[3:]  # Data starts from row 4 (index 3)
-
-        # Convert to list of dictionaries
-        records = []
-        for row in data_rows:
-            # Pad row with empty strings if it's shorter than headers
-            while len(row) < len(headers):
-                row.append('')
+        with span('sheets.parse'):
+            return self._parse_values(all_values)
 
-            record = {headers[i]: row[i] for i in range(len(headers)) if headers[i]}
+    def get_months_data(self, month_names, cache=None, refresh=False):
+        """
+        Get the records of several month sheets with one batched read
 
-            # Only include non-empty rows
-            if any(str(v).strip() for v in record.values() if v):
-                records.append(record)
+        Args:
+            month_names: Sheet names, e.g. ["January 2025", "February 2025"];
+                give them in date order so the company name comes from the latest
+            cache: Optional SheetCache; cached sheets are not read again
+                while the spreadsheet is unchanged
+            refresh: Read every sheet from Google even if it is cached
 
+        Returns:
+            Dict of month name to records, for the sheets that exist; the
+            months served from the cache are in self.cached_months
+            (month name -> when it was read from Google)
+        """
+        all_values = {}
+        to_fetch = []
+        self.cached_months = {}
+
+        # Taken before reading, so an edit made during the read makes the
+        # copy look stale rather than current
+        modified_time = None
+        if cache:
+            try:
+                with span('sheets.modified_time'):
+                    modified_time = self.spreadsheet.get_lastUpdateTime()
+            except Exception as e:
+                print(f"Could not check when the spreadsheet last changed ({str(e)}); "
+                      f"reading {month_names[-1] if month_names else 'the newest month'} again")
+
+        for month_name in month_names:
+            entry = None
+            if cache and not refresh:
+                entry = cache.get(month_name, modified_time)
+                # Without a modified time, the newest month may still be being filled in
+                if entry is not None and modified_time is None and month_name == month_names[-1]:
+                    entry = None
+            if entry is None:
+                to_fetch.append(month_name)
+            else:
+                all_values[month_name] = entry['values']
+                self.cached_months[month_name] = entry.get('fetched_at', '')
+
+        if to_fetch:
+            with span('sheets.open_worksheet'):
+                titles = {title.strip().lower(): title for title in self.get_all_sheets()}
+            found = [(month_name, titles[month_name.strip().lower()])
+                     for month_name in to_fetch if month_name.strip().lower() in titles]
+            if found:
+                # One request for every month instead of one per sheet
+                ranges = ["'" + title.replace("'", "''") + "'" for _, title in found]
+                try:
+                    with span('sheets.fetch', sheets=len(found)):
+                        response = self.spreadsheet.values_batch_get(ranges)
+                except Exception as e:
+                    raise Exception(f"Error reading data from worksheets: {str(e)}")
+                for (month_name, _), value_range in zip(found, response.get('valueRanges', [])):
+                    values = value_range.get('values', [])
+                    all_values[month_name] = values
+                    if cache:
+                        cache.put(month_name, values, modified_time)
+
+        months = {}
+        with span('sheets.parse'):
+            for month_name in month_names:
+                if month_name in all_values:
+                    months[month_name] = self._parse_values(all_values[month_name])
+        return months
+
+    def _parse_values(self, all_values):
+        """Turn raw sheet rows into records, remembering the company and app name"""
+        records, company_name, app_name = parse_month_values(all_values)
+        if company_name is not None:
+            self.company_name = company_name
+        if app_name is not None:
+            self.app_name = app_name
         return records
 
     def get_company_info(self):
@@ -0,0 +1,219 @@
+"""
+Lightweight stage timing: named spans and counters.
+
+Code marks a stage with
+
+    with span('pdf.merge'):
+        ...
+
+and a run collects everything recorded between begin_run() and finish():
+
+    run = begin_run('generate January 2025')
+    ...
+    run.finish()
+    print(run.format_summary())
+    run.write_trace('reports')
+
+Spans go to one process-wide recorder, which only keeps them while a run is
+active (or collect() is on, as in pool workers that ship spans back with
+take()), so instrumented code costs next to nothing between runs. Runs that
+overlap (say a send started while slips are generating) each see the other's
+spans as well.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class Instrumentation:
+    """Thread-safe recorder of spans and counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._active_runs = 0
+        self.collecting = False
+        self.spans = []
+        self.counters = {}
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Time the enclosed block as one span"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start, start, **attrs)
+
+    def record(self, name, duration, start=None, **attrs):
+        """Add a span that was timed elsewhere"""
+        if not (self._active_runs or self.collecting):
+            return
+        if start is None:
+            start = time.perf_counter() - duration
+        entry = {
+            'name': name,
+            'start_s': round(start - self._origin, 6),
+            'duration_s': round(duration, 6),
+            'thread': threading.current_thread().name,
+            'pid': os.getpid(),
+        }
+        if attrs:
+            entry['attrs'] = attrs
+        with self._lock:
+            self.spans.append(entry)
+
+    def count(self, name, value=1):
+        if not (self._active_runs or self.collecting):
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def take(self):
+        """Remove and return (spans, counters), e.g. to ship them from a worker process"""
+        with self._lock:
+            spans, counters = self.spans, self.counters
+            self.spans = []
+            self.counters = {}
+        return spans, counters
+
+    def merge(self, spans, counters):
+        """Add spans and counters taken from another recorder"""
+        with self._lock:
+            self.spans.extend(spans)
+            for name, value in counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def begin_run(self, label):
+        """Start collecting a run; the recorder is emptied when no other run is active"""
+        with self._lock:
+            if not self._active_runs:
+                self.spans = []
+                self.counters = {}
+            self._active_runs += 1
+            return RunTrace(self, label, len(self.spans), dict(self.counters))
+
+    def _end_run(self):
+        with self._lock:
+            self._active_runs = max(0, self._active_runs - 1)
+            return list(self.spans), dict(self.counters)
+
+
+class RunTrace:
+    """Spans and counters recorded during one run"""
+
+    def __init__(self, recorder, label, first_span, counters_before):
+        self.recorder = recorder
+        self.label = label
+        self.started_at = datetime.now()
+        self._first_span = first_span
+        self._counters_before = counters_before
+        self._start = time.perf_counter()
+        self.elapsed = None
+        self.spans = []
+        self.counters = {}
+
+    def finish(self):
+        """Stop the run and keep what was recorded during it"""
+        if self.elapsed is not None:
+            return self
+        self.elapsed = time.perf_counter() - self._start
+        spans, counters = self.recorder._end_run()
+        self.spans = spans[self._first_span:]
+        self.counters = {
+            name: value - self._counters_before.get(name, 0)
+            for name, value in counters.items()
+            if value != self._counters_before.get(name, 0)
+        }
+        return self
+
+    def summary_rows(self):
+        """Per-stage count, total, mean and max seconds, slowest total first"""
+        stages = {}
+        for entry in self.spans:
+            stage = stages.setdefault(entry['name'], {'stage': entry['name'], 'count': 0, 'total_s': 0.0, 'max_s': 0.0})
+            stage['count'] += 1
+            stage['total_s'] += entry['duration_s']
+            stage['max_s'] = max(stage['max_s'], entry['duration_s'])
+
+        rows = sorted(stages.values(), key=lambda row: row['total_s'], reverse=True)
+        for row in rows:
+            row['mean_s'] = round(row['total_s'] / row['count'], 6)
+            row['total_s'] = round(row['total_s'], 6)
+        return rows
+
+    def format_summary(self):
+        """Summary as a plain-text table"""
+        elapsed = self.elapsed if self.elapsed is not None else time.perf_counter() - self._start
+        lines = [
+            f"Run: {self.label} ({elapsed:.2f}s)",
+            f"{'Stage':<22} {'Count':>7} {'Total s':>10} {'Mean ms':>10} {'Max ms':>10}",
+            "-" * 63,
+        ]
+        for row in self.summary_rows():
+            lines.append(
+                f"{row['stage']:<22} {row['count']:>7} {row['total_s']:>10.3f} "
+                f"{row['mean_s'] * 1000:>10.2f} {row['max_s'] * 1000:>10.2f}"
+            )
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name:<22} {value:>7}")
+        return "\n".join(lines)
+
+    def write_trace(self, directory="reports"):
+        """
+        Write every span, the counters and the stage summary as JSON lines
+
+        Returns:
+            Path of the trace file
+        """
+        os.makedirs(directory, exist_ok=True)
+        stamp = self.started_at.strftime('%Y%m%d_%H%M%S')
+        label = ''.join(ch if ch.isalnum() else '_' for ch in self.label)
+        path = os.path.join(directory, f"trace_{label}_{stamp}.jsonl")
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'type': 'run', 'label': self.label,
+                                'started_at': self.started_at.isoformat(timespec='seconds'),
+                                'elapsed_s': round(self.elapsed or 0.0, 6)}) + "\n")
+            for entry in self.spans:
+                f.write(json.dumps(dict(entry, type='span')) + "\n")
+            f.write(json.dumps({'type': 'counters', 'counters': self.counters}) + "\n")
+            for row in self.summary_rows():
+                f.write(json.dumps(dict(row, type='summary')) + "\n")
+        return path
+
+
+# Process-wide recorder used by the helpers below
+_recorder = Instrumentation()
+
+
+def span(name, **attrs):
+    return _recorder.span(name, **attrs)
+
+
+def record(name, duration, start=None, **attrs):
+    _recorder.record(name, duration, start, **attrs)
+
+
+def count(name, value=1):
+    _recorder.count(name, value)
+
+
+def begin_run(label):
+    return _recorder.begin_run(label)
+
+
+def collect(enabled=True):
+    """Keep spans even with no run active, for processes that ship them with take()"""
+    _recorder.collecting = enabled
+
+
+def take():
+    return _recorder.take()
+
+
+def merge(spans, counters):
+    _recorder.merge(spans, counters)
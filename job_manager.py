@@ -0,0 +1,125 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class JobCancelled(Exception):
+    """Raised inside a job when it notices it has been cancelled"""
+    pass
+
+
+class JobToken:
+    """
+    Cancellation flag handed to a running job.
+
+    Cancellation is cooperative: the job calls check() (or reads cancelled)
+    between units of work and stops cleanly when asked to.
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self._event = threading.Event()
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def check(self):
+        """Raise JobCancelled if the job has been cancelled"""
+        if self._event.is_set():
+            raise JobCancelled(f"{self.kind} cancelled")
+
+
+class JobManager:
+    """
+    Runs background work on a shared thread pool, one active job per kind.
+
+    Jobs receive a JobToken as their first argument. state_lock guards
+    application state that several kinds of job read and replace (loaded
+    records, the sheets reader, the current selection).
+
+    exclusive lists groups of kinds that must not run together either
+    (e.g. ("generate", "send"), since sending attaches the files that
+    generation writes).
+    """
+
+    def __init__(self, max_workers=3, exclusive=()):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="salary-job")
+        self._lock = threading.Lock()
+        self._active = {}
+        self._exclusive = [set(group) for group in exclusive]
+        self.state_lock = threading.RLock()
+
+    def _blocking_kind(self, kind):
+        """The active kind that keeps `kind` from starting, or None (call with _lock held)"""
+        if kind in self._active:
+            return kind
+        for group in self._exclusive:
+            if kind in group:
+                for other in group:
+                    if other in self._active:
+                        return other
+        return None
+
+    def blocking_kind(self, kind):
+        """The running job kind that would stop a job of `kind` from starting, or None"""
+        with self._lock:
+            return self._blocking_kind(kind)
+
+    def submit(self, kind, func, *args, **kwargs):
+        """
+        Start func(token, *args, **kwargs) unless a job of this kind, or of
+        a kind exclusive with it, is running
+
+        Returns:
+            The JobToken, or None if a conflicting job is already active
+        """
+        with self._lock:
+            if self._blocking_kind(kind):
+                return None
+            token = JobToken(kind)
+            self._active[kind] = token
+
+        def run():
+            try:
+                func(token, *args, **kwargs)
+            except JobCancelled:
+                pass
+            except Exception as e:
+                print(f"Unhandled error in {kind} job: {str(e)}")
+            finally:
+                with self._lock:
+                    if self._active.get(kind) is token:
+                        del self._active[kind]
+
+        try:
+            self._executor.submit(run)
+        except RuntimeError:
+            # Executor already shut down (application closing)
+            with self._lock:
+                self._active.pop(kind, None)
+            return None
+        return token
+
+    def is_running(self, kind):
+        with self._lock:
+            return kind in self._active
+
+    def running_kinds(self):
+        with self._lock:
+            return list(self._active)
+
+    def cancel(self, kind=None):
+        """Ask one job kind (or every active job) to stop"""
+        with self._lock:
+            tokens = list(self._active.values()) if kind is None else [self._active.get(kind)]
+        for token in tokens:
+            if token:
+                token.cancel()
+
+    def shutdown(self, wait=False):
+        """Cancel active jobs and stop accepting new ones"""
+        self.cancel()
+        self._executor.shutdown(wait=wait)
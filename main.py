@@ -1,10 +1,23 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import os
+import sys
+import traceback
+from collections import OrderedDict
 from datetime import datetime
 from google_sheets_reader import GoogleSheetsReader
 from pdf_generator import PDFGenerator
 from email_sender import EmailSender
+from async_email_sender import AsyncEmailSender
+from smtp_throttle import SendQuotaExceeded
+from delivery_report import DeliveryReport
+from employee_search import EmployeeSearchIndex
+from record_fields import get_email, get_name, get_cnic, get_designation, get_email_body, get_email_subject
+from record_validator import validate_records, get_validation_mode
+from employee_table import EmployeeTable
+from job_manager import JobManager
+from instrumentation import span, count, begin_run
+from profiling import RunProfiler, profile_mode_from_env, profile_top_from_env
 import threading
 
 # App Colors
@@ -15,6 +28,9 @@ LIGHT_BG = '#f8f9fa'
 DARK_TEXT = '#333333'
 GRAY_TEXT = '#666666'
 
+# How often the UI applies progress posted by worker threads
+PROGRESS_POLL_MS = 50
+
 
 class RoundedButton(tk.Canvas):
     """Custom rounded button widget"""
@@ -70,35 +86,276 @@ class RoundedButton(tk.Canvas):
 
 class GradientFrame(tk.Canvas):
     """Canvas with gradient background"""
+
+    # Rendered gradients are shared by every GradientFrame and keyed by
+    # colors and size bucket, so resizing back and forth reuses images
+    _image_cache = OrderedDict()
+    CACHE_SIZE = 24
+    SIZE_BUCKET = 32  # pixels
+    REDRAW_DELAY = 60  # ms of quiet before a resize triggers a redraw
+
     def __init__(self, parent, color1, color2, **kwargs):
         super().__init__(parent, **kwargs)
         self.color1 = color1
         self.color2 = color2
-        self.bind("<Configure>", self.draw_gradient)
+        self._image = None
+        self._redraw_job = None
+        self.bind("<Configure>", self.schedule_redraw)
+
+    def schedule_redraw(self, event=None):
+        """Debounce <Configure>: a drag-resize redraws once it settles"""
+        if self._redraw_job is not None:
+            self.after_cancel(self._redraw_job)
+        self._redraw_job = self.after(self.REDRAW_DELAY, self.draw_gradient)
 
     def draw_gradient(self, event=None):
+        self._redraw_job = None
+        # Shows up in the trace of a run that is active while the window redraws
+        with span('ui.gradient'):
+            self._draw_gradient()
+
+    def _draw_gradient(self):
+        width = max(1, self.winfo_width())
+        height = max(1, self.winfo_height())
+
+        # Round up to the bucket; the canvas clips what does not fit
+        bucket_width = -(-width // self.SIZE_BUCKET) * self.SIZE_BUCKET
+        bucket_height = -(-height // self.SIZE_BUCKET) * self.SIZE_BUCKET
+
+        key = (self.color1, self.color2, bucket_width, bucket_height)
+        image = self._image_cache.get(key)
+        if image is None:
+            count('ui.gradient_render')
+            image = self._render_gradient(bucket_width, bucket_height)
+            self._image_cache[key] = image
+            if len(self._image_cache) > self.CACHE_SIZE:
+                self._image_cache.popitem(last=False)
+        else:
+            self._image_cache.move_to_end(key)
+
+        # Keep a reference so Tk does not drop the image
+        self._image = image
         self.delete("gradient")
-        width = self.winfo_width()
-        height = self.winfo_height()
+        self.create_image(0, 0, image=image, anchor=tk.NW, tags="gradient")
+        self.tag_lower("gradient")
 
+    def _render_gradient(self, width, height):
+        """Render the gradient as one image instead of one line per pixel row"""
         r1, g1, b1 = self.hex_to_rgb(self.color1)
         r2, g2, b2 = self.hex_to_rgb(self.color2)
 
+        rows = []
         for i in range(height):
             ratio = i / height
             r = int(r1 + (r2 - r1) * ratio)
             g = int(g1 + (g2 - g1) * ratio)
             b = int(b1 + (b2 - b1) * ratio)
-            color = f"#{r:02x}{g:02x}{b:02x}"
-            self.create_line(0, i, width, i, fill=color, tags="gradient")
+            rows.append(f"{{#{r:02x}{g:02x}{b:02x}}}")
 
-        self.tag_lower("gradient")
+        # Build a one pixel wide column, then let Tk stretch it sideways
+        column = tk.PhotoImage(master=self, width=1, height=height)
+        column.put(" ".join(rows), to=(0, 0))
+        return column.zoom(width, 1)
 
     def hex_to_rgb(self, hex_color):
         hex_color = hex_color.lstrip('#')
         return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
 
 
+class VirtualEmployeeList(tk.Frame):
+    """
+    Scrollable employee checklist that only creates widgets for visible rows.
+
+    A fixed pool of row widgets is re-bound to different employees as the
+    list scrolls, and selection lives in a plain list of booleans, so opening
+    and scrolling cost the same for ten employees or ten thousand.
+    """
+    ROW_HEIGHT = 52
+
+    def __init__(self, parent, items, on_change=None, **kwargs):
+        super().__init__(parent, bg=WHITE, **kwargs)
+        self.items = items  # list of (name, email)
+        self.selected = [False] * len(items)
+        self.selected_count = 0
+        self.visible = list(range(len(items)))  # item indices currently listed
+        self.top = 0  # position in self.visible shown in the first row
+        self.on_change = on_change
+        self.rows = []
+
+        self.scrollbar = tk.Scrollbar(self, orient="vertical", command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        self.body = tk.Frame(self, bg=WHITE)
+        self.body.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.body.bind("<Configure>", self._on_body_resize)
+
+        self.bind_all("<MouseWheel>", self._on_mousewheel)
+        self.bind_all("<Button-4>", lambda e: self.scroll_rows(-1))
+        self.bind_all("<Button-5>", lambda e: self.scroll_rows(1))
+
+    def unbind_scroll(self):
+        """Release the global mouse wheel bindings (call before closing)"""
+        self.unbind_all("<MouseWheel>")
+        self.unbind_all("<Button-4>")
+        self.unbind_all("<Button-5>")
+
+    def _rows_that_fit(self):
+        return max(1, self.body.winfo_height() // self.ROW_HEIGHT)
+
+    def _on_body_resize(self, event):
+        # Grow the pool to cover the new height; rows are never destroyed
+        needed = event.height // self.ROW_HEIGHT + 1
+        while len(self.rows) < needed:
+            self.rows.append(self._create_row(len(self.rows)))
+        self.refresh()
+
+    def _create_row(self, position):
+        row = {'index': None, 'var': tk.BooleanVar(value=False)}
+
+        emp_frame = tk.Frame(self.body, bg=WHITE, pady=2)
+        emp_frame.place(x=0, y=position * self.ROW_HEIGHT, relwidth=1, height=self.ROW_HEIGHT)
+
+        inner_frame = tk.Frame(emp_frame, bg=LIGHT_BG, padx=10, pady=4)
+        inner_frame.pack(fill=tk.BOTH, expand=True)
+
+        cb = tk.Checkbutton(
+            inner_frame,
+            variable=row['var'],
+            bg=LIGHT_BG,
+            activebackground=LIGHT_BG,
+            command=lambda: self._on_check(row)
+        )
+        cb.pack(side=tk.LEFT)
+
+        info_frame = tk.Frame(inner_frame, bg=LIGHT_BG)
+        info_frame.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(6, 0))
+
+        row['name'] = tk.Label(info_frame, font=("Segoe UI", 10, "bold"), bg=LIGHT_BG, fg=DARK_TEXT, anchor=tk.W)
+        row['name'].pack(fill=tk.X)
+        row['email'] = tk.Label(info_frame, font=("Segoe UI", 8), bg=LIGHT_BG, fg=GRAY_TEXT, anchor=tk.W)
+        row['email'].pack(fill=tk.X)
+
+        for widget in (inner_frame, info_frame, row['name'], row['email']):
+            widget.bind("<Button-1>", lambda e: self._toggle(row))
+
+        row['frame'] = emp_frame
+        return row
+
+    def _on_check(self, row):
+        if row['index'] is not None:
+            self._set(row['index'], row['var'].get())
+
+    def _toggle(self, row):
+        if row['index'] is not None:
+            self._set(row['index'], not self.selected[row['index']])
+            row['var'].set(self.selected[row['index']])
+
+    def _set(self, index, value):
+        if self.selected[index] != value:
+            self.selected[index] = value
+            self.selected_count += 1 if value else -1
+            if self.on_change:
+                self.on_change()
+
+    def refresh(self):
+        """Bind the row pool to the employees at the current scroll position"""
+        fit = self._rows_that_fit()
+        self.top = max(0, min(self.top, len(self.visible) - fit))
+
+        for position, row in enumerate(self.rows):
+            slot = self.top + position
+            if slot < len(self.visible):
+                index = self.visible[slot]
+                name, email = self.items[index]
+                row['index'] = index
+                row['name'].configure(text=name)
+                row['email'].configure(text=email)
+                row['var'].set(self.selected[index])
+                row['frame'].place(x=0, y=position * self.ROW_HEIGHT, relwidth=1, height=self.ROW_HEIGHT)
+            else:
+                row['index'] = None
+                row['frame'].place_forget()
+
+        if self.visible:
+            first = self.top / len(self.visible)
+            last = min(1.0, (self.top + fit) / len(self.visible))
+        else:
+            first, last = 0.0, 1.0
+        self.scrollbar.set(first, last)
+
+    def scroll_rows(self, delta):
+        self.top += delta
+        self.refresh()
+
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.top = int(float(amount) * len(self.visible))
+        elif action == "scroll":
+            step = self._rows_that_fit() if unit == "pages" else 1
+            self.top += int(amount) * step
+        self.refresh()
+
+    def _on_mousewheel(self, event):
+        self.scroll_rows(int(-1 * (event.delta / 120)) or (-1 if event.delta > 0 else 1))
+
+    def set_visible(self, indices):
+        """Show only the given item indices (used by the search box)"""
+        self.visible = indices
+        self.top = 0
+        self.refresh()
+
+    def set_all(self, value):
+        self.selected = [value] * len(self.items)
+        self.selected_count = len(self.items) if value else 0
+        self.refresh()
+        if self.on_change:
+            self.on_change()
+
+    def selected_indices(self):
+        return [i for i, value in enumerate(self.selected) if value]
+
+
+class ProgressChannel:
+    """
+    Hand-off point for progress updates from worker threads.
+
+    Workers post as often as they like without touching Tk; only the latest
+    status and progress are kept. Message boxes and callbacks are queued so
+    none is lost. The UI drains the channel on a fixed-rate timer.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._status = None
+        self._progress = None
+        self._messages = []
+        self._callbacks = []
+
+    def post(self, status=None, progress=None, message_type=None, message=None):
+        with self._lock:
+            if status is not None:
+                self._status = status
+            if progress is not None:
+                self._progress = progress
+            if message_type and message:
+                self._messages.append((message_type, message))
+
+    def call_soon(self, func, *args):
+        """Run func(*args) on the UI thread at the next poll"""
+        with self._lock:
+            self._callbacks.append((func, args))
+
+    def drain(self):
+        """Take the pending state: (status, progress, [(message_type, message)], [(func, args)])"""
+        with self._lock:
+            pending = (self._status, self._progress, self._messages, self._callbacks)
+            self._status = None
+            self._progress = None
+            self._messages = []
+            self._callbacks = []
+        return pending
+
+
 class SalaryAutomationApp:
     def __init__(self, root):
         self.root = root
@@ -109,7 +366,18 @@ class SalaryAutomationApp:
 
         # Initialize components
         self.sheets_reader = None
-        self.pdf_generator = PDFGenerator()
+        try:
+            # Compiles the slip layout, so a broken layout file is caught here
+            self.pdf_generator = PDFGenerator()
+        except Exception as e:
+            self.root.withdraw()
+            messagebox.showerror(
+                "Error",
+                f"Could not set up slip generation:\n\n{str(e)}\n\n"
+                "Check config.json and the slip layout (slip_layout_path), then start the app again."
+            )
+            self.root.destroy()
+            sys.exit(1)
         self.email_sender = EmailSender()
 
         # Variables
@@ -117,15 +385,25 @@ class SalaryAutomationApp:
         self.selected_year = tk.StringVar()
         self.status_text = tk.StringVar(value="Ready")
         self.progress_var = tk.DoubleVar()
-        self.employee_records = []
+        self.employee_table = None
         self.selected_employees = []
+        self.last_send_stats = {}
 
         # Card references
         self.card = None
         self.shadow = None
 
+        # Worker threads report through this channel; the UI polls it
+        self.progress = ProgressChannel()
+
+        # Background work runs here, one job per kind ("generate", "send", "load")
+        # Sending attaches the slips that generation writes, so never both at once
+        self.jobs = JobManager(exclusive=[("generate", "send")])
+
         self.setup_ui()
         self.root.bind("<Configure>", self.on_resize)
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self._poll_progress()
 
     def setup_ui(self):
         # Gradient background
@@ -262,14 +540,32 @@ class SalaryAutomationApp:
         self.progress_frame = tk.Frame(self.content, bg=LIGHT_BG, padx=12, pady=12)
         self.progress_frame.pack(fill=tk.X, pady=(5, 12))
 
+        status_row = tk.Frame(self.progress_frame, bg=LIGHT_BG)
+        status_row.pack(fill=tk.X)
+
         self.status_label = tk.Label(
-            self.progress_frame,
+            status_row,
             textvariable=self.status_text,
             font=("Segoe UI", 9),
             bg=LIGHT_BG,
             fg=DARK_TEXT
         )
-        self.status_label.pack(anchor=tk.W)
+        self.status_label.pack(side=tk.LEFT, anchor=tk.W)
+
+        # Shown only while a background job is running
+        self.cancel_btn = RoundedButton(
+            status_row,
+            text="Cancel",
+            command=self.cancel_jobs,
+            bg_color='#e0e0e0',
+            fg_color=DARK_TEXT,
+            hover_color='#d0d0d0',
+            width=70,
+            height=24,
+            corner_radius=12,
+            font=("Segoe UI", 8, "bold")
+        )
+        self.cancel_visible = False
 
         self.progress_bar_bg = tk.Frame(self.progress_frame, bg='#e0e0e0', height=6)
         self.progress_bar_bg.pack(fill=tk.X, pady=(6, 0))
@@ -325,7 +621,6 @@ class SalaryAutomationApp:
         self.card.place(x=card_x, y=card_y, width=card_width, height=card_height)
 
     def update_progress_bar(self, value):
-        self.root.update_idletasks()
         progress_width = self.progress_bar_bg.winfo_width()
         fill_width = int((value / 100) * progress_width)
         self.progress_fill.configure(width=fill_width)
@@ -334,31 +629,127 @@ class SalaryAutomationApp:
         return f"{self.selected_month.get()} {self.selected_year.get()}"
 
     def _get_email_from_record(self, record):
-        email_keys = ['email address', 'Email Address', 'email', 'Email', 'EMAIL', 'E-mail', 'e-mail']
-        for key in email_keys:
-            if key in record and record[key]:
-                return str(record[key]).strip()
-        record_lower = {k.lower(): v for k, v in record.items()}
-        if 'email address' in record_lower and record_lower['email address']:
-            return str(record_lower['email address']).strip()
-        if 'email' in record_lower and record_lower['email']:
-            return str(record_lower['email']).strip()
-        return ''
+        return get_email(record)
 
     def _get_name_from_record(self, record):
-        name_keys = ['Name', 'name', 'NAME', 'Employee Name', 'employee name']
-        for key in name_keys:
-            if key in record and record[key]:
-                return str(record[key]).strip()
-        return 'Unknown'
+        return get_name(record)
+
+    def _get_cnic_from_record(self, record):
+        return get_cnic(record)
+
+    def _get_designation_from_record(self, record):
+        return get_designation(record)
 
     def generate_pdfs(self):
         if not self.selected_month.get() or not self.selected_year.get():
             messagebox.showwarning("Warning", "Please select both month and year")
             return
-        thread = threading.Thread(target=self._generate_pdfs_thread)
-        thread.daemon = True
-        thread.start()
+        sheet_name = self._get_sheet_name()
+        if not self.jobs.submit("generate", self._run_traced, f"generate {sheet_name}",
+                                self._generate_pdfs_thread, sheet_name,
+                                profile_dir=os.path.join("pdfs", "profiles")):
+            self._show_job_conflict("generate")
+
+    def _start_sending(self, records):
+        """Send to the given records on the job pool unless a send or generation is running"""
+        if self.jobs.blocking_kind("send"):
+            self._show_job_conflict("send")
+            return
+        try:
+            # The email config is loaded on first use; a fresh app has not read it yet
+            self.email_sender._ensure_configured()
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Email is not set up: {str(e)}")
+            return
+        with self.jobs.state_lock:
+            self.selected_employees = records
+        sheet_name = self._get_sheet_name()
+        report_dir = self.email_sender.get_report_dir()
+        if not self.jobs.submit("send", self._run_traced, f"send {sheet_name}",
+                                self._send_emails_thread, records, sheet_name,
+                                profile_dir=os.path.join(report_dir, "profiles")):
+            self._show_job_conflict("send")
+
+    def _show_job_conflict(self, kind):
+        """Tell the user which running job keeps a job of `kind` from starting"""
+        running = {
+            "generate": "PDF generation is already running",
+            "send": "Emails are already being sent",
+        }
+        blocking = self.jobs.blocking_kind(kind)
+        message = running.get(blocking, "Another job is already running")
+        if blocking and blocking != kind:
+            message += "; wait for it to finish or cancel it first"
+        messagebox.showinfo("Info", message)
+
+    def _run_traced(self, token, label, job, *args, profile_dir=None):
+        """
+        Run a job, then print its stage timings and write a JSONL trace
+        (its path is shown in the status line). With SALARY_PROFILE set,
+        jobs given a profile_dir are also profiled.
+        """
+        run = begin_run(label)
+        profile_mode = profile_mode_from_env() if profile_dir else None
+        try:
+            if profile_mode:
+                profiler = RunProfiler(label, profile_dir, memory=(profile_mode == 'memory'),
+                                       top=profile_top_from_env())
+                with profiler:
+                    job(token, *args)
+                print(f"Profile: {profiler.prof_path}\nProfile summary: {profiler.summary_path}")
+            else:
+                job(token, *args)
+        finally:
+            run.finish()
+            print(run.format_summary())
+            try:
+                trace_path = run.write_trace(self.email_sender.get_report_dir())
+                self.progress.post(status=f"Ready - trace saved to {trace_path}")
+            except Exception as e:
+                self.progress.post(message_type="warning", message=f"Could not write the run trace: {str(e)}")
+
+    def cancel_jobs(self):
+        """Ask every running job to stop after its current item"""
+        self.jobs.cancel()
+        self.status_text.set("Cancelling...")
+
+    def on_close(self):
+        self.jobs.shutdown()
+        self.root.destroy()
+
+    def _sync_job_controls(self):
+        """Show the Cancel button only while a job is running"""
+        running = bool(self.jobs.running_kinds())
+        if running and not self.cancel_visible:
+            self.cancel_btn.pack(side=tk.RIGHT)
+        elif not running and self.cancel_visible:
+            self.cancel_btn.pack_forget()
+        self.cancel_visible = running
+
+    def _poll_progress(self):
+        """Apply the latest worker progress, then check again in 50 ms"""
+        try:
+            self._sync_job_controls()
+            status, progress, messages, callbacks = self.progress.drain()
+            if status is not None or progress is not None:
+                with span('ui.dispatch'):
+                    self._run_ui_update(self._update_ui, status=status, progress=progress)
+            for message_type, message in messages:
+                self._run_ui_update(self._update_ui, message_type=message_type, message=message)
+            for func, args in callbacks:
+                self._run_ui_update(func, *args)
+        finally:
+            # Rescheduled after any message box closes, so dialogs do not stack up;
+            # an error above must not stop progress updates for the session
+            self.root.after(PROGRESS_POLL_MS, self._poll_progress)
+
+    def _run_ui_update(self, func, *args, **kwargs):
+        """Run one drained update, so a failing one does not lose the rest"""
+        try:
+            func(*args, **kwargs)
+        except Exception as e:
+            print(f"Error updating UI: {str(e)}")
+            traceback.print_exc()
 
     def _update_ui(self, status=None, progress=None, message_type=None, message=None):
         if status is not None:
@@ -376,51 +767,86 @@ class SalaryAutomationApp:
             elif message_type == "warning":
                 messagebox.showwarning("Warning", message)
 
-    def _generate_pdfs_thread(self):
+    def _generate_pdfs_thread(self, token, sheet_name):
         try:
-            self.root.after(0, lambda: self._update_ui(status="Connecting to Google Sheets...", progress=0))
+            self.progress.post(status="Connecting to Google Sheets...", progress=0)
 
-            self.sheets_reader = GoogleSheetsReader()
-            sheet_name = self._get_sheet_name()
+            sheets_reader = GoogleSheetsReader()
 
-            self.root.after(0, lambda: self._update_ui(status=f"Fetching data for {sheet_name}..."))
+            self.progress.post(status=f"Fetching data for {sheet_name}...")
 
-            records = self.sheets_reader.get_month_data(sheet_name)
-            self.employee_records = records
+            records = sheets_reader.get_month_data(sheet_name)
+            table = EmployeeTable(records, sheet_name, self.pdf_generator.get_pdf_filename)
+            with self.jobs.state_lock:
+                self.sheets_reader = sheets_reader
+                self.employee_table = table
 
-            company_info = self.sheets_reader.get_company_info()
+            company_info = sheets_reader.get_company_info()
             self.pdf_generator.set_company_info(
                 company_info.get('company_name', ''),
                 company_info.get('app_name', '')
             )
 
             if not records:
-                self.root.after(0, lambda: self._update_ui(
+                self.progress.post(
                     status="Ready", progress=0,
                     message_type="info", message=f"No records found for {sheet_name}"
-                ))
+                )
                 return
 
+            # Check every row up front instead of finding bad ones slip by slip
+            self.progress.post(status=f"Checking {len(records)} records...")
+            validation = validate_records(records, sheet_name, table)
+            if validation.problems:
+                print(validation.format_summary(limit=len(validation.problems)))
+                report_path = validation.write(sheets_reader.config.get('report_dir', 'reports'))
+            if validation.errors:
+                mode = get_validation_mode(sheets_reader.config)
+                message = f"{validation.format_summary(limit=10)}\n\nFull list: {report_path}"
+                if mode == 'block':
+                    self.progress.post(
+                        status="Ready", progress=0,
+                        message_type="error", message=f"{message}\n\nFix these rows and generate again."
+                    )
+                    return
+                if mode == 'skip':
+                    records = validation.valid_records()
+                    message += f"\n\nGenerating slips for the other {len(records)} employees."
+                self.progress.post(message_type="warning", message=message)
+                if not records:
+                    self.progress.post(status="Ready", progress=0)
+                    return
+
             os.makedirs("pdfs", exist_ok=True)
             total = len(records)
+            total_bytes = 0
 
             for idx, record in enumerate(records, 1):
-                self.root.after(0, lambda i=idx, t=total: self._update_ui(status=f"Generating PDF {i}/{t}..."))
+                if token.cancelled:
+                    self.progress.post(
+                        status="Ready", progress=0,
+                        message_type="info", message=f"Generation cancelled after {idx - 1} of {total} PDFs"
+                    )
+                    return
+                self.progress.post(status=f"Generating PDF {idx}/{total}...")
                 self.pdf_generator.create_pdf(record, sheet_name)
+                total_bytes += self.pdf_generator.last_pdf_size
                 progress = (idx / total) * 100
-                self.root.after(0, lambda p=progress: self._update_ui(progress=p))
+                self.progress.post(progress=progress)
 
-            self.root.after(0, lambda: self._update_ui(
+            average_kb = total_bytes / total / 1024
+            self.progress.post(
                 status="Ready", progress=0,
-                message_type="success", message=f"Generated {total} PDFs successfully!"
-            ))
+                message_type="success",
+                message=f"Generated {total} PDFs successfully!\nAverage slip size: {average_kb:.1f} KB"
+            )
 
         except Exception as e:
             error_msg = str(e)
-            self.root.after(0, lambda msg=error_msg: self._update_ui(
+            self.progress.post(
                 status="Ready", progress=0,
-                message_type="error", message=f"Error: {msg}"
-            ))
+                message_type="error", message=f"Error: {error_msg}"
+            )
 
     def send_emails(self, mode):
         if not self.selected_month.get() or not self.selected_year.get():
@@ -428,48 +854,68 @@ class SalaryAutomationApp:
             return
 
         if mode == "selective":
-            self.show_employee_selector()
+            self._with_employees(self.show_employee_selector)
         else:
-            if not self.employee_records:
-                try:
-                    self.status_text.set("Loading employees...")
-                    self.root.update()
-                    if not self.sheets_reader:
-                        self.sheets_reader = GoogleSheetsReader()
-                    self.employee_records = self.sheets_reader.get_month_data(self._get_sheet_name())
-                    self.status_text.set("Ready")
-                except Exception as e:
-                    messagebox.showerror("Error", f"Failed to load employees: {str(e)}")
-                    return
-
-            if not self.employee_records:
-                messagebox.showinfo("Info", "No employees found")
-                return
+            self._with_employees(self._confirm_send_all)
+
+    def _with_employees(self, on_loaded):
+        """
+        Call on_loaded(table) on the UI thread once the selected month's
+        EmployeeTable is available, fetching it on the job pool if needed
+        """
+        sheet_name = self._get_sheet_name()
+        with self.jobs.state_lock:
+            table = self.employee_table
+        if table and table.sheet_name == sheet_name:
+            on_loaded(table)
+            return
 
-            count = len(self.employee_records)
-            if messagebox.askyesno("Confirm", f"Send emails to all {count} employees?"):
-                self.selected_employees = self.employee_records
-                thread = threading.Thread(target=self._send_emails_thread)
-                thread.daemon = True
-                thread.start()
+        if not self.jobs.submit("load", self._run_traced, f"load {sheet_name}",
+                                self._load_employees_thread, sheet_name, on_loaded):
+            messagebox.showinfo("Info", "Employees are already loading")
+            return
+        self.status_text.set("Loading employees...")
 
-    def show_employee_selector(self):
-        """Show improved employee selection dialog"""
-        if not self.employee_records:
-            try:
-                self.status_text.set("Loading employees...")
-                self.root.update()
-                if not self.sheets_reader:
-                    self.sheets_reader = GoogleSheetsReader()
-                self.employee_records = self.sheets_reader.get_month_data(self._get_sheet_name())
-                self.status_text.set("Ready")
-            except Exception as e:
-                messagebox.showerror("Error", f"Failed to load employees: {str(e)}")
-                return
+    def _load_employees_thread(self, token, sheet_name, on_loaded):
+        try:
+            with self.jobs.state_lock:
+                sheets_reader = self.sheets_reader
+            if not sheets_reader:
+                sheets_reader = GoogleSheetsReader()
+            records = sheets_reader.get_month_data(sheet_name)
+            table = EmployeeTable(records, sheet_name, self.pdf_generator.get_pdf_filename)
+            with self.jobs.state_lock:
+                self.sheets_reader = sheets_reader
+                self.employee_table = table
+        except Exception as e:
+            self.progress.post(
+                status="Ready",
+                message_type="error", message=f"Failed to load employees: {str(e)}"
+            )
+            return
 
-        if not self.employee_records:
-            messagebox.showinfo("Info", "No employees found")
+        self.progress.post(status="Ready")
+        if token.cancelled:
             return
+        if not records:
+            self.progress.post(message_type="info", message="No employees found")
+            return
+        if table.conflicts:
+            # Shared CNICs or slip filenames mean a slip may go to the wrong person
+            validation = validate_records(records, sheet_name, table)
+            self.progress.post(message_type="warning", message=validation.format_summary(limit=10))
+        self.progress.call_soon(on_loaded, table)
+
+    def _confirm_send_all(self, table):
+        count = len(table)
+        if messagebox.askyesno("Confirm", f"Send emails to all {count} employees?"):
+            self._start_sending(table.records)
+
+    def show_employee_selector(self, table):
+        """Show improved employee selection dialog"""
+        records = table.records
+        # Rows are looked up by key when sending, not by list position
+        keys = list(table.keys)
 
         # Create dialog
         dialog = tk.Toplevel(self.root)
@@ -505,10 +951,6 @@ class SalaryAutomationApp:
         content = tk.Frame(card, bg=WHITE, padx=25, pady=20)
         content.pack(fill=tk.BOTH, expand=True)
 
-        # Variables
-        checkbox_vars = []
-        employee_frames = []
-
         # Header
         header_frame = tk.Frame(content, bg=WHITE)
         header_frame.pack(fill=tk.X, pady=(0, 12))
@@ -569,18 +1011,13 @@ class SalaryAutomationApp:
         action_frame.pack(fill=tk.X, pady=(0, 8))
 
         def update_count():
-            count = sum(1 for var in checkbox_vars if var.get())
-            selected_count_var.set(f"{count} selected")
+            selected_count_var.set(f"{employee_list.selected_count} selected")
 
         def select_all():
-            for var in checkbox_vars:
-                var.set(True)
-            update_count()
+            employee_list.set_all(True)
 
         def deselect_all():
-            for var in checkbox_vars:
-                var.set(False)
-            update_count()
+            employee_list.set_all(False)
 
         select_all_btn = RoundedButton(
             action_frame,
@@ -615,116 +1052,66 @@ class SalaryAutomationApp:
         list_container.pack(fill=tk.BOTH, expand=True)
         list_container.pack_propagate(False)
 
-        canvas = tk.Canvas(list_container, bg=WHITE, highlightthickness=0)
-        scrollbar = tk.Scrollbar(list_container, orient="vertical", command=canvas.yview)
-        scrollable_frame = tk.Frame(canvas, bg=WHITE)
-
-        scrollable_frame.bind("<Configure>", lambda e: canvas.configure(scrollregion=canvas.bbox("all")))
-        canvas_frame = canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-
-        def on_canvas_configure(e):
-            canvas.itemconfig(canvas_frame, width=e.width)
-
-        canvas.bind("<Configure>", on_canvas_configure)
-        canvas.configure(yscrollcommand=scrollbar.set)
-
-        def on_mousewheel(event):
-            canvas.yview_scroll(int(-1 * (event.delta / 120)), "units")
-
-        canvas.bind_all("<MouseWheel>", on_mousewheel)
-
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-
-        # Create employee items
-        for idx, record in enumerate(self.employee_records):
-            var = tk.BooleanVar(value=False)
-            checkbox_vars.append(var)
-
-            name = self._get_name_from_record(record)
-            email = self._get_email_from_record(record)
-
-            emp_frame = tk.Frame(scrollable_frame, bg=WHITE, pady=2)
-            emp_frame.pack(fill=tk.X)
-            employee_frames.append((emp_frame, name, email))
+        employee_names = []
+        employee_emails = []
+        for record in records:
+            employee_names.append(self._get_name_from_record(record))
+            employee_emails.append(self._get_email_from_record(record))
 
-            inner_frame = tk.Frame(emp_frame, bg=LIGHT_BG, padx=10, pady=8)
-            inner_frame.pack(fill=tk.X)
-
-            cb = tk.Checkbutton(
-                inner_frame,
-                variable=var,
-                bg=LIGHT_BG,
-                activebackground=LIGHT_BG,
-                command=update_count
-            )
-            cb.pack(side=tk.LEFT)
-
-            info_frame = tk.Frame(inner_frame, bg=LIGHT_BG)
-            info_frame.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(6, 0))
-
-            tk.Label(
-                info_frame,
-                text=name,
-                font=("Segoe UI", 10, "bold"),
-                bg=LIGHT_BG,
-                fg=DARK_TEXT
-            ).pack(anchor=tk.W)
-
-            if email:
-                tk.Label(
-                    info_frame,
-                    text=email,
-                    font=("Segoe UI", 8),
-                    bg=LIGHT_BG,
-                    fg=GRAY_TEXT
-                ).pack(anchor=tk.W)
-
-            def make_toggle(v):
-                def toggle(e):
-                    v.set(not v.get())
-                    update_count()
-                return toggle
-
-            inner_frame.bind("<Button-1>", make_toggle(var))
-            for child in inner_frame.winfo_children():
-                if not isinstance(child, tk.Checkbutton):
-                    child.bind("<Button-1>", make_toggle(var))
-
-        # Search filter
-        def filter_employees(*args):
-            search_text = search_var.get().lower()
-            if search_text == "search employees...":
+        employee_list = VirtualEmployeeList(
+            list_container,
+            list(zip(employee_names, employee_emails)),
+            on_change=update_count
+        )
+        employee_list.pack(fill=tk.BOTH, expand=True)
+
+        # Search filter over a prebuilt index, run once typing pauses
+        search_index = EmployeeSearchIndex([
+            (name, email, self._get_cnic_from_record(record), self._get_designation_from_record(record))
+            for name, email, record in zip(employee_names, employee_emails, records)
+        ])
+        search_job = [None]
+
+        def filter_employees():
+            search_job[0] = None
+            search_text = search_var.get()
+            if search_text == "Search employees...":
                 search_text = ""
-            for emp_frame, name, email in employee_frames:
-                if search_text in name.lower() or search_text in email.lower():
-                    emp_frame.pack(fill=tk.X)
-                else:
-                    emp_frame.pack_forget()
+            employee_list.set_visible(search_index.search(search_text))
 
-        search_var.trace("w", filter_employees)
+        def schedule_filter(*args):
+            if search_job[0] is not None:
+                dialog.after_cancel(search_job[0])
+            search_job[0] = dialog.after(120, filter_employees)
+
+        search_var.trace("w", schedule_filter)
 
         # Bottom buttons
         btn_frame = tk.Frame(content, bg=WHITE)
         btn_frame.pack(fill=tk.X, pady=(12, 0))
 
+        def close_dialog():
+            # A search still waiting to run would touch the destroyed list
+            if search_job[0] is not None:
+                dialog.after_cancel(search_job[0])
+                search_job[0] = None
+            employee_list.unbind_scroll()
+            dialog.destroy()
+
         def on_send():
-            selected_indices = [i for i, var in enumerate(checkbox_vars) if var.get()]
+            selected_indices = employee_list.selected_indices()
             if not selected_indices:
                 messagebox.showwarning("Warning", "Please select at least one employee", parent=dialog)
                 return
-            self.selected_employees = [self.employee_records[i] for i in selected_indices]
-            count = len(self.selected_employees)
-            canvas.unbind_all("<MouseWheel>")
+            selected = [table.by_key(keys[i]) for i in selected_indices]
+            count = len(selected)
+            employee_list.unbind_scroll()
             if messagebox.askyesno("Confirm", f"Send emails to {count} selected employee(s)?", parent=dialog):
-                dialog.destroy()
-                thread = threading.Thread(target=self._send_emails_thread)
-                thread.daemon = True
-                thread.start()
+                close_dialog()
+                self._start_sending(selected)
 
         def on_cancel():
-            canvas.unbind_all("<MouseWheel>")
-            dialog.destroy()
+            close_dialog()
 
         cancel_btn = RoundedButton(
             btn_frame,
@@ -772,81 +1159,159 @@ class SalaryAutomationApp:
         dialog.bind("<Configure>", on_dialog_resize)
         on_dialog_resize()
 
-    def _send_emails_thread(self):
+    def _send_emails_thread(self, token, records, sheet_name):
         try:
-            self.root.after(0, lambda: self._update_ui(status="Sending emails...", progress=0))
-
-            sheet_name = self._get_sheet_name()
-            records = self.selected_employees
+            self.progress.post(status="Sending emails...", progress=0)
 
             pdfs_dir = "pdfs"
             if not os.path.exists(pdfs_dir):
-                self.root.after(0, lambda: self._update_ui(
+                self.progress.post(
                     status="Ready", progress=0,
                     message_type="warning", message="PDFs not found. Please generate PDFs first."
-                ))
+                )
                 return
 
             total = len(records)
-            success = 0
-            fail = 0
+            throttle = self.email_sender.create_throttle()
+            report = DeliveryReport(sheet_name, self.email_sender.config.get('report_dir', 'reports'))
+
+            if self.email_sender.config.get('email_backend', 'smtp') == 'async':
+                self._send_emails_async(token, records, sheet_name, pdfs_dir, throttle, report)
+                return
 
             for idx, record in enumerate(records, 1):
                 email = self._get_email_from_record(record)
                 name = self._get_name_from_record(record)
 
+                if token.cancelled:
+                    for remaining in records[idx - 1:]:
+                        report.add(self._get_name_from_record(remaining),
+                                   self._get_email_from_record(remaining), 'not_sent',
+                                   error="Cancelled")
+                    break
+
                 if not email or '@' not in email:
-                    fail += 1
+                    report.add(name, email, 'skipped', error="Invalid email address")
                     continue
 
-                self.root.after(0, lambda i=idx, t=total, n=name: self._update_ui(
-                    status=f"Sending {i}/{t}: {n}..."
-                ))
+                self.progress.post(status=f"Sending {idx}/{total}: {name}...")
 
                 pdf_filename = self.pdf_generator.get_pdf_filename(record, sheet_name)
                 pdf_path = os.path.join(pdfs_dir, pdf_filename)
 
                 if not os.path.exists(pdf_path):
-                    fail += 1
+                    report.add(name, email, 'skipped', error=f"PDF not found: {pdf_filename}")
                     continue
 
+                send_stats = {}
+                retries_before = throttle.retries
                 try:
-                    self.email_sender.send_email(
+                    throttle.send(
+                        self.email_sender.send_email,
                         to_email=email,
-                        subject=f"Salary Statement - {sheet_name}",
+                        subject=get_email_subject(sheet_name),
                         body=self._get_email_body(record, sheet_name),
-                        pdf_path=pdf_path
+                        pdf_path=pdf_path,
+                        stats=send_stats
                     )
-                    success += 1
+                    report.add(name, email, 'sent', send_stats, attempts=throttle.retries - retries_before + 1)
+                except SendQuotaExceeded as e:
+                    # Retrying is pointless until the quota resets
+                    print(f"Sending quota reached at {email}: {str(e)}")
+                    report.add(name, email, 'not_sent', send_stats, error=str(e))
+                    for remaining in records[idx:]:
+                        report.add(self._get_name_from_record(remaining),
+                                   self._get_email_from_record(remaining), 'not_sent',
+                                   error="Sending quota reached")
+                    break
                 except Exception as e:
                     print(f"Error sending to {email}: {str(e)}")
-                    fail += 1
+                    report.add(name, email, 'failed', send_stats,
+                               attempts=throttle.retries - retries_before + 1, error=str(e))
 
                 progress = (idx / total) * 100
-                self.root.after(0, lambda p=progress: self._update_ui(progress=p))
+                self.progress.post(progress=progress)
 
-            self.root.after(0, lambda s=success, f=fail: self._update_ui(
-                status="Ready", progress=0,
-                message_type="info", message=f"Emails sent!\nSuccess: {s}\nFailed: {f}"
-            ))
+            self._report_send_results(report, throttle, cancelled=token.cancelled)
 
         except Exception as e:
             error_msg = str(e)
-            self.root.after(0, lambda msg=error_msg: self._update_ui(
+            self.progress.post(
                 status="Ready", progress=0,
-                message_type="error", message=f"Error: {msg}"
-            ))
-
-    def _get_email_body(self, record, month_name):
-        name = self._get_name_from_record(record)
-        return f"""Dear {name},
-
-Please find attached your salary statement for {month_name}.
+                message_type="error", message=f"Error: {error_msg}"
+            )
 
-If you have any questions, please contact HR.
+    def _send_emails_async(self, token, records, sheet_name, pdfs_dir, throttle, report):
+        """Send through the asyncio engine (email_backend = "async" in config.json)"""
+        messages = []
+        names = []
+        for record in records:
+            email = self._get_email_from_record(record)
+            name = self._get_name_from_record(record)
+            if not email or '@' not in email:
+                report.add(name, email, 'skipped', error="Invalid email address")
+                continue
+
+            pdf_filename = self.pdf_generator.get_pdf_filename(record, sheet_name)
+            pdf_path = os.path.join(pdfs_dir, pdf_filename)
+            if not os.path.exists(pdf_path):
+                report.add(name, email, 'skipped', error=f"PDF not found: {pdf_filename}")
+                continue
+
+            names.append(name)
+            messages.append({
+                'to_email': email,
+                'subject': get_email_subject(sheet_name),
+                'body': self._get_email_body(record, sheet_name),
+                'pdf_path': pdf_path
+            })
+
+        def on_progress(done, total, message):
+            self.progress.post(status=f"Sent {done}/{total}: {message['to_email']}", progress=(done / total) * 100)
+
+        async_sender = AsyncEmailSender(self.email_sender.config_file)
+        results = async_sender.send_batch(messages, throttle=throttle, progress_callback=on_progress,
+                                          should_stop=lambda: token.cancelled)
+
+        for name, result in zip(names, results):
+            if result['error']:
+                print(f"Error sending to {result['to_email']}: {result['error']}")
+            report.add(name, result['to_email'], result['status'], result['stats'],
+                       attempts=result['stats'].get('attempts', 1), error=result['error'])
+
+        self._report_send_results(report, throttle, cancelled=token.cancelled)
+
+    def _report_send_results(self, report, throttle, cancelled=False):
+        stats = throttle.stats()
+        self.last_send_stats = stats
+
+        report.finish()
+        try:
+            csv_path, _ = report.write()
+            report_line = f"\n\nReport: {csv_path}"
+        except OSError as e:
+            print(f"Error writing delivery report: {str(e)}")
+            report_line = ""
+
+        success = report.count('sent')
+        fail = report.count('failed') + report.count('skipped')
+        not_sent = report.count('not_sent')
+
+        message = (f"Emails sent!\nSuccess: {success}\nFailed: {fail}\n"
+                   f"Deferrals: {stats['deferrals']}\nRetries: {stats['retries']}")
+        if not_sent and cancelled:
+            message += f"\n\nCancelled - {not_sent} not sent."
+        elif not_sent:
+            message += f"\n\nSending quota reached - {not_sent} not sent. Try again later."
+        message += report_line
+
+        self.progress.post(
+            status="Ready", progress=0,
+            message_type="info", message=message
+        )
 
-Best regards,
-HR Department"""
+    def _get_email_body(self, record, month_name):
+        return get_email_body(record, month_name)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,168 @@
+"""
+Run metrics for unattended payroll runs.
+
+Writes the counts and timings of one run either in Prometheus text format
+(for the node exporter textfile collector) or as JSON. The file is replaced
+atomically so a scrape never sees half a file.
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+METRIC_PREFIX = 'payroll'
+
+# (summary key, metric name, help text)
+RUN_COUNTS = [
+    ('records', 'records', "Employee records fetched for the run"),
+    ('invalid', 'records_invalid', "Records with validation errors"),
+    ('rendered', 'slips_rendered', "Salary slips rendered"),
+    ('render_failed', 'slips_failed', "Salary slips that failed to render"),
+    ('bytes_written', 'slip_bytes_written', "Bytes of PDF written"),
+    ('sent', 'messages_sent', "Emails delivered"),
+    ('failed', 'messages_failed', "Emails that failed after retries"),
+    ('skipped', 'messages_skipped', "Recipients skipped (bad address or missing PDF)"),
+    ('not_sent', 'messages_not_sent', "Recipients not reached (quota or cancel)"),
+    ('retries', 'messages_retried', "SMTP retries after transient errors"),
+    ('deferrals', 'messages_deferred', "Transient SMTP deferrals"),
+]
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process in bytes (None where unknown)"""
+    try:
+        import resource
+    except ImportError:
+        resource = None
+
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS and kilobytes elsewhere
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory = psutil.Process().memory_info()
+    # peak_wset is the Windows peak working set
+    return getattr(memory, 'peak_wset', memory.rss)
+
+
+def peak_child_rss_bytes():
+    """Largest peak RSS among finished child processes, e.g. render workers"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def build_metrics(summary, labels=None):
+    """
+    Turn a run summary (from payroll_cli.run_payroll) into metric samples
+
+    Returns:
+        List of dicts with name, help, labels and value
+    """
+    labels = dict(labels or {})
+    labels.setdefault('sheet', summary.get('sheet', ''))
+
+    problems = sum(summary.get(key, 0) or 0 for key in ('invalid', 'render_failed', 'failed', 'skipped', 'not_sent'))
+    metrics = [
+        {'name': 'run_timestamp_seconds', 'help': "Unix time the run finished",
+         'labels': labels, 'value': round(time.time(), 3)},
+        {'name': 'run_duration_seconds', 'help': "Wall-clock duration of the run",
+         'labels': labels, 'value': summary.get('elapsed_s', 0.0)},
+        {'name': 'run_success', 'help': "1 if every record was valid, every slip rendered and every email was delivered",
+         'labels': labels, 'value': 0 if problems or summary.get('error') else 1},
+    ]
+    for key, name, help_text in RUN_COUNTS:
+        metrics.append({'name': name, 'help': help_text, 'labels': labels, 'value': summary.get(key, 0) or 0})
+
+    for stage in summary.get('stages', []):
+        stage_labels = dict(labels, stage=stage['stage'])
+        metrics.append({'name': 'stage_duration_seconds', 'help': "Total time spent in a stage",
+                        'labels': stage_labels, 'value': stage['total_s']})
+        metrics.append({'name': 'stage_max_seconds', 'help': "Slowest single span of a stage",
+                        'labels': stage_labels, 'value': stage['max_s']})
+        metrics.append({'name': 'stage_spans', 'help': "Number of spans recorded for a stage",
+                        'labels': stage_labels, 'value': stage['count']})
+
+    rss = peak_rss_bytes()
+    if rss is not None:
+        metrics.append({'name': 'peak_rss_bytes', 'help': "Peak resident memory of the runner process",
+                        'labels': labels, 'value': rss})
+    child_rss = peak_child_rss_bytes()
+    if child_rss:
+        metrics.append({'name': 'peak_worker_rss_bytes', 'help': "Peak resident memory of the largest worker process",
+                        'labels': labels, 'value': child_rss})
+    return metrics
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_prometheus(metrics):
+    """Render samples in the Prometheus text exposition format"""
+    # Every sample of a metric has to follow its HELP/TYPE lines
+    families = {}
+    for metric in metrics:
+        families.setdefault(metric['name'], []).append(metric)
+
+    lines = []
+    for short_name, samples in families.items():
+        name = f"{METRIC_PREFIX}_{short_name}"
+        lines.append(f"# HELP {name} {samples[0]['help']}")
+        lines.append(f"# TYPE {name} gauge")
+        for metric in samples:
+            label_text = ','.join(f'{key}="{_escape_label(value)}"' for key, value in sorted(metric['labels'].items()))
+            lines.append(f"{name}{{{label_text}}} {metric['value']}")
+    return "\n".join(lines) + "\n"
+
+
+def format_json(metrics):
+    """Render samples as JSON: run-level metrics, plus per-stage metrics keyed by stage"""
+    document = {'labels': {}, 'metrics': {}, 'stages': {}}
+    for metric in metrics:
+        labels = dict(metric['labels'])
+        stage = labels.pop('stage', None)
+        name = f"{METRIC_PREFIX}_{metric['name']}"
+        if stage:
+            document['stages'].setdefault(stage, {})[name] = metric['value']
+        else:
+            document['labels'] = labels
+            document['metrics'][name] = metric['value']
+    return json.dumps(document, indent=2) + "\n"
+
+
+def write_metrics(summary, path, fmt=None, labels=None):
+    """
+    Write the run's metrics to path, replacing any previous file atomically
+
+    Args:
+        fmt: 'prometheus' or 'json'; chosen from the extension when omitted
+            (.json is JSON, anything else Prometheus text)
+    """
+    if fmt is None:
+        fmt = 'json' if path.lower().endswith('.json') else 'prometheus'
+    metrics = build_metrics(summary, labels)
+    content = format_json(metrics) if fmt == 'json' else format_prometheus(metrics)
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    # Write beside the target so os.replace stays on one filesystem
+    fd, tmp_path = tempfile.mkstemp(prefix='.metrics_', dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return path
@@ -0,0 +1,454 @@
+"""
+Headless payroll runner: fetch, generate and send without the Tk GUI.
+
+Usage:
+    python payroll_cli.py --month January --year 2025 --workers 4
+    python payroll_cli.py --month January --year 2025 --dry-run
+    python payroll_cli.py --month January --year 2025 --skip-generate
+    python payroll_cli.py --month January --year 2025 --profile memory
+    python payroll_cli.py --month January --year 2025 --employees 35202-1234567-1 ali@example.com
+    python payroll_cli.py --month January --year 2025 --generated-on 2025-02-01
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from google_sheets_reader import GoogleSheetsReader
+from pdf_generator import PDFGenerator, parse_generation_date
+from email_sender import EmailSender
+from async_email_sender import AsyncEmailSender
+from smtp_throttle import SendQuotaExceeded
+from delivery_report import DeliveryReport
+from record_fields import get_email, get_name, get_email_body, get_email_subject
+from profiling import RunProfiler, WorkerProfiler, profile_mode_from_env, profile_top_from_env
+from metrics_export import write_metrics
+from record_validator import validate_records, get_validation_mode, VALIDATION_MODES
+from employee_table import EmployeeTable
+from slip_archive import SlipArchive
+import instrumentation
+
+MONTHS = ["January", "February", "March", "April", "May", "June",
+          "July", "August", "September", "October", "November", "December"]
+
+# PDF generator (and profiler, when profiling) of a pool worker process
+_worker_generator = None
+_worker_profiler = None
+
+
+def _init_worker(config_file, company_info, profile_dir=None):
+    global _worker_profiler
+    # A forked worker inherits the parent's tracemalloc, which slows it down
+    # several times over; allocation summaries cover the parent only
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _worker_profiler = WorkerProfiler(profile_dir) if profile_dir else None
+    # Drop spans inherited from the parent so each slip ships only its own
+    instrumentation.take()
+    instrumentation.collect()
+    _load_generator(config_file, company_info)
+
+
+def _load_generator(config_file, company_info):
+    global _worker_generator
+    _worker_generator = PDFGenerator(config_file)
+    _worker_generator.set_company_info(
+        company_info.get('company_name', ''),
+        company_info.get('app_name', '')
+    )
+
+
+def _render_slip(job):
+    """Render one slip; errors are returned so one bad row does not stop the batch"""
+    record, sheet_name, output_dir = job
+    try:
+        if _worker_profiler:
+            with _worker_profiler:
+                pdf_path = _worker_generator.create_pdf(record, sheet_name, output_dir)
+        else:
+            pdf_path = _worker_generator.create_pdf(record, sheet_name, output_dir)
+        return pdf_path, _worker_generator.last_pdf_size, None, instrumentation.take()
+    except Exception as e:
+        return None, 0, f"{get_name(record)}: {str(e)}", instrumentation.take()
+
+
+def generate_slips(records, sheet_name, company_info, config_file="config.json",
+                   output_dir="pdfs", workers=1, profile_dir=None):
+    """
+    Render every slip, across worker processes when workers > 1
+
+    When profile_dir is set, each worker process dumps its own cProfile
+    stats there so they can be merged into the run's profile.
+
+    Returns:
+        Dict with rendered, failed, bytes_written and errors
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = [(record, sheet_name, output_dir) for record in records]
+
+    if workers <= 1:
+        # In this process: keep the spans recorded so far (fetch, validate)
+        _load_generator(config_file, company_info)
+        jobs_map = map
+    else:
+        # Prepare the stamps once here so each worker loads them from the asset cache
+        generator = PDFGenerator(config_file)
+        if generator.asset_cache:
+            try:
+                generator.prepare_assets()
+            except Exception as e:
+                # Each slip reports the problem again and is counted as failed
+                print(f"Could not prepare slip assets: {str(e)}")
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(config_file, company_info, profile_dir))
+        chunksize = max(1, len(jobs) // (workers * 4))
+        jobs_map = lambda func, items: pool.map(func, items, chunksize=chunksize)
+
+    # Same process or not, spans come back with each slip and are merged here
+    results = []
+    try:
+        for pdf_path, size, error, (spans, counters) in jobs_map(_render_slip, jobs):
+            instrumentation.merge(spans, counters)
+            results.append((size, error))
+    finally:
+        if workers > 1:
+            pool.shutdown()
+
+    errors = [error for _, error in results if error]
+    return {
+        'rendered': len(results) - len(errors),
+        'failed': len(errors),
+        'bytes_written': sum(size for size, _ in results),
+        'errors': errors
+    }
+
+
+def _build_messages(records, sheet_name, pdf_generator, output_dir, report):
+    """Turn records into send jobs, recording the ones that cannot be sent"""
+    messages = []
+    for record in records:
+        name = get_name(record)
+        email = get_email(record)
+        if not email or '@' not in email:
+            report.add(name, email, 'skipped', error="Invalid email address")
+            continue
+
+        pdf_filename = pdf_generator.get_pdf_filename(record, sheet_name)
+        pdf_path = os.path.join(output_dir, pdf_filename)
+        if not os.path.exists(pdf_path):
+            report.add(name, email, 'skipped', error=f"PDF not found: {pdf_filename}")
+            continue
+
+        messages.append((name, {
+            'to_email': email,
+            'subject': get_email_subject(sheet_name),
+            'body': get_email_body(record, sheet_name),
+            'pdf_path': pdf_path
+        }))
+    return messages
+
+
+def send_slips(records, sheet_name, config_file="config.json", output_dir="pdfs", workers=1):
+    """
+    Email every slip, with up to `workers` SMTP conversations at once
+
+    Returns:
+        (DeliveryReport, throttle stats dict)
+    """
+    email_sender = EmailSender(config_file)
+    throttle = email_sender.create_throttle()
+    report = DeliveryReport(sheet_name, email_sender.config.get('report_dir', 'reports'))
+    messages = _build_messages(records, sheet_name, PDFGenerator(None), output_dir, report)
+
+    if email_sender.config.get('email_backend', 'smtp') == 'async':
+        async_sender = AsyncEmailSender(config_file, concurrency=workers)
+        results = async_sender.send_batch([message for _, message in messages], throttle=throttle)
+        for (name, _), result in zip(messages, results):
+            report.add(name, result['to_email'], result['status'], result['stats'],
+                       attempts=result['stats'].get('attempts', 1), error=result['error'])
+    else:
+        quota_reached = threading.Event()
+
+        def deliver(item):
+            name, message = item
+            if quota_reached.is_set():
+                return name, message['to_email'], 'not_sent', {}, 0, "Sending quota reached"
+            stats = {}
+            attempts = [0]
+
+            def send_once(**kwargs):
+                attempts[0] += 1
+                return email_sender.send_email(**kwargs)
+
+            try:
+                throttle.send(send_once, stats=stats, **message)
+                return name, message['to_email'], 'sent', stats, attempts[0], None
+            except SendQuotaExceeded as e:
+                quota_reached.set()
+                return name, message['to_email'], 'not_sent', stats, attempts[0], str(e)
+            except Exception as e:
+                return name, message['to_email'], 'failed', stats, attempts[0], str(e)
+
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for name, email, status, stats, attempts, error in pool.map(deliver, messages):
+                if error and status == 'failed':
+                    print(f"  Error sending to {email}: {error}")
+                report.add(name, email, status, stats, attempts=attempts, error=error)
+
+    report.finish()
+    return report, throttle.stats()
+
+
+def run_payroll(month, year, config_file="config.json", output_dir="pdfs", workers=1,
+                dry_run=False, generate=True, send=True, profile=None, profile_top=25,
+                metrics_path=None, validation=None, employees=None):
+    """
+    Fetch a month's records, check them, generate the slips and email them
+
+    Args:
+        config_file: Path to config.json, or a dict of the same settings
+        profile: None, 'cpu' (cProfile) or 'memory' (cProfile + tracemalloc);
+            results go to <output_dir>/profiles
+        metrics_path: Where to write run metrics (.prom or .json); defaults
+            to metrics_path in config.json, if any
+        validation: What to do with records that fail validation: 'warn'
+            (report and carry on), 'skip' (leave them out) or 'block' (stop
+            before generating); defaults to validation in config.json, else 'warn'
+        employees: CNICs, email addresses or names to limit the run to, e.g.
+            to reissue a few corrected slips; None for everyone
+
+    Returns:
+        Summary dict for the run
+    """
+    config = _load_config(config_file)
+    if metrics_path is None:
+        metrics_path = config.get('metrics_path')
+    # Extra labels for every sample, e.g. {"company": "..."} in batch runs
+    labels = config.get('metrics_labels')
+    try:
+        summary = _run_payroll(month, year, config_file, output_dir, workers, dry_run,
+                               generate, send, profile, profile_top, validation, employees)
+    except Exception as e:
+        # Still publish a failed run so alerting sees it
+        if metrics_path:
+            _export_metrics({'sheet': f"{month} {year}", 'error': str(e)}, metrics_path, labels)
+        raise
+
+    if metrics_path:
+        summary['metrics'] = _export_metrics(summary, metrics_path, labels)
+    return summary
+
+
+def _export_metrics(summary, metrics_path, labels=None):
+    try:
+        return write_metrics(summary, metrics_path, labels=labels)
+    except OSError as e:
+        print(f"Error writing metrics: {str(e)}")
+        return None
+
+
+def _run_payroll(month, year, config_file, output_dir, workers, dry_run, generate, send,
+                 profile, profile_top, validation=None, employees=None):
+    start = time.perf_counter()
+    sheet_name = f"{month} {year}"
+    run = instrumentation.begin_run(f"payroll {sheet_name}")
+    profiler = None
+    try:
+        if profile:
+            profiler = RunProfiler(f"payroll {sheet_name}", os.path.join(output_dir, 'profiles'),
+                                   memory=(profile == 'memory'), top=profile_top)
+            with profiler:
+                profile_dir = profiler.worker_profile_dir() if workers > 1 else None
+                summary = _run_stages(sheet_name, config_file, output_dir, workers, dry_run,
+                                      generate, send, profile_dir, validation, employees)
+        else:
+            summary = _run_stages(sheet_name, config_file, output_dir, workers, dry_run, generate, send,
+                                  validation=validation, employees=employees)
+    finally:
+        run.finish()
+
+    if profiler and profiler.summary_path:
+        summary['profile'] = profiler.prof_path
+        print(f"Profile: {profiler.prof_path}\nProfile summary: {profiler.summary_path}")
+
+    summary['stages'] = run.summary_rows()
+    print(run.format_summary())
+    try:
+        summary['trace'] = run.write_trace(_load_config(config_file).get('report_dir', 'reports'))
+    except OSError as e:
+        print(f"Error writing trace: {str(e)}")
+    summary['elapsed_s'] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+def _load_config(config_file):
+    if isinstance(config_file, dict):
+        return config_file
+    try:
+        with open(config_file, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _run_stages(sheet_name, config_file, output_dir, workers, dry_run, generate, send, profile_dir=None,
+                validation=None, employees=None):
+    """Fetch, validate, generate and send one sheet, returning the run's counts"""
+    config = _load_config(config_file)
+    mode = get_validation_mode(config, validation)
+    summary = {'sheet': sheet_name, 'records': 0, 'invalid': 0, 'blocked': False, 'rendered': 0,
+               'render_failed': 0, 'bytes_written': 0, 'sent': 0, 'failed': 0, 'skipped': 0,
+               'not_sent': 0, 'deferrals': 0, 'retries': 0, 'report': None, 'validation_report': None,
+               'archived': 0, 'trace': None}
+
+    print(f"Fetching {sheet_name}...")
+    reader = GoogleSheetsReader(config_file)
+    records = reader.get_month_data(sheet_name)
+    company_info = reader.get_company_info()
+    print(f"  {len(records)} records")
+
+    # Built from the config so a broken slip layout stops the run here
+    table = EmployeeTable(records, sheet_name, PDFGenerator(config_file).get_pdf_filename)
+    if employees:
+        records = table.select(employees)
+        print(f"  Limited to {len(records)} of {len(table)} employees")
+    summary['records'] = len(records)
+
+    if records:
+        validation_report = validate_records(records, sheet_name, table)
+        print(validation_report.format_summary())
+        summary['invalid'] = len(validation_report.invalid_indices())
+        if validation_report.problems:
+            try:
+                summary['validation_report'] = validation_report.write(config.get('report_dir', 'reports'))
+                print(f"  Validation report: {summary['validation_report']}")
+            except OSError as e:
+                print(f"Error writing validation report: {str(e)}")
+        if validation_report.errors and mode == 'block':
+            print("Stopped before generating: fix the rows above or run with --validation warn")
+            summary['blocked'] = True
+            return summary
+        if validation_report.errors and mode == 'skip':
+            records = validation_report.valid_records()
+            print(f"  Leaving out {summary['invalid']} records with errors")
+
+    if records and generate:
+        print(f"Generating slips with {workers} worker(s)...")
+        result = generate_slips(records, sheet_name, company_info, config_file, output_dir, workers, profile_dir)
+        summary.update(rendered=result['rendered'], render_failed=result['failed'],
+                       bytes_written=result['bytes_written'])
+        for error in result['errors']:
+            print(f"  Error generating {error}")
+        print(f"  {result['rendered']} rendered, {result['failed']} failed, "
+              f"{result['bytes_written'] / 1024:.0f} KB written to {output_dir}/")
+
+        if config.get('archive_dir') and result['rendered']:
+            with instrumentation.span('archive'), SlipArchive(config['archive_dir']) as archive:
+                counts = archive.add_month(records, sheet_name, output_dir, PDFGenerator(None))
+                packed = archive.pack(sheet_name)
+            summary['archived'] = counts['new'] + counts['reissue']
+            print(f"  Archived {counts['new']} new and {counts['reissue']} reissued slips "
+                  f"({counts['unchanged']} unchanged) in {config['archive_dir']}/")
+            if packed['objects']:
+                print(f"  Packed {packed['bytes_in'] / 1024:.0f} KB into {packed['bytes_out'] / 1024:.0f} KB")
+
+    if records and send:
+        if dry_run:
+            with_email = sum(1 for record in records if '@' in get_email(record))
+            print(f"Dry run: would email {with_email} of {len(records)} employees")
+        else:
+            print("Sending emails...")
+            report, stats = send_slips(records, sheet_name, config_file, output_dir, workers)
+            csv_path, _ = report.write()
+            for status in ('sent', 'failed', 'skipped', 'not_sent'):
+                summary[status] = report.count(status)
+            summary.update(deferrals=stats['deferrals'], retries=stats['retries'], report=csv_path)
+            print(f"  {summary['sent']} sent, {summary['failed']} failed, {summary['skipped']} skipped, "
+                  f"{summary['not_sent']} not sent (report: {csv_path})")
+
+    return summary
+
+
+def parse_month(value):
+    """Month name from a full name or an unambiguous prefix of at least 3 letters (e.g. Sep, Sept)"""
+    text = value.strip().lower()
+    matches = [month for month in MONTHS if month.lower().startswith(text)] if len(text) >= 3 else []
+    if len(matches) != 1:
+        raise argparse.ArgumentTypeError(f"Unknown month: {value!r} (use a month name such as January or Jan)")
+    return matches[0]
+
+
+def parse_date(value):
+    try:
+        parse_generation_date(value)
+    except Exception as e:
+        raise argparse.ArgumentTypeError(str(e))
+    return value
+
+
+def with_generation_date(config_file, generated_on):
+    """Config with generated_on set, so slips print that date instead of today's"""
+    if not generated_on:
+        return config_file
+    return dict(_load_config(config_file), generated_on=generated_on)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run payroll (fetch, generate, send) without the GUI")
+    parser.add_argument('--month', required=True, type=parse_month, help="Month name, e.g. January")
+    parser.add_argument('--year', required=True, type=int)
+    parser.add_argument('--config', default='config.json', help="Path to config.json")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Processes for PDF generation and parallel SMTP conversations")
+    parser.add_argument('--output-dir', default='pdfs', help="Where slips are written and read from")
+    parser.add_argument('--dry-run', action='store_true', help="Generate slips but do not send any email")
+    parser.add_argument('--skip-generate', action='store_true', help="Send previously generated slips")
+    parser.add_argument('--skip-send', action='store_true', help="Only generate slips")
+    parser.add_argument('--profile', nargs='?', const='cpu', choices=['cpu', 'memory'],
+                        default=profile_mode_from_env(),
+                        help="Write a cProfile (and with 'memory' a tracemalloc) summary to <output-dir>/profiles")
+    parser.add_argument('--profile-top', type=int, default=profile_top_from_env(),
+                        help="Functions and allocation sites listed in the profile summary")
+    parser.add_argument('--validation', choices=VALIDATION_MODES, default=None,
+                        help="Records with errors: warn and carry on, skip them, or block the run "
+                             "(default: validation in config.json, else warn)")
+    parser.add_argument('--employees', nargs='+', metavar='ID',
+                        help="Only these employees (CNIC, email or name), e.g. to reissue corrected slips")
+    parser.add_argument('--generated-on', type=parse_date, metavar='YYYY-MM-DD',
+                        help="Date printed on the slips (default: generated_on in config.json, else today); "
+                             "re-rendering with the original date reproduces the original files exactly")
+    parser.add_argument('--metrics-path', help="Write run metrics here (.json for JSON, otherwise "
+                                               "Prometheus text); overrides metrics_path in config.json")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = run_payroll(
+            args.month, args.year,
+            config_file=with_generation_date(args.config, args.generated_on),
+            output_dir=args.output_dir,
+            workers=max(1, args.workers),
+            dry_run=args.dry_run,
+            generate=not args.skip_generate,
+            send=not args.skip_send,
+            profile=args.profile,
+            profile_top=args.profile_top,
+            metrics_path=args.metrics_path,
+            validation=args.validation,
+            employees=args.employees
+        )
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 2
+
+    print(f"Done in {summary['elapsed_s']:.1f}s")
+    problems = (summary['invalid'] + summary['render_failed'] + summary['failed']
+                + summary['skipped'] + summary['not_sent'])
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
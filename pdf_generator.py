@@ -7,10 +7,15 @@ from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from reportlab.pdfgen import canvas
 from reportlab.lib.utils import ImageReader
 from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import ArrayObject, ContentStream, DictionaryObject, NameObject
 from PIL import Image
 from io import BytesIO
 from datetime import datetime
+import json
 import os
+from instrumentation import span, count
+from slip_layout import SlipLayout, DEFAULT_LAYOUT_PATH
+from asset_cache import AssetCache
 
 # TechEmulsion Brand Colors (exact from letter head)
 TEAL_PRIMARY = colors.HexColor('#0e8282')  # Table header color
@@ -24,21 +29,183 @@ GRAY_BORDER = colors.HexColor('#BDBDBD')
 # Page size (A4 - same as letter head)
 PAGE_WIDTH, PAGE_HEIGHT = A4  # 595.2 x 841.92 points
 
+# Default resolution for embedded stamp images at their drawn size
+DEFAULT_STAMP_DPI = 150
+
+# Salary table rows: (sheet column names to try, label on the slip)
+EARNINGS_FIELDS = [
+    (['Basic Salary', 'basic salary'], 'Basic Salary'),
+    (['Food Allowance', 'food allowance'], 'Food Allowance'),
+    (['Travel Allowance', 'travel allowance'], 'Travel Allowance'),
+    (['Medical Allowance', 'medical allowance'], 'Medical Allowance'),
+    (['Other (subscriptions)', 'other (subscriptions)'], 'Subscriptions'),
+    (['Other (Overtime)', 'other (overtime)'], 'Overtime'),
+    (['Other (Leave Encashment)', 'other (leave encashment)'], 'Leave Encashment'),
+    (['Other (Commision)', 'other (commision)', 'Commission'], 'Commission'),
+    (['Others', 'others'], 'Others'),
+]
+
+DEDUCTION_FIELDS = [
+    (['Tax Deductable', 'tax deductable', 'Tax Deduction'], 'Tax Deduction'),
+    (['Other (Extra Leaves)', 'other (extra leaves)'], 'Extra Leaves'),
+]
+
+NET_SALARY_FIELDS = ['Net Salary', 'net salary']
+AMOUNT_PAID_FIELDS = ['Amout Paid', 'amout paid', 'Amount Paid']
+
+
+def parse_generation_date(value):
+    """Date for "Generated on" from a YYYY-MM-DD string (or a date); None means today"""
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.strptime(str(value).strip(), '%Y-%m-%d')
+    except ValueError:
+        raise Exception(f"Invalid generation date '{value}', expected YYYY-MM-DD")
+
+
+def rename_clashing_resources(page, reader, other_page):
+    """
+    Rename resources of page whose names are also used by other_page
+
+    PyPDF2's merge_page renames clashing fonts and images to random names,
+    so the same slip rendered twice differs byte for byte. Renaming them
+    here first, to names derived from the originals, keeps the output
+    reproducible.
+    """
+    resources = page.get('/Resources')
+    other_resources = other_page.get('/Resources')
+    if resources is None or other_resources is None:
+        return
+    resources = resources.get_object()
+    other_resources = other_resources.get_object()
+
+    rename = {}
+    for category in list(resources.keys()):
+        own = resources[category].get_object()
+        other = other_resources.get(category)
+        if not isinstance(own, DictionaryObject) or other is None:
+            continue
+        other = other.get_object()
+        for key in list(own.keys()):
+            if key not in other:
+                continue
+            number = 1
+            while f"{key}_{number}" in own or f"{key}_{number}" in other:
+                number += 1
+            new_name = NameObject(f"{key}_{number}")
+            own[new_name] = own.raw_get(key)
+            del own[key]
+            rename[key] = new_name
+
+    if rename:
+        content = ContentStream(page.get_contents(), reader)
+        for operands, _ in content.operations:
+            names = operands.items() if isinstance(operands, dict) else enumerate(operands)
+            for index, operand in list(names):
+                if isinstance(operand, NameObject) and operand in rename:
+                    operands[index] = rename[operand]
+        page[NameObject('/Contents')] = content
+
+
+def stack_page(page, overlay_page, reader):
+    """
+    Draw overlay_page over a page that has already been merged
+
+    merge_page parses the whole merged page again to add another layer; the
+    overlay's few operations are appended to the page's parsed content
+    instead, and its resources added alongside the page's.
+    """
+    contents = page.get('/Contents')
+    if not isinstance(contents, ContentStream):
+        page.merge_page(overlay_page)
+        return
+
+    rename_clashing_resources(overlay_page, reader, page)
+    resources = page['/Resources'].get_object()
+    overlay_resources = overlay_page['/Resources'].get_object()
+    for category, entries in overlay_resources.items():
+        entries = entries.get_object()
+        if category == '/ProcSet':
+            merged = set(resources.get('/ProcSet', ArrayObject()).get_object()) | set(entries)
+            resources[NameObject('/ProcSet')] = ArrayObject(sorted(merged))
+        elif isinstance(entries, DictionaryObject):
+            if category not in resources:
+                resources[NameObject(category)] = DictionaryObject()
+            target = resources[category].get_object()
+            for key in entries:
+                target[key] = entries.raw_get(key)
+
+    overlay_content = ContentStream(overlay_page.get_contents(), reader)
+    contents.operations.append(([], 'q'))
+    contents.operations.extend(overlay_content.operations)
+    contents.operations.append(([], 'Q'))
+
+
+def sort_proc_set(page):
+    """PyPDF2 merges /ProcSet through a set, in an order that changes between runs; sort it"""
+    resources = page['/Resources'].get_object()
+    if '/ProcSet' in resources:
+        resources[NameObject('/ProcSet')] = ArrayObject(sorted(resources['/ProcSet'].get_object()))
+
 
 class PDFGenerator:
-    def __init__(self):
+    def __init__(self, config_file="config.json"):
         self.styles = getSampleStyleSheet()
         self._setup_custom_styles()
         self.company_name = "TECH EMULSION"
-        self.letter_head_path = os.path.join(os.path.dirname(__file__), "letter_head", "letter head 01 ff.pdf")
-        self.stamp_path = os.path.join(os.path.dirname(__file__), "stamp", "TE_STAMP.png")
-        self.paid_stamp_path = os.path.join(os.path.dirname(__file__), "stamp", "TE_STAMP.png")
+
+        # Optional letter head, stamp and image settings from config.json
+        options = self._load_options(config_file)
+        self.letter_head_path = options.get(
+            'letter_head_path', os.path.join(os.path.dirname(__file__), "letter_head", "letter head 01 ff.pdf"))
+        self.stamp_path = options.get('stamp_path', os.path.join(os.path.dirname(__file__), "stamp", "TE_STAMP.png"))
+        self.paid_stamp_path = options.get('paid_stamp_path', self.stamp_path)
+        self.stamp_dpi = options.get('stamp_dpi', DEFAULT_STAMP_DPI)
+        self.stamp_encoding = str(options.get('stamp_encoding', 'png')).lower()
+        self.stamp_jpeg_quality = int(options.get('stamp_jpeg_quality', 85))
+        # Date printed as "Generated on"; fixing it makes re-renders byte-identical
+        self.generated_on = parse_generation_date(options.get('generated_on'))
+
+        # Slip layout, compiled once into draw operations replayed for every slip
+        available_images = [source for source, path in (('stamp', self.stamp_path),
+                                                         ('paid_stamp', self.paid_stamp_path))
+                            if os.path.exists(path)]
+        self.layout = SlipLayout.load(options.get('slip_layout_path', DEFAULT_LAYOUT_PATH),
+                                      {'earnings': EARNINGS_FIELDS, 'deductions': DEDUCTION_FIELDS},
+                                      available_images)
+
+        # Prepared stamps and page templates, built once per generator instead
+        # of per slip, and kept in the asset cache for later launches and workers
+        asset_cache_dir = options.get('asset_cache_dir', os.path.join(options.get('cache_dir', 'cache'), 'assets'))
+        self.asset_cache = AssetCache(asset_cache_dir) if asset_cache_dir else None
+        self._prepared_images = {}
+        self._assets = {}
+        self.last_pdf_size = 0
+
+    def _load_options(self, config_file):
+        """Load optional PDF settings; the generator works without a config file"""
+        if isinstance(config_file, dict):
+            return config_file
+        if not config_file or not os.path.exists(config_file):
+            return {}
+        try:
+            with open(config_file, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
 
     def set_company_info(self, company_name, app_name=""):
         """Set company information"""
         if company_name:
             self.company_name = company_name
 
+    def generation_date(self):
+        """Date printed on slips: generated_on from the config, else today"""
+        return self.generated_on or datetime.now()
+
     def _setup_custom_styles(self):
         """Setup custom styles for PDF using brand colors"""
         self.title_style = ParagraphStyle(
@@ -76,232 +243,168 @@ class PDFGenerator:
             alignment=TA_RIGHT
         )
 
-    def create_pdf(self, record, month_name):
+    def create_pdf(self, record, month_name, output_dir="pdfs"):
         """Create a PDF salary slip using letter head as background"""
         filename = self.get_pdf_filename(record, month_name)
-        pdf_path = os.path.join("pdfs", filename)
+        pdf_path = os.path.join(output_dir, filename)
+
+        # Stamps at fixed positions, embedded once in an overlay page
+        with span('pdf.stamp'):
+            overlay = self._stamp_overlay()
 
-        # Create content PDF in memory
-        content_buffer = BytesIO()
-        self._create_content_pdf(content_buffer, record, month_name)
-        content_buffer.seek(0)
+        # Create content PDF in memory, released as soon as it is merged
+        with BytesIO() as content_buffer:
+            with span('pdf.content'):
+                self._create_content_pdf(content_buffer, record, month_name)
+            content_buffer.seek(0)
 
-        # Merge letter head background with content
-        self._merge_with_letterhead(content_buffer, pdf_path)
+            # Merge letter head background, content and stamps
+            self._merge_with_letterhead(content_buffer, pdf_path, overlay)
 
+        self.last_pdf_size = os.path.getsize(pdf_path)
+        count('pdf.slips')
+        count('pdf.bytes_written', self.last_pdf_size)
         return pdf_path
 
     def _create_content_pdf(self, buffer, record, month_name):
-        """Create the salary slip content PDF"""
-        c = canvas.Canvas(buffer, pagesize=A4)
-
-        # Starting Y position (below header area)
-        y_pos = PAGE_HEIGHT - 150
-
-        y_pos -= 40
-
-        # Draw SALARY SLIP title on the left side
-        c.setFont('Helvetica-Bold', 18)
-        c.setFillColor(SOLID_BLACK)
-        c.drawString(50, y_pos, "SALARY SLIP")
-
-        # Employee Information on the right side
-        name = self._get_field_value(record, ['Name', 'name']) or '___________________'
-        designation = self._get_field_value(record, ['Designation', 'designation']) or '___________________'
-
-        # Define fixed positions for alignment
-        label_x = PAGE_WIDTH - 280  # Label start position
-        value_x = PAGE_WIDTH - 175  # Value start position (same for all values)
-
-        # Employee Name (right side)
-        c.setFont('Helvetica-Bold', 10)
-        c.setFillColor(SOLID_BLACK)
-        c.drawString(label_x, y_pos, "Employee Name:")
-        c.setFont('Helvetica', 10)
-        c.drawString(value_x, y_pos, str(name))
-
-        y_pos -= 20
-
-        # Designation (right side)
-        c.setFont('Helvetica-Bold', 10)
-        c.setFillColor(SOLID_BLACK)
-        c.drawString(label_x, y_pos, "Designation:")
-        c.setFont('Helvetica', 10)
-        c.drawString(value_x, y_pos, str(designation))
-
-        y_pos -= 20
-
-        # Month & Year (right side)
-        c.setFont('Helvetica-Bold', 10)
-        c.setFillColor(SOLID_BLACK)
-        c.drawString(label_x, y_pos, "Month & Year:")
-        c.setFont('Helvetica', 10)
-        c.drawString(value_x, y_pos, month_name)
-
-        y_pos -= 35
-
-        # Draw salary table and get table dimensions
-        y_pos, table_x, table_width = self._draw_salary_table(c, record, y_pos)
-
-        # Draw net salary box
-        y_pos = self._draw_net_salary(c, record, y_pos)
-
-        # Draw company stamp with transparency below the table
-        self._draw_stamp(c, table_x, table_width, y_pos)
-
-        # Draw Company Stamp section just above Generated on
-        self._draw_company_stamp_section(c)
-
-        # Draw generation date - positioned on left side
-        c.setFont('Helvetica', 8)
-        c.setFillColor(BLACK)
-        generated_text = f"Generated on: {datetime.now().strftime('%B %d, %Y')}"
-        c.drawString(50, 87, generated_text)
+        """Create the salary slip content PDF by replaying the compiled layout"""
+        layout = self.layout
+        c = canvas.Canvas(buffer, pagesize=layout.page_size)
+
+        net_salary = self._parse_amount(layout.field_value(record, tuple(NET_SALARY_FIELDS)))
+        amount_paid = self._parse_amount(layout.field_value(record, tuple(AMOUNT_PAID_FIELDS)))
+        values = {
+            'month': month_name,
+            'generated_on': self.generation_date().strftime('%B %d, %Y'),
+            'net_salary': self._format_amount(amount_paid if amount_paid > 0 else net_salary),
+            'company': self.company_name,
+        }
+
+        y_pos = layout.start
+        for op in layout.ops:
+            kind = op[0]
+            if kind == 'text':
+                _, x, y, flow, align, text_kind, content, default = op
+                if text_kind == 'field':
+                    text = str(layout.field_value(record, content) or default)
+                elif text_kind == 'format':
+                    text = content.format_map(values)
+                else:
+                    text = content
+                if align == 'right':
+                    c.drawRightString(x, y_pos - y if flow else y, text)
+                else:
+                    c.drawString(x, y_pos - y if flow else y, text)
+            elif kind == 'font':
+                c.setFont(op[1], op[2])
+            elif kind == 'fill':
+                c.setFillColor(op[1])
+            elif kind == 'stroke':
+                c.setStrokeColor(op[1])
+                c.setLineWidth(op[2])
+            elif kind == 'rect':
+                _, x, y, flow, width, height = op
+                c.rect(x, y_pos - y if flow else y, width, height, fill=1, stroke=0)
+            elif kind == 'line':
+                _, x, y, x2, y2, flow = op
+                c.line(x, y_pos - y if flow else y, x2, y_pos - y2 if flow else y2)
+            elif kind == 'image' and op[8]:
+                # Only stamps placed relative to the flow; the rest are in the overlay
+                with span('pdf.stamp'):
+                    self._draw_layout_image(c, op, y_pos)
+            elif kind == 'table':
+                y_pos = self._draw_amounts_table(c, record, op[1], y_pos)
+            elif kind == 'advance':
+                y_pos -= op[1]
 
         c.save()
 
-    def _draw_salary_table(self, c, record, y_start):
-        """Draw the earnings and deductions table"""
-        # Table dimensions
-        table_x = 50
-        table_width = PAGE_WIDTH - 100
-        col_width = table_width / 2
-        row_height = 22
-        header_height = 25
-
-        # Get earnings data
-        earnings_fields = [
-            (['Basic Salary', 'basic salary'], 'Basic Salary'),
-            (['Food Allowance', 'food allowance'], 'Food Allowance'),
-            (['Travel Allowance', 'travel allowance'], 'Travel Allowance'),
-            (['Medical Allowance', 'medical allowance'], 'Medical Allowance'),
-            (['Other (subscriptions)', 'other (subscriptions)'], 'Subscriptions'),
-            (['Other (Overtime)', 'other (overtime)'], 'Overtime'),
-            (['Other (Leave Encashment)', 'other (leave encashment)'], 'Leave Encashment'),
-            (['Other (Commision)', 'other (commision)', 'Commission'], 'Commission'),
-            (['Others', 'others'], 'Others'),
-        ]
-
-        deduction_fields = [
-            (['Tax Deductable', 'tax deductable', 'Tax Deduction'], 'Tax Deduction'),
-            (['Other (Extra Leaves)', 'other (extra leaves)'], 'Extra Leaves'),
-        ]
-
-        # Calculate earnings
-        earnings_data = []
-        total_earnings = 0.0
-        for field_names, label in earnings_fields:
-            value = self._get_field_value(record, field_names)
-            amount = self._parse_amount(value)
-            if amount > 0:
-                earnings_data.append((label, amount))
-                total_earnings += amount
-
-        # Calculate deductions
-        deductions_data = []
-        total_deductions = 0.0
-        for field_names, label in deduction_fields:
-            value = self._get_field_value(record, field_names)
-            amount = self._parse_amount(value)
-            if amount > 0:
-                deductions_data.append((label, amount))
-                total_deductions += amount
-
-        # Determine number of rows needed
-        max_rows = max(len(earnings_data), len(deductions_data), 1)
-
-        # Draw header row
+    def _draw_layout_image(self, c, op, y_pos):
+        """Draw a stamp image of the layout, sized from its prepared image; returns whether it was drawn"""
+        _, source, width, height, x, y, x_centered, y_centered, flow = op
+        try:
+            if source == 'stamp':
+                img_reader, aspect_ratio = self._get_watermark_image(width)
+                height = width * aspect_ratio
+            else:
+                img_reader, aspect_ratio = self._get_company_stamp_image(height)
+                width = height * aspect_ratio
+            if x_centered:
+                x -= width / 2
+            if y_centered:
+                y -= height / 2
+            elif flow:
+                y = y_pos - y
+            c.drawImage(img_reader, x, y, width=width, height=height, mask='auto')
+            return True
+        except Exception as e:
+            print(f"Error drawing {source.replace('_', ' ')}: {str(e)}")
+            return False
+
+    def _draw_amounts_table(self, c, record, table, y_start):
+        """Draw a compiled amounts table (earnings and deductions) and return the position below it"""
+        columns = table['columns']
+        col_width = table['col_width']
+        row_height = table['row_height']
+        header_height = table['header_height']
+
+        entries = []
+        totals = []
+        for column in columns:
+            rows = []
+            for field_names, label in column['rows']:
+                amount = self._parse_amount(self.layout.field_value(record, field_names))
+                if amount > 0:
+                    rows.append((label, amount))
+            entries.append(rows)
+            totals.append(sum(amount for _, amount in rows))
+        row_count = max(max(len(rows) for rows in entries), 1)
+
+        # Header row
         y = y_start
-
-        # Earnings header (left)
-        c.setFillColor(TEAL_PRIMARY)
-        c.rect(table_x, y - header_height, col_width, header_height, fill=1, stroke=0)
-
-        # Deductions header (right)
-        c.rect(table_x + col_width, y - header_height, col_width, header_height, fill=1, stroke=0)
-
-        # Header text
-        c.setFillColor(WHITE)
-        c.setFont('Helvetica-Bold', 10)
-        c.drawString(table_x + 10, y - 17, "Earnings")
-        c.drawString(table_x + col_width + 10, y - 17, "Deductions")
-
+        c.setFillColor(table['header_fill'])
+        for column in columns:
+            c.rect(column['x'], y - header_height, col_width, header_height, fill=1, stroke=0)
+        c.setFillColor(table['header_color'])
+        c.setFont(*table['header_font'])
+        for column in columns:
+            c.drawString(column['text_x'], y - table['header_baseline'], column['title'])
         y -= header_height
 
-        # Draw data rows
-        for i in range(max_rows):
-            # Alternate row background
-            if i % 2 == 0:
-                c.setFillColor(LIGHT_GRAY)
-            else:
-                c.setFillColor(WHITE)
-
-            c.rect(table_x, y - row_height, col_width, row_height, fill=1, stroke=0)
-            c.rect(table_x + col_width, y - row_height, col_width, row_height, fill=1, stroke=0)
-
-            # Draw earnings data - using solid black for clear visibility
-            c.setFillColor(SOLID_BLACK)
-            c.setFont('Helvetica', 9)
-            if i < len(earnings_data):
-                label, amount = earnings_data[i]
-                c.drawString(table_x + 10, y - 15, label)
-                c.drawRightString(table_x + col_width - 10, y - 15, self._format_amount(amount))
-
-            # Draw deductions data - using solid black for clear visibility
-            c.setFillColor(SOLID_BLACK)
-            if i < len(deductions_data):
-                label, amount = deductions_data[i]
-                c.drawString(table_x + col_width + 10, y - 15, label)
-                c.drawRightString(table_x + table_width - 10, y - 15, self._format_amount(amount))
-
+        # Amount rows on alternating backgrounds
+        baseline = table['row_baseline']
+        row_fills = table['row_fills']
+        c.setFont(*table['row_font'])
+        for i in range(row_count):
+            c.setFillColor(row_fills[i % len(row_fills)])
+            for column in columns:
+                c.rect(column['x'], y - row_height, col_width, row_height, fill=1, stroke=0)
+            c.setFillColor(table['row_color'])
+            for column, rows in zip(columns, entries):
+                if i < len(rows):
+                    label, amount = rows[i]
+                    c.drawString(column['text_x'], y - baseline, label)
+                    c.drawRightString(column['right_x'], y - baseline, self._format_amount(amount))
             y -= row_height
 
-        # Draw totals row
-        c.setFillColor(colors.HexColor('#E0E0E0'))
-        c.rect(table_x, y - row_height, col_width, row_height, fill=1, stroke=0)
-        c.rect(table_x + col_width, y - row_height, col_width, row_height, fill=1, stroke=0)
-
-        # Totals text - using solid black for clear visibility
-        c.setFillColor(SOLID_BLACK)
-        c.setFont('Helvetica-Bold', 9)
-        c.drawString(table_x + 10, y - 15, "Total Earnings")
-        c.drawRightString(table_x + col_width - 10, y - 15, self._format_amount(total_earnings))
-        c.drawString(table_x + col_width + 10, y - 15, "Total Deductions")
-        c.drawRightString(table_x + table_width - 10, y - 15, self._format_amount(total_deductions))
-
+        # Totals row
+        c.setFillColor(table['total_fill'])
+        for column in columns:
+            c.rect(column['x'], y - row_height, col_width, row_height, fill=1, stroke=0)
+        c.setFillColor(table['total_color'])
+        c.setFont(*table['total_font'])
+        for column, total in zip(columns, totals):
+            c.drawString(column['text_x'], y - baseline, column['total'])
+            c.drawRightString(column['right_x'], y - baseline, self._format_amount(total))
         y -= row_height
 
-        # Draw table borders
-        c.setStrokeColor(DARK_TEAL)
-        c.setLineWidth(1)
-        # Outer border - left table
-        c.rect(table_x, y, col_width, y_start - y, fill=0, stroke=1)
-        # Outer border - right table
-        c.rect(table_x + col_width, y, col_width, y_start - y, fill=0, stroke=1)
-
-        return y - 15, table_x, table_width
-
-    def _draw_net_salary(self, c, record, y_pos):
-        """Draw net salary box"""
-        net_salary = self._parse_amount(self._get_field_value(record, ['Net Salary', 'net salary']))
-        amount_paid = self._parse_amount(self._get_field_value(record, ['Amout Paid', 'amout paid', 'Amount Paid']))
-        final_amount = amount_paid if amount_paid > 0 else net_salary
+        # Border around each column
+        c.setStrokeColor(table['border_color'])
+        c.setLineWidth(table['border_width'])
+        for column in columns:
+            c.rect(column['x'], y, col_width, y_start - y, fill=0, stroke=1)
 
-        box_x = 50
-        box_width = PAGE_WIDTH - 100
-        box_height = 30
-
-        # Draw teal background (same color as table header)
-        c.setFillColor(TEAL_PRIMARY)
-        c.rect(box_x, y_pos - box_height, box_width, box_height, fill=1, stroke=0)
-
-        # Draw text
-        c.setFillColor(WHITE)
-        c.setFont('Helvetica-Bold', 12)
-        c.drawString(box_x + 15, y_pos - 20, "NET SALARY")
-        c.drawRightString(box_x + box_width - 15, y_pos - 20, self._format_amount(final_amount))
-
-        return y_pos - box_height - 15
+        return y - table['after']
 
     def _draw_company_stamp_section(self, c):
         """Draw company stamp section with line and rotated stamp just above Generated on"""
@@ -324,49 +427,16 @@ class PDFGenerator:
             c.setFillColor(SOLID_BLACK)
             c.drawString(line_x + 15, line_y - 12, "Company Stamp")
 
-            # Open the stamp image
-            stamp_img = Image.open(self.paid_stamp_path)
-
-            # Convert to RGBA if not already
-            if stamp_img.mode != 'RGBA':
-                stamp_img = stamp_img.convert('RGBA')
-
-            # Change stamp color to dark green (#073630)
-            pixels = stamp_img.load()
-            dark_green = (7, 54, 48)  # RGB for #073630
-
-            for i in range(stamp_img.width):
-                for j in range(stamp_img.height):
-                    r, g, b, a = pixels[i, j]
-                    # If pixel is not transparent, change to dark green
-                    if a > 0:
-                        # Calculate grayscale to maintain shading
-                        gray = (r + g + b) // 3
-                        # Apply dark green with original intensity
-                        if gray < 128:  # Dark pixels (the stamp itself)
-                            pixels[i, j] = (dark_green[0], dark_green[1], dark_green[2], a)
-                        else:  # Light pixels (background)
-                            pixels[i, j] = (r, g, b, 0)  # Make transparent
-
-            # Rotate 40 degrees to the right (clockwise)
-            stamp_img = stamp_img.rotate(-40, expand=True, resample=Image.BICUBIC)
-
-            # Calculate stamp size
+            # Recolored, rotated stamp prepared once at the target DPI
             stamp_height = 90
-            aspect_ratio = stamp_img.width / stamp_img.height
+            img_reader, aspect_ratio = self._get_company_stamp_image(stamp_height)
             stamp_width = stamp_height * aspect_ratio
 
             # Position stamp on the line (centered on line)
             stamp_x = line_x + (line_width - stamp_width) / 2
             stamp_y = line_y - 15  # Place stamp a bit lower
 
-            # Save to bytes buffer
-            img_buffer = BytesIO()
-            stamp_img.save(img_buffer, format='PNG')
-            img_buffer.seek(0)
-
             # Draw the stamp
-            img_reader = ImageReader(img_buffer)
             c.drawImage(img_reader, stamp_x, stamp_y, width=stamp_width, height=stamp_height, mask='auto')
 
         except Exception as e:
@@ -378,61 +448,246 @@ class PDFGenerator:
             return
 
         try:
-            # Open the stamp image and add transparency
-            stamp_img = Image.open(self.stamp_path)
-
-            # Convert to RGBA if not already
-            if stamp_img.mode != 'RGBA':
-                stamp_img = stamp_img.convert('RGBA')
-
-            # Create a new image with transparency
-            # Very low opacity (8% opacity for very subtle watermark)
-            alpha = stamp_img.split()[3] if stamp_img.mode == 'RGBA' else Image.new('L', stamp_img.size, 255)
-            alpha = alpha.point(lambda p: int(p * 0.08))  # 8% opacity for very light watermark
-
-            # Create new RGBA image with adjusted alpha
-            stamp_img.putalpha(alpha)
-
             # Calculate stamp size (smaller - 60% of table width)
             stamp_width = table_width * 0.6
-            aspect_ratio = stamp_img.height / stamp_img.width
+            img_reader, aspect_ratio = self._get_watermark_image(stamp_width)
             stamp_height = stamp_width * aspect_ratio
 
             # Position stamp in center, slightly right and up
             stamp_x = (PAGE_WIDTH - stamp_width) / 2 + 20  # Shifted 20 points to the right
             stamp_y = (PAGE_HEIGHT - stamp_height) / 2 + 12  # Shifted 12 points up
 
-            # Save to bytes buffer
-            img_buffer = BytesIO()
-            stamp_img.save(img_buffer, format='PNG')
-            img_buffer.seek(0)
-
             # Draw the stamp
-            img_reader = ImageReader(img_buffer)
             c.drawImage(img_reader, stamp_x, stamp_y, width=stamp_width, height=stamp_height, mask='auto')
 
         except Exception as e:
             print(f"Error drawing stamp: {str(e)}")
 
-    def _merge_with_letterhead(self, content_buffer, output_path):
-        """Merge content PDF with letter head background"""
-        # Read letter head PDF
-        letterhead_reader = PdfReader(self.letter_head_path)
-        letterhead_page = letterhead_reader.pages[0]
-
-        # Read content PDF
-        content_reader = PdfReader(content_buffer)
-        content_page = content_reader.pages[0]
-
-        # Merge content onto letterhead
-        letterhead_page.merge_page(content_page)
+    def _get_company_stamp_image(self, stamp_height):
+        """
+        Get the dark green, rotated company stamp ready for drawing
+
+        Returns:
+            (ImageReader, width / height aspect ratio)
+        """
+        return self._prepared_image('company_stamp', self.paid_stamp_path, stamp_height,
+                                    self._prepare_company_stamp)
+
+    def _prepare_company_stamp(self, stamp_height):
+        """Recolor and rotate the company stamp; returns (image, width / height)"""
+        # Open the stamp image as an RGBA copy, closing the file
+        with Image.open(self.paid_stamp_path) as source:
+            stamp_img = source.convert('RGBA')
+
+        # Change stamp color to dark green (#073630)
+        pixels = stamp_img.load()
+        dark_green = (7, 54, 48)  # RGB for #073630
+
+        for i in range(stamp_img.width):
+            for j in range(stamp_img.height):
+                r, g, b, a = pixels[i, j]
+                # If pixel is not transparent, change to dark green
+                if a > 0:
+                    # Calculate grayscale to maintain shading
+                    gray = (r + g + b) // 3
+                    # Apply dark green with original intensity
+                    if gray < 128:  # Dark pixels (the stamp itself)
+                        pixels[i, j] = (dark_green[0], dark_green[1], dark_green[2], a)
+                    else:  # Light pixels (background)
+                        pixels[i, j] = (r, g, b, 0)  # Make transparent
+
+        # Rotate 40 degrees to the right (clockwise)
+        stamp_img = stamp_img.rotate(-40, expand=True, resample=Image.BICUBIC)
+
+        aspect_ratio = stamp_img.width / stamp_img.height
+        return self._resample_to_dpi(stamp_img, stamp_height * aspect_ratio, stamp_height), aspect_ratio
+
+    def _get_watermark_image(self, stamp_width):
+        """
+        Get the faint background stamp ready for drawing
+
+        Returns:
+            (ImageReader, height / width aspect ratio)
+        """
+        return self._prepared_image('watermark', self.stamp_path, stamp_width, self._prepare_watermark)
+
+    def _prepare_watermark(self, stamp_width):
+        """Fade the stamp to a watermark; returns (image, height / width)"""
+        # Open the stamp image as an RGBA copy, closing the file
+        with Image.open(self.stamp_path) as source:
+            stamp_img = source.convert('RGBA')
+
+        # Very low opacity (8% opacity for very subtle watermark)
+        alpha = stamp_img.split()[3]
+        alpha = alpha.point(lambda p: int(p * 0.08))  # 8% opacity for very light watermark
+
+        # Create new RGBA image with adjusted alpha
+        stamp_img.putalpha(alpha)
+
+        aspect_ratio = stamp_img.height / stamp_img.width
+        return self._resample_to_dpi(stamp_img, stamp_width, stamp_width * aspect_ratio), aspect_ratio
+
+    def _prepared_image(self, kind, source_path, size, prepare):
+        """
+        A stamp ready for drawing at the given size, prepared once and kept
+        in the asset cache
+
+        Returns:
+            (ImageReader, aspect ratio)
+        """
+        key = (kind, source_path, size, self.stamp_dpi, self.stamp_encoding, self.stamp_jpeg_quality)
+        if key not in self._prepared_images:
+            def build():
+                img, aspect_ratio = prepare(size)
+                return self._encode_stamp_image(img), {'aspect_ratio': aspect_ratio}
+
+            data, meta = self._cached_asset(kind, [source_path], build, size=size, dpi=self.stamp_dpi,
+                                            encoding=self.stamp_encoding, quality=self.stamp_jpeg_quality)
+            self._prepared_images[key] = (ImageReader(BytesIO(data)), meta['aspect_ratio'])
+        return self._prepared_images[key]
+
+    def _resample_to_dpi(self, img, draw_width, draw_height):
+        """Downsample an image to stamp_dpi for its drawn size in points (never upsample)"""
+        if not self.stamp_dpi:
+            return img
+
+        target_width = max(1, round(draw_width / 72 * self.stamp_dpi))
+        target_height = max(1, round(draw_height / 72 * self.stamp_dpi))
+        if target_width >= img.width or target_height >= img.height:
+            return img
+
+        return img.resize((target_width, target_height), resample=Image.LANCZOS)
+
+    def _encode_stamp_image(self, img):
+        """
+        Encode a prepared stamp for embedding, as image file bytes
+
+        ReportLab stores non-JPEG images as Flate-compressed RGB plus an alpha
+        mask, so the colour hidden under fully transparent pixels is cleared to
+        let it compress well. With stamp_encoding "jpeg", images without
+        transparency are embedded as JPEG instead (JPEG cannot carry alpha).
+        """
+        has_alpha = img.mode == 'RGBA' and img.getchannel('A').getextrema()[0] < 255
+
+        buffer = BytesIO()
+        if self.stamp_encoding == 'jpeg' and not has_alpha:
+            img.convert('RGB').save(buffer, format='JPEG', quality=self.stamp_jpeg_quality, optimize=True)
+        else:
+            if has_alpha:
+                hidden = img.getchannel('A').point(lambda a: 255 if a == 0 else 0)
+                img.paste((0, 0, 0, 0), mask=hidden)
+            img.save(buffer, format='PNG', optimize=True)
+        return buffer.getvalue()
+
+    def _cached_asset(self, kind, files, build, **params):
+        """
+        Bytes of an asset built from files, from memory, the asset cache or build()
+
+        Args:
+            build: Function returning (bytes, meta dict), or (bytes, None)
+                when the result should not be cached (e.g. a stamp failed)
+
+        Returns:
+            (bytes, meta dict)
+        """
+        memory_key = (kind, tuple(files), repr(sorted(params.items())))
+        if memory_key in self._assets:
+            return self._assets[memory_key]
+
+        cache_key = None
+        if self.asset_cache:
+            try:
+                cache_key = self.asset_cache.key(kind, files, **params)
+            except OSError:
+                # A missing source file; build() reports it
+                pass
+        cached = self.asset_cache.get(cache_key) if cache_key else None
+        if cached is None:
+            with span('pdf.prepare_asset'):
+                data, meta = build()
+            if cache_key and meta is not None:
+                self.asset_cache.put(cache_key, data, **meta)
+            cached = (data, meta or {})
+        self._assets[memory_key] = cached
+        return cached
+
+    def _letterhead_template(self):
+        """The letter head's first page as a standalone PDF, parsed from memory for every slip"""
+        def build():
+            writer = PdfWriter()
+            writer.add_page(PdfReader(self.letter_head_path).pages[0])
+            with BytesIO() as buffer:
+                writer.write(buffer)
+                return buffer.getvalue(), {'source': self.letter_head_path}
+
+        return self._cached_asset('letterhead', [self.letter_head_path], build)[0]
+
+    def _stamp_overlay(self):
+        """
+        A transparent page with the layout's stamps that do not move with
+        the table, drawn over every slip, or None if the layout has none
+
+        Embedding an image costs more than drawing the rest of the slip, so
+        it is done once here rather than on every slip's canvas.
+        """
+        ops = [op for op in self.layout.ops if op[0] == 'image' and not op[8]]
+        if not ops:
+            return None
+
+        def build():
+            with BytesIO() as buffer:
+                c = canvas.Canvas(buffer, pagesize=self.layout.page_size, invariant=1)
+                drawn = [self._draw_layout_image(c, op, 0) for op in ops]
+                c.save()
+                # A stamp that failed to draw is left out of this run only
+                return buffer.getvalue(), ({'stamps': len(ops)} if all(drawn) else None)
+
+        stamp_files = sorted({self.stamp_path if op[1] == 'stamp' else self.paid_stamp_path for op in ops})
+        return self._cached_asset('stamp_overlay', stamp_files, build, ops=ops, page=self.layout.page_size,
+                                  dpi=self.stamp_dpi, encoding=self.stamp_encoding,
+                                  quality=self.stamp_jpeg_quality)[0]
+
+    def prepare_assets(self):
+        """Build (or load) the letter head template and stamps before the first slip"""
+        self._letterhead_template()
+        self._stamp_overlay()
+
+    def _merge_with_letterhead(self, content_buffer, output_path, overlay=None):
+        """Merge content PDF onto the letter head background, with an optional overlay PDF on top"""
+        with span('pdf.merge'):
+            # Fresh copy of the letter head page; merging changes it
+            letterhead_reader = PdfReader(BytesIO(self._letterhead_template()))
+            letterhead_page = letterhead_reader.pages[0]
+
+            # Read content PDF
+            content_reader = PdfReader(content_buffer)
+            content_page = content_reader.pages[0]
+
+            # Merge content onto letterhead
+            rename_clashing_resources(content_page, content_reader, letterhead_page)
+            letterhead_page.merge_page(content_page)
+
+            if overlay:
+                overlay_reader = PdfReader(BytesIO(overlay))
+                stack_page(letterhead_page, overlay_reader.pages[0], overlay_reader)
+            sort_proc_set(letterhead_page)
 
         # Write output
-        writer = PdfWriter()
-        writer.add_page(letterhead_page)
-
-        with open(output_path, 'wb') as output_file:
-            writer.write(output_file)
+        with span('pdf.write'):
+            writer = PdfWriter()
+            writer.add_page(letterhead_page)
+
+            # Written beside the slip and renamed into place, so a send
+            # running at the same time never attaches a half-written file
+            tmp_path = f"{output_path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp_path, 'wb') as output_file:
+                    writer.write(output_file)
+                os.replace(tmp_path, output_path)
+            finally:
+                writer.close()
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
 
     def _get_field_value(self, record, field_names):
         """Get value from record trying multiple field name variations"""
@@ -0,0 +1,147 @@
+"""
+Optional cProfile / tracemalloc capture around a whole run.
+
+Enabled from the CLI with --profile, or for the GUI by setting the
+SALARY_PROFILE environment variable before starting it:
+
+    SALARY_PROFILE=1        CPU profile (cProfile)
+    SALARY_PROFILE=memory   CPU profile plus tracemalloc allocation summary
+
+SALARY_PROFILE_TOP sets how many functions and allocation sites the text
+summary lists (default 25). Each run writes <name>.prof, loadable with
+pstats or snakeviz, and a <name>.txt summary.
+"""
+import cProfile
+import glob
+import io
+import os
+import pstats
+import tracemalloc
+from datetime import datetime
+
+PROFILE_ENV = 'SALARY_PROFILE'
+PROFILE_TOP_ENV = 'SALARY_PROFILE_TOP'
+DEFAULT_TOP = 25
+
+
+def profile_mode_from_env():
+    """Get 'cpu', 'memory' or None from SALARY_PROFILE"""
+    value = os.environ.get(PROFILE_ENV, '').strip().lower()
+    if not value or value in ('0', 'false', 'no', 'off'):
+        return None
+    return 'memory' if value in ('memory', 'mem', 'tracemalloc') else 'cpu'
+
+
+def profile_top_from_env():
+    try:
+        return int(os.environ.get(PROFILE_TOP_ENV, DEFAULT_TOP))
+    except ValueError:
+        return DEFAULT_TOP
+
+
+class RunProfiler:
+    """
+    Context manager profiling the calling thread for the duration of a run
+
+    Example:
+        with RunProfiler('generate January 2025', 'pdfs/profiles', memory=True) as profiler:
+            generate()
+        print(profiler.summary_path)
+    """
+
+    def __init__(self, label, output_dir="profiles", memory=False, top=DEFAULT_TOP):
+        self.label = label
+        self.output_dir = output_dir
+        self.memory = memory
+        self.top = top
+        self.profile = cProfile.Profile()
+        self.prof_path = None
+        self.summary_path = None
+        self.worker_dir = None
+        self._snapshot = None
+        self._peak = 0
+        self._started_tracemalloc = False
+
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        name = ''.join(ch if ch.isalnum() else '_' for ch in label)
+        self._base = os.path.join(output_dir, f"profile_{name}_{stamp}")
+
+    def __enter__(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+            self._started_tracemalloc = True
+        self.profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profile.disable()
+        if self.memory and tracemalloc.is_tracing():
+            self._snapshot = tracemalloc.take_snapshot()
+            self._peak = tracemalloc.get_traced_memory()[1]
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        try:
+            self._write()
+        except OSError as e:
+            print(f"Error writing profile: {str(e)}")
+        return False
+
+    def worker_profile_dir(self):
+        """Directory where pool worker processes dump their own profiles"""
+        if self.worker_dir is None:
+            self.worker_dir = self._base + "_workers"
+            os.makedirs(self.worker_dir, exist_ok=True)
+        return self.worker_dir
+
+    def _write(self):
+        stats = pstats.Stats(self.profile)
+        worker_files = []
+        if self.worker_dir:
+            worker_files = sorted(glob.glob(os.path.join(self.worker_dir, '*.prof')))
+            for path in worker_files:
+                stats.add(path)
+
+        self.prof_path = self._base + ".prof"
+        stats.dump_stats(self.prof_path)
+
+        out = io.StringIO()
+        out.write(f"Profile: {self.label}\n")
+        if worker_files:
+            out.write(f"Includes {len(worker_files)} worker process profile(s)\n")
+        for sort_key, title in (('cumulative', 'cumulative time'), ('tottime', 'own time')):
+            out.write(f"\nTop {self.top} functions by {title}\n")
+            pstats.Stats(self.prof_path, stream=out).sort_stats(sort_key).print_stats(self.top)
+
+        if self._snapshot is not None:
+            out.write(f"\nTop {self.top} allocation sites (this process, peak "
+                      f"{self._peak / (1024 * 1024):.1f} MB traced)\n")
+            for stat in self._snapshot.statistics('lineno')[:self.top]:
+                out.write(f"  {stat}\n")
+
+        self.summary_path = self._base + ".txt"
+        with open(self.summary_path, 'w', encoding='utf-8') as f:
+            f.write(out.getvalue())
+
+
+class WorkerProfiler:
+    """
+    cProfile for one pool worker process, enabled around each unit of work
+
+    Create one per process and reuse it; the stats accumulate and are
+    dumped after every unit.
+    """
+
+    def __init__(self, directory):
+        self.profile = cProfile.Profile()
+        self.path = os.path.join(directory, f"worker_{os.getpid()}.prof")
+
+    def __enter__(self):
+        self.profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.profile.disable()
+        # The pool gives no shutdown hook, so keep the file current
+        self.profile.dump_stats(self.path)
+        return False
@@ -0,0 +1,66 @@
+"""Helpers for reading employee fields from sheet records (no UI dependencies)"""
+
+# Key under which parse_month_values keeps each record's row number in the sheet
+SHEET_ROW = '_sheet_row'
+
+
+def get_sheet_row(record):
+    """Row number of the record in its sheet (the first data row is 4), or None if unknown"""
+    return record.get(SHEET_ROW)
+
+
+def describe_row(record, position):
+    """Where a record is, for messages: its sheet row, or its position when the row is unknown"""
+    sheet_row = get_sheet_row(record)
+    return f"row {sheet_row}" if sheet_row else f"#{position + 1}"
+
+
+def get_email(record):
+    email_keys = ['email address', 'Email Address', 'email', 'Email', 'EMAIL', 'E-mail', 'e-mail']
+    for key in email_keys:
+        if key in record and record[key]:
+            return str(record[key]).strip()
+    record_lower = {k.lower(): v for k, v in record.items()}
+    if 'email address' in record_lower and record_lower['email address']:
+        return str(record_lower['email address']).strip()
+    if 'email' in record_lower and record_lower['email']:
+        return str(record_lower['email']).strip()
+    return ''
+
+
+def get_name(record):
+    name_keys = ['Name', 'name', 'NAME', 'Employee Name', 'employee name']
+    for key in name_keys:
+        if key in record and record[key]:
+            return str(record[key]).strip()
+    return 'Unknown'
+
+
+def get_cnic(record):
+    for key in ['CNIC', 'cnic', 'Cnic']:
+        if key in record and record[key]:
+            return str(record[key]).strip()
+    return ''
+
+
+def get_designation(record):
+    for key in ['Designation', 'designation', 'DESIGNATION']:
+        if key in record and record[key]:
+            return str(record[key]).strip()
+    return ''
+
+
+def get_email_body(record, month_name):
+    name = get_name(record)
+    return f"""Dear {name},
+
+Please find attached your salary statement for {month_name}.
+
+If you have any questions, please contact HR.
+
+Best regards,
+HR Department"""
+
+
+def get_email_subject(month_name):
+    return f"Salary Statement - {month_name}"
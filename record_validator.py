@@ -0,0 +1,286 @@
+"""
+Validation pass over a month's records, run before any slip is generated.
+
+Checks every row at once and reports each problem that would otherwise
+surface one slip or email at a time mid-run, or not at all: missing or
+malformed email addresses, missing names and CNICs, amounts the PDF
+generator cannot read (they print as "-"), negative amounts (left off the
+slip), a Net Salary that differs from earnings minus deductions, and rows
+that repeat a CNIC, an email address or a slip filename.
+
+    report = validate_records(records, "January 2025")
+    print(report.format_summary())
+    if report.errors:
+        ...
+
+Columns are matched to the sheet's headers once per month, the same way the
+PDF generator matches them per slip, so the pass over 5,000 rows takes a few
+milliseconds.
+"""
+import csv
+import os
+import re
+import time
+from datetime import datetime
+
+from pdf_generator import PDFGenerator, EARNINGS_FIELDS, DEDUCTION_FIELDS, NET_SALARY_FIELDS, AMOUNT_PAID_FIELDS
+from record_fields import get_email, get_name, get_cnic, get_sheet_row, describe_row
+from employee_table import EmployeeTable
+from instrumentation import span
+
+# How the config option 'validation' (or --validation) treats rows with errors:
+# report them and go on, leave those rows out, or stop before generating
+VALIDATION_MODES = ['warn', 'skip', 'block']
+DEFAULT_VALIDATION_MODE = 'warn'
+
+# Net Salary may differ from earnings minus deductions by this much (rounding)
+NET_TOLERANCE = 1.0
+
+# Values the PDF generator treats as "no amount"
+BLANK_AMOUNTS = {'', '0', '0.0', '0.00', '-', 'N/A', 'n/a'}
+
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+CNIC_PATTERN = re.compile(r'^\d{5}-?\d{7}-?\d$')
+
+REPORT_FIELDS = ['row', 'name', 'severity', 'field', 'value', 'message']
+
+
+def parse_amount(value):
+    """
+    Read an amount the way PDFGenerator._parse_amount does, but say when it fails
+
+    Returns:
+        (amount, ok): amount is None for blank values; ok is False when the
+        value is not blank and could not be read (the slip would show "-")
+    """
+    if value is None:
+        return None, True
+    if isinstance(value, (int, float)):
+        return float(value), True
+    clean_value = str(value).replace('PKR', '').replace('Rs', '').replace('Rs.', '')
+    clean_value = clean_value.replace(',', '').replace('$', '').strip()
+    if clean_value in BLANK_AMOUNTS:
+        return None, True
+    try:
+        return float(clean_value), True
+    except ValueError:
+        return None, False
+
+
+def resolve_columns(headers, field_names):
+    """Sheet columns matching any of field_names, in the order the generator tries them"""
+    by_lower = {}
+    for header in headers:
+        by_lower[header.lower().strip()] = header
+    columns = []
+    for field in field_names:
+        for column in (field if field in headers else None, by_lower.get(field.lower())):
+            if column is not None and column not in columns:
+                columns.append(column)
+    return columns
+
+
+def record_headers(records):
+    """Column names used by the records, in first-seen order (one sheet's records share them)"""
+    headers = {}
+    for record in records:
+        for key in record:
+            headers.setdefault(key, None)
+    return list(headers)
+
+
+def column_values(records, columns):
+    """One value per record: the first non-empty value among the columns"""
+    values = []
+    for record in records:
+        value = None
+        for column in columns:
+            if record.get(column):
+                value = record[column]
+                break
+        values.append(value)
+    return values
+
+
+class ValidationReport:
+    """Problems found in one month's records; severity is 'error' or 'warning'"""
+
+    def __init__(self, sheet_name, records):
+        self.sheet_name = sheet_name
+        self.records = records
+        self.problems = []
+        self.elapsed = 0.0
+
+    def add(self, index, severity, field, message, value=None):
+        """Record a problem; index is the record's position, or None for the whole sheet"""
+        self.problems.append({
+            'index': index,
+            'row': (get_sheet_row(self.records[index]) or '') if index is not None else '',
+            'name': get_name(self.records[index]) if index is not None else '',
+            'severity': severity,
+            'field': field,
+            'value': '' if value is None else str(value),
+            'message': message,
+        })
+
+    @property
+    def errors(self):
+        return [problem for problem in self.problems if problem['severity'] == 'error']
+
+    @property
+    def warnings(self):
+        return [problem for problem in self.problems if problem['severity'] == 'warning']
+
+    def invalid_indices(self):
+        """Positions of records with at least one error"""
+        return sorted({problem['index'] for problem in self.errors if problem['index'] is not None})
+
+    def valid_records(self):
+        """Records without errors, in their original order"""
+        invalid = set(self.invalid_indices())
+        return [record for index, record in enumerate(self.records) if index not in invalid]
+
+    def format_summary(self, limit=20):
+        """Counts followed by the first `limit` problems, errors first"""
+        lines = [
+            f"Validation of {self.sheet_name}: {len(self.records)} records, "
+            f"{len(self.errors)} errors in {len(self.invalid_indices())} records, "
+            f"{len(self.warnings)} warnings ({self.elapsed * 1000:.1f} ms)"
+        ]
+        ordered = self.errors + self.warnings
+        for problem in ordered[:limit]:
+            if problem['index'] is None:
+                where = "Sheet"
+            else:
+                where = f"{describe_row(self.records[problem['index']], problem['index'])} {problem['name']}"
+            lines.append(f"  [{problem['severity'].upper()}] {where}: {problem['message']}")
+        if len(ordered) > limit:
+            lines.append(f"  ... and {len(ordered) - limit} more")
+        return "\n".join(lines)
+
+    def write(self, report_dir="reports"):
+        """
+        Write every problem as CSV
+
+        Returns:
+            Path of the CSV file
+        """
+        os.makedirs(report_dir, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        sheet = ''.join(ch if ch.isalnum() else '_' for ch in self.sheet_name)
+        path = os.path.join(report_dir, f"validation_{sheet}_{stamp}.csv")
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(self.problems)
+        return path
+
+
+def _check_identity(report, records):
+    """Names, email addresses and CNICs"""
+    for index, record in enumerate(records):
+        if get_name(record) == 'Unknown':
+            report.add(index, 'error', 'Name', "Missing name")
+
+        email = get_email(record)
+        if not email:
+            report.add(index, 'error', 'email address', "Missing email address")
+        elif not EMAIL_PATTERN.match(email):
+            report.add(index, 'error', 'email address', f"Invalid email address '{email}'", email)
+
+        cnic = get_cnic(record)
+        if not cnic:
+            report.add(index, 'error', 'CNIC', "Missing CNIC")
+        elif not CNIC_PATTERN.match(cnic):
+            report.add(index, 'warning', 'CNIC', f"CNIC '{cnic}' is not in the 12345-1234567-1 format", cnic)
+
+
+def _check_amounts(report, records, headers):
+    """Amount columns, then each record's Net Salary against its table totals"""
+    count = len(records)
+    earnings = [0.0] * count
+    deductions = [0.0] * count
+
+    for fields, totals in ((EARNINGS_FIELDS, earnings), (DEDUCTION_FIELDS, deductions)):
+        for field_names, label in fields:
+            columns = resolve_columns(headers, field_names)
+            if not columns:
+                continue
+            for index, value in enumerate(column_values(records, columns)):
+                amount, ok = parse_amount(value)
+                if not ok:
+                    report.add(index, 'error', columns[0], f"{label} '{value}' is not a number", value)
+                elif amount is not None and amount < 0:
+                    report.add(index, 'warning', columns[0],
+                               f"{label} is negative ({amount:,.2f}) and is left off the slip", value)
+                elif amount:
+                    # The slip only lists (and totals) positive amounts
+                    totals[index] += amount
+
+    net_columns = resolve_columns(headers, NET_SALARY_FIELDS)
+    if not net_columns:
+        report.add(None, 'warning', 'Net Salary', "Sheet has no Net Salary column")
+        return
+    paid_columns = resolve_columns(headers, AMOUNT_PAID_FIELDS)
+    paid_values = column_values(records, paid_columns) if paid_columns else [None] * count
+
+    for index, value in enumerate(column_values(records, net_columns)):
+        net, ok = parse_amount(value)
+        if not ok:
+            report.add(index, 'error', net_columns[0], f"Net Salary '{value}' is not a number", value)
+            continue
+        paid, paid_ok = parse_amount(paid_values[index])
+        if not paid_ok:
+            report.add(index, 'error', paid_columns[0], f"Amount Paid '{paid_values[index]}' is not a number",
+                       paid_values[index])
+        if net is None:
+            if not paid:
+                report.add(index, 'warning', net_columns[0], "Net Salary is empty; the slip shows no net amount")
+            continue
+        expected = earnings[index] - deductions[index]
+        if abs(net - expected) > NET_TOLERANCE:
+            report.add(index, 'error', net_columns[0],
+                       f"Net Salary {net:,.2f} does not match earnings minus deductions ({expected:,.2f})", value)
+
+
+def _check_conflicts(report, records, table):
+    """Repeated CNICs, shared email addresses and slip filename collisions"""
+    for index, record in enumerate(records):
+        for severity, field, message in table.conflicts_of(record):
+            report.add(index, severity, field, message)
+
+
+def validate_records(records, sheet_name="", table=None):
+    """
+    Check every record of a month before generating or sending
+
+    Args:
+        table: EmployeeTable the records come from, if already built; it
+            supplies the duplicate checks, so pass the whole month's table
+            when validating only some of its records
+
+    Returns:
+        ValidationReport with every problem found
+    """
+    report = ValidationReport(sheet_name, records)
+    if not records:
+        return report
+
+    with span('validate'):
+        start = time.perf_counter()
+        headers = record_headers(records)
+        if table is None:
+            table = EmployeeTable(records, sheet_name, PDFGenerator(None).get_pdf_filename)
+        _check_identity(report, records)
+        _check_conflicts(report, records, table)
+        _check_amounts(report, records, headers)
+        report.elapsed = time.perf_counter() - start
+    return report
+
+
+def get_validation_mode(config, override=None):
+    """Validation mode from an explicit override or the config's 'validation' option"""
+    mode = str(override or config.get('validation', DEFAULT_VALIDATION_MODE)).lower()
+    if mode not in VALIDATION_MODES:
+        raise ValueError(f"Unknown validation mode '{mode}' (expected one of {', '.join(VALIDATION_MODES)})")
+    return mode
@@ -0,0 +1,62 @@
+"""
+Local copy of raw month sheets, so year-end work reads each month from
+Google once.
+
+Values are stored as returned by the Sheets API (before parsing), one JSON
+file per sheet under <cache_dir>/<spreadsheet_id>/, together with the
+spreadsheet's last modified time when they were read. A copy is only used
+while the spreadsheet has not changed since. The files hold salary data:
+keep the cache folder private and out of version control.
+"""
+import json
+import os
+import tempfile
+from datetime import datetime
+
+
+class SheetCache:
+    def __init__(self, directory, spreadsheet_id):
+        self.directory = os.path.join(directory, ''.join(
+            ch if ch.isalnum() or ch in '-_' else '_' for ch in str(spreadsheet_id)))
+
+    def path(self, sheet_name):
+        name = ''.join(ch if ch.isalnum() else '_' for ch in sheet_name.strip().lower())
+        return os.path.join(self.directory, f"{name}.json")
+
+    def get(self, sheet_name, modified_time=None):
+        """
+        Cached copy of a sheet, or None if it has not been cached
+
+        Args:
+            modified_time: The spreadsheet's current modified time; a copy
+                read before a different one is stale and not returned
+
+        Returns:
+            Dict with 'values' (the raw rows), 'fetched_at' and 'modified_time'
+        """
+        try:
+            with open(self.path(sheet_name), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or 'values' not in entry:
+            return None
+        if modified_time is not None and entry.get('modified_time') != modified_time:
+            return None
+        return entry
+
+    def put(self, sheet_name, values, modified_time=None):
+        """Store a sheet's values read at the spreadsheet's modified_time, replacing any earlier copy atomically"""
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix='.sheet_', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({'sheet': sheet_name,
+                           'fetched_at': datetime.now().isoformat(timespec='seconds'),
+                           'modified_time': modified_time,
+                           'values': values}, f)
+            os.replace(tmp_path, self.path(sheet_name))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
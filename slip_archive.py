@@ -0,0 +1,395 @@
+"""
+Content-addressed archive of generated slips.
+
+Every archived slip is stored once under its SHA-256 and indexed by month
+and CNIC in a SQLite database, so listing or fetching a past slip is an
+index lookup rather than a directory scan. Reissuing a slip with the same
+bytes adds nothing; a changed reissue is kept as a new version.
+
+New slips are first stored as loose files under objects/. Packing a month
+moves its loose slips into packs/<month>.pack: xz-compressed blocks of
+about BLOCK_BYTES of slips each. Slips of one month share their letter
+head, fonts and stamp images, which compression inside a block removes,
+so a packed month takes a small fraction of its size in pdfs/. A slip is
+read back by decompressing only its block. Later packs of the same month
+(reissues) are appended as new blocks.
+
+Layout:
+    archive/index.sqlite
+    archive/objects/ab/abcdef....pdf      loose slips
+    archive/packs/January_2025.pack       packed months
+
+Usage:
+    python slip_archive.py add --month "January 2025" --config config.json
+    python slip_archive.py pack --month "January 2025"
+    python slip_archive.py list --month "January 2025"
+    python slip_archive.py list --cnic 35202-1234567-1
+    python slip_archive.py get --month "January 2025" --cnic 35202-1234567-1 --output-dir restored
+    python slip_archive.py stats
+"""
+import argparse
+import hashlib
+import lzma
+import os
+import sqlite3
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+
+from record_fields import get_email, get_name, get_cnic
+from employee_table import normalize_cnic
+
+DEFAULT_ARCHIVE_DIR = 'archive'
+
+# Uncompressed size of one packed block; the xz dictionary covers a whole
+# block, so repeated letter heads and stamps inside it compress away
+BLOCK_BYTES = 8 * 1024 * 1024
+XZ_PRESET = 6
+
+# Seconds to wait for another process's write (e.g. a pack in progress)
+# before giving up on the index
+LOCK_TIMEOUT = 600
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    pack TEXT,
+    block_offset INTEGER,
+    block_length INTEGER,
+    offset INTEGER
+);
+CREATE TABLE IF NOT EXISTS slips (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    month TEXT NOT NULL,
+    cnic TEXT NOT NULL,
+    name TEXT,
+    email TEXT,
+    filename TEXT,
+    sha256 TEXT NOT NULL REFERENCES objects(sha256),
+    archived_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS slips_month_cnic ON slips (month, cnic);
+CREATE INDEX IF NOT EXISTS slips_cnic ON slips (cnic);
+"""
+
+
+def _slug(text):
+    return ''.join(ch if ch.isalnum() else '_' for ch in text.strip())
+
+
+def archive_key(record):
+    """Index key of an employee: CNIC digits, or the name when there is no CNIC"""
+    return normalize_cnic(get_cnic(record)) or f"name:{get_name(record).strip().lower()}"
+
+
+class SlipArchive:
+    def __init__(self, root=DEFAULT_ARCHIVE_DIR):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.packs_dir = os.path.join(root, 'packs')
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.packs_dir, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(root, 'index.sqlite'), timeout=LOCK_TIMEOUT)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _loose_path(self, sha256):
+        return os.path.join(self.objects_dir, sha256[:2], f"{sha256}.pdf")
+
+    @contextmanager
+    def _write_lock(self):
+        """Hold the index write lock for the block; commit at the end, roll back on error"""
+        if self.db.in_transaction:
+            self.db.commit()
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+            self.db.commit()
+        except BaseException:
+            self.db.rollback()
+            raise
+
+    def add(self, pdf_path, month, record):
+        """
+        Archive one slip
+
+        Returns:
+            'new' (first slip for this employee and month), 'reissue' (a
+            changed slip, kept as a new version) or 'unchanged'
+        """
+        with open(pdf_path, 'rb') as f:
+            data = f.read()
+        sha256 = hashlib.sha256(data).hexdigest()
+        key = archive_key(record)
+
+        # Checked and written under the write lock, so runs archiving the
+        # same slips at once neither clash on an object nor record it twice
+        with self._write_lock():
+            latest = self.db.execute(
+                "SELECT sha256 FROM slips WHERE month = ? AND cnic = ? ORDER BY id DESC LIMIT 1",
+                (month, key)).fetchone()
+            if latest and latest['sha256'] == sha256:
+                return 'unchanged'
+
+            if not self.db.execute("SELECT 1 FROM objects WHERE sha256 = ?", (sha256,)).fetchone():
+                path = self._loose_path(sha256)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(prefix='.object_', dir=os.path.dirname(path))
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+                self.db.execute("INSERT INTO objects (sha256, size) VALUES (?, ?)", (sha256, len(data)))
+
+            self.db.execute(
+                "INSERT INTO slips (month, cnic, name, email, filename, sha256, archived_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (month, key, get_name(record), get_email(record), os.path.basename(pdf_path), sha256,
+                 datetime.now().isoformat(timespec='seconds')))
+        return 'reissue' if latest else 'new'
+
+    def add_month(self, records, month, output_dir, pdf_generator):
+        """
+        Archive the slips of a month's records found in output_dir
+
+        Returns:
+            Dict of counts: new, reissue, unchanged and missing
+        """
+        counts = {'new': 0, 'reissue': 0, 'unchanged': 0, 'missing': 0}
+        for record in records:
+            pdf_path = os.path.join(output_dir, pdf_generator.get_pdf_filename(record, month))
+            if not os.path.exists(pdf_path):
+                counts['missing'] += 1
+                continue
+            counts[self.add(pdf_path, month, record)] += 1
+        return counts
+
+    def pack(self, month):
+        """
+        Move a month's loose slips into its pack file as compressed blocks
+
+        Safe to run from several processes: the index stays write-locked
+        from choosing the slips until they are recorded as packed, so a
+        second pack of the month waits and then finds nothing left to do.
+
+        Returns:
+            Dict with objects packed, blocks written, and bytes before and after
+        """
+        with self._write_lock():
+            rows = self.db.execute(
+                "SELECT DISTINCT o.sha256, o.size FROM objects o JOIN slips s ON s.sha256 = o.sha256 "
+                "WHERE s.month = ? AND o.pack IS NULL ORDER BY o.sha256", (month,)).fetchall()
+            result = {'objects': len(rows), 'blocks': 0, 'bytes_in': 0, 'bytes_out': 0}
+            if rows:
+                self._write_blocks(month, rows, result)
+
+        for row in rows:
+            path = self._loose_path(row['sha256'])
+            try:
+                os.remove(path)
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                # Already removed, or the folder still holds other slips
+                pass
+        return result
+
+    def _write_blocks(self, month, rows, result):
+        """Append rows' loose slips to the month's pack and record where they went (uncommitted)"""
+        pack_name = f"{_slug(month)}.pack"
+        pack_path = os.path.join(self.packs_dir, pack_name)
+        blocks = []
+        current, size = [], 0
+        for row in rows:
+            if current and size + row['size'] > BLOCK_BYTES:
+                blocks.append(current)
+                current, size = [], 0
+            current.append(row)
+            size += row['size']
+        blocks.append(current)
+
+        # Blocks are appended, so offsets of earlier blocks stay valid
+        with open(pack_path, 'ab') as pack:
+            for block in blocks:
+                data = bytearray()
+                placements = []
+                for row in block:
+                    with open(self._loose_path(row['sha256']), 'rb') as f:
+                        placements.append((row['sha256'], len(data)))
+                        data += f.read()
+                compressed = lzma.compress(bytes(data), preset=XZ_PRESET)
+                block_offset = pack.tell()
+                pack.write(compressed)
+                pack.flush()
+                os.fsync(pack.fileno())
+                self.db.executemany(
+                    "UPDATE objects SET pack = ?, block_offset = ?, block_length = ?, offset = ? WHERE sha256 = ?",
+                    [(pack_name, block_offset, len(compressed), offset, sha256) for sha256, offset in placements])
+                result['blocks'] += 1
+                result['bytes_in'] += len(data)
+                result['bytes_out'] += len(compressed)
+
+    def read_object(self, sha256):
+        """Bytes of an archived slip"""
+        row = self.db.execute("SELECT * FROM objects WHERE sha256 = ?", (sha256,)).fetchone()
+        if row is None:
+            raise Exception(f"Object {sha256} is not in the archive")
+        if row['pack'] is None:
+            with open(self._loose_path(sha256), 'rb') as f:
+                return f.read()
+        with open(os.path.join(self.packs_dir, row['pack']), 'rb') as pack:
+            pack.seek(row['block_offset'])
+            block = lzma.decompress(pack.read(row['block_length']))
+        data = block[row['offset']:row['offset'] + row['size']]
+        if hashlib.sha256(data).hexdigest() != sha256:
+            raise Exception(f"Archived slip {sha256} is damaged")
+        return data
+
+    def list(self, month=None, cnic=None, all_versions=False):
+        """
+        Archived slips, optionally for one month and/or employee
+
+        Returns:
+            List of dicts (id, month, cnic, name, email, filename, sha256,
+            archived_at, size, packed); only the latest version of each slip
+            unless all_versions is set
+        """
+        conditions, params = [], []
+        if month:
+            conditions.append("s.month = ?")
+            params.append(month)
+        if cnic:
+            conditions.append("s.cnic = ?")
+            params.append(normalize_cnic(cnic) or cnic)
+        if not all_versions:
+            conditions.append("s.id = (SELECT MAX(id) FROM slips WHERE month = s.month AND cnic = s.cnic)")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self.db.execute(
+            "SELECT s.*, o.size, o.pack IS NOT NULL AS packed FROM slips s "
+            f"JOIN objects o ON o.sha256 = s.sha256 {where} ORDER BY s.month, s.name, s.id", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, month, cnic, version=None):
+        """
+        Bytes and index entry of an employee's slip for a month
+
+        Args:
+            version: 1 for the first issue, 2 for the first reissue...;
+                the latest when None
+        """
+        versions = self.list(month=month, cnic=cnic, all_versions=True)
+        if not versions:
+            raise Exception(f"No archived slip for {cnic} in {month}")
+        if version is not None and not 1 <= version <= len(versions):
+            raise Exception(f"{cnic} has {len(versions)} archived version(s) for {month}")
+        entry = versions[-1] if version is None else versions[version - 1]
+        return self.read_object(entry['sha256']), entry
+
+    def extract(self, month, cnic, output_dir, version=None):
+        """Write an archived slip to output_dir under its original filename; returns the path"""
+        data, entry = self.get(month, cnic, version)
+        os.makedirs(output_dir, exist_ok=True)
+        path = os.path.join(output_dir, entry['filename'])
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def stats(self):
+        """Slip and object counts and disk use of the archive"""
+        row = self.db.execute(
+            "SELECT COUNT(*) AS slips, COUNT(DISTINCT month) AS months FROM slips").fetchone()
+        objects = self.db.execute(
+            "SELECT COUNT(*) AS objects, COALESCE(SUM(size), 0) AS stored_bytes, "
+            "COALESCE(SUM(CASE WHEN pack IS NULL THEN size ELSE 0 END), 0) AS loose_bytes FROM objects").fetchone()
+        slip_bytes = self.db.execute(
+            "SELECT COALESCE(SUM(o.size), 0) FROM slips s JOIN objects o ON o.sha256 = s.sha256").fetchone()[0]
+        pack_bytes = sum(os.path.getsize(os.path.join(self.packs_dir, name)) for name in os.listdir(self.packs_dir))
+        disk_bytes = objects['loose_bytes'] + pack_bytes
+        return {
+            'slips': row['slips'],
+            'months': row['months'],
+            'objects': objects['objects'],
+            'slip_bytes': slip_bytes,
+            'loose_bytes': objects['loose_bytes'],
+            'pack_bytes': pack_bytes,
+            'disk_bytes': disk_bytes,
+            'ratio': round(slip_bytes / disk_bytes, 1) if disk_bytes else 0.0,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive, pack and fetch generated slips")
+    parser.add_argument('--archive-dir', default=DEFAULT_ARCHIVE_DIR)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    add = commands.add_parser('add', help="Archive a month's slips from the output folder")
+    add.add_argument('--month', required=True, help='Sheet name, e.g. "January 2025"')
+    add.add_argument('--config', default='config.json')
+    add.add_argument('--output-dir', default='pdfs')
+    add.add_argument('--pack', action='store_true', help="Pack the month afterwards")
+
+    pack = commands.add_parser('pack', help="Compress a month's loose slips into its pack")
+    pack.add_argument('--month', required=True)
+
+    listing = commands.add_parser('list', help="List archived slips")
+    listing.add_argument('--month')
+    listing.add_argument('--cnic')
+    listing.add_argument('--all-versions', action='store_true')
+
+    get = commands.add_parser('get', help="Restore an archived slip")
+    get.add_argument('--month', required=True)
+    get.add_argument('--cnic', required=True)
+    get.add_argument('--version', type=int)
+    get.add_argument('--output-dir', default='restored')
+
+    commands.add_parser('stats', help="Archive size and compression")
+    args = parser.parse_args(argv)
+
+    try:
+        with SlipArchive(args.archive_dir) as archive:
+            if args.command == 'add':
+                from google_sheets_reader import GoogleSheetsReader
+                from pdf_generator import PDFGenerator
+                records = GoogleSheetsReader(args.config).get_month_data(args.month)
+                counts = archive.add_month(records, args.month, args.output_dir, PDFGenerator(None))
+                print(f"{counts['new']} new, {counts['reissue']} reissued, {counts['unchanged']} unchanged, "
+                      f"{counts['missing']} missing from {args.output_dir}/")
+                if args.pack:
+                    _print_pack(archive.pack(args.month))
+            elif args.command == 'pack':
+                _print_pack(archive.pack(args.month))
+            elif args.command == 'list':
+                for entry in archive.list(args.month, args.cnic, args.all_versions):
+                    where = 'packed' if entry['packed'] else 'loose'
+                    print(f"{entry['month']:<16} {entry['cnic']:<15} {entry['name']:<28} "
+                          f"{entry['size'] / 1024:>7.1f} KB  {entry['archived_at']}  {where}")
+            elif args.command == 'get':
+                print(archive.extract(args.month, args.cnic, args.output_dir, args.version))
+            elif args.command == 'stats':
+                for key, value in archive.stats().items():
+                    print(f"  {key:<12} {value}")
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        return 2
+    return 0
+
+
+def _print_pack(result):
+    if not result['objects']:
+        print("Nothing to pack")
+        return
+    print(f"Packed {result['objects']} slips in {result['blocks']} blocks: "
+          f"{result['bytes_in'] / 1024:.0f} KB -> {result['bytes_out'] / 1024:.0f} KB")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
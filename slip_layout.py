@@ -0,0 +1,314 @@
+"""
+Salary slip layout read from a JSON template and compiled once into a flat
+list of draw operations.
+
+The template (layouts/salary_slip.json, or slip_layout_path in config.json)
+names colors and fonts and lists the elements of the page in drawing order.
+Compiling resolves every color, font and coordinate, drops elements whose
+stamp image is not installed and skips redundant font and color changes.
+Rendering a slip then replays the operations, binding only the record's text
+and the number of table rows.
+
+Elements:
+    text     "text" (may use {month}, {generated_on}, {net_salary},
+             {company}) or "field" (sheet columns to try) with "default";
+             "align": "right" draws right-aligned at x
+    rect     filled rectangle: x, width, height, "fill"
+    line     x, y, x2, y2, "color", "width"
+    image    "source": "stamp" with a "width", or "paid_stamp" with a
+             "height" (the other follows the image); x or center_x, y or
+             center_y
+    table    columns of amounts with a header row, one row per non-zero
+             amount and a totals row; each column has a "title", a
+             "total" label and "rows": "earnings", "deductions" or a list
+             of {"field": [columns], "label": ...}
+    advance  move the flow position down "by" points
+
+Positions are page coordinates (y from the bottom) or, with "top" instead
+of "y", distances below the flow position, which starts at "start" and
+moves down with each advance and table. Numbers may be written as
+expressions of page_width and page_height, e.g. "page_width - 100".
+Elements with "if": "paid_stamp" are drawn only when that image exists.
+"""
+import ast
+import json
+import operator
+import os
+import string
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, LETTER, LEGAL
+
+DEFAULT_LAYOUT_PATH = os.path.join(os.path.dirname(__file__), "layouts", "salary_slip.json")
+
+PAGE_SIZES = {'A4': A4, 'LETTER': LETTER, 'LEGAL': LEGAL}
+
+# Values bound per slip that text elements may use as {placeholders}
+TEXT_VALUES = ('month', 'generated_on', 'net_salary', 'company')
+
+# Stamp images a layout can draw, and the dimension each is sized by
+IMAGE_SOURCES = {'stamp': 'width', 'paid_stamp': 'height'}
+
+_OPERATORS = {ast.Add: operator.add, ast.Sub: operator.sub, ast.Mult: operator.mul, ast.Div: operator.truediv}
+
+
+def _evaluate(node, names):
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body, names)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return node.value
+    if isinstance(node, ast.Name) and node.id in names:
+        return names[node.id]
+    if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+        return _OPERATORS[type(node.op)](_evaluate(node.left, names), _evaluate(node.right, names))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return -_evaluate(node.operand, names)
+    raise ValueError
+
+
+class SlipLayout:
+    """
+    A compiled layout: page size, flow start and the draw operations
+
+    Operations are tuples starting with their name:
+        ('font', name, size)
+        ('fill', color) / ('stroke', color, line_width)
+        ('text', x, y, flow, align, kind, content, default)
+            kind is 'static', 'format' (str.format with the slip's values)
+            or 'field' (content is the sheet columns to try)
+        ('rect', x, y, flow, width, height)
+        ('line', x, y, x2, y2, flow)
+        ('image', source, width, height, x, y, x_centered, y_centered, flow)
+        ('table', table dict)
+        ('advance', by)
+    With flow set, y is a distance below the flow position (for rect, to
+    the rectangle's bottom edge).
+    """
+
+    def __init__(self, template, row_sources, available_images, name="layout"):
+        """
+        Args:
+            template: The parsed JSON template
+            row_sources: Dict of table row list names (e.g. "earnings") to
+                lists of (sheet column names, label)
+            available_images: Image sources that exist; elements needing
+                any other are left out
+            name: Used in error messages
+        """
+        self.name = name
+        self.row_sources = row_sources
+        self.available_images = set(available_images)
+        page = str(template.get('page', 'A4')).upper()
+        if page not in PAGE_SIZES:
+            raise Exception(f"{name}: unknown page size '{page}'")
+        self.page_size = PAGE_SIZES[page]
+        self._names = {'page_width': self.page_size[0], 'page_height': self.page_size[1]}
+        self.colors = {alias: self._parse_color(value) for alias, value in template.get('colors', {}).items()}
+        self.fonts = {alias: self._parse_font(value, alias) for alias, value in template.get('fonts', {}).items()}
+        self.start = self._number(template.get('start', 'page_height - 190'), 'start')
+
+        # Sheet columns per header layout; one sheet's records share theirs
+        self._columns = {}
+        self._state = {}
+        self.ops = []
+        for index, element in enumerate(template.get('elements', [])):
+            self._compile(element, f"element {index + 1} ({element.get('type', '?')})")
+
+    @classmethod
+    def load(cls, path, row_sources, available_images):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                template = json.load(f)
+        except (OSError, ValueError) as e:
+            raise Exception(f"Could not read slip layout {path}: {str(e)}")
+        return cls(template, row_sources, available_images, os.path.basename(path))
+
+    def _number(self, value, where):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return value
+        try:
+            return _evaluate(ast.parse(str(value), mode='eval'), self._names)
+        except (SyntaxError, ValueError, ZeroDivisionError):
+            raise Exception(f"{self.name}, {where}: '{value}' is not a number or page size expression")
+
+    def _parse_color(self, value):
+        if isinstance(value, str) and value.startswith('#'):
+            return colors.HexColor(value)
+        if isinstance(value, str) and value in getattr(self, 'colors', {}):
+            return self.colors[value]
+        raise Exception(f"{self.name}: unknown color '{value}'")
+
+    def _parse_font(self, value, where):
+        if isinstance(value, str) and value in getattr(self, 'fonts', {}):
+            return self.fonts[value]
+        if isinstance(value, list) and len(value) == 2:
+            return str(value[0]), self._number(value[1], where)
+        raise Exception(f"{self.name}, {where}: unknown font '{value}'")
+
+    def _position(self, element, where, axis='y'):
+        """(value, flow) from "y" (page position) or "top" (below the flow position)"""
+        if axis in element:
+            return self._number(element[axis], where), False
+        if 'top' in element:
+            return self._number(element['top'], where), True
+        raise Exception(f"{self.name}, {where}: needs '{axis}' or 'top'")
+
+    def _set(self, state, *args):
+        """Emit a state change unless the canvas is already in that state"""
+        if self._state.get(state) != args:
+            self._state[state] = args
+            self.ops.append((state,) + args)
+
+    def _compile(self, element, where):
+        kind = element.get('type')
+        condition = element.get('if')
+        if condition is not None and condition not in self.available_images:
+            return
+
+        if kind == 'text':
+            self._set('font', *self._parse_font(element.get('font', ['Helvetica', 10]), where))
+            self._set('fill', self._parse_color(element.get('color', '#000000')))
+            x = self._number(element.get('x', 0), where)
+            y, flow = self._position(element, where)
+            align = element.get('align', 'left')
+            if align not in ('left', 'right'):
+                raise Exception(f"{self.name}, {where}: align must be left or right")
+            if 'field' in element:
+                names = element['field']
+                names = (names,) if isinstance(names, str) else tuple(names)
+                self.ops.append(('text', x, y, flow, align, 'field', names, str(element.get('default', ''))))
+            else:
+                text = str(element.get('text', ''))
+                fields = [field for _, field, _, _ in string.Formatter().parse(text) if field is not None]
+                unknown = [field for field in fields if field not in TEXT_VALUES]
+                if unknown:
+                    raise Exception(f"{self.name}, {where}: unknown value {{{unknown[0]}}}; "
+                                    f"use one of {', '.join(TEXT_VALUES)}")
+                self.ops.append(('text', x, y, flow, align, 'format' if fields else 'static', text, ''))
+
+        elif kind == 'rect':
+            self._set('fill', self._parse_color(element.get('fill', '#000000')))
+            top, flow = self._position(element, where)
+            height = self._number(element.get('height', 0), where)
+            # Flow rectangles hang below the position; store their bottom edge
+            y = top + height if flow else top
+            self.ops.append(('rect', self._number(element.get('x', 0), where), y, flow,
+                             self._number(element.get('width', 0), where), height))
+
+        elif kind == 'line':
+            self._set('stroke', self._parse_color(element.get('color', '#000000')),
+                      self._number(element.get('width', 1), where))
+            y, flow = self._position(element, where)
+            y2 = self._number(element.get('y2', element.get('y', element.get('top', 0))), where)
+            self.ops.append(('line', self._number(element.get('x', 0), where), y,
+                             self._number(element.get('x2', 0), where), y2, flow))
+
+        elif kind == 'image':
+            source = element.get('source')
+            if source not in IMAGE_SOURCES:
+                raise Exception(f"{self.name}, {where}: source must be one of {', '.join(IMAGE_SOURCES)}")
+            if source not in self.available_images:
+                return
+            # The watermark is prepared for a width, the paid stamp for a height
+            size_key = IMAGE_SOURCES[source]
+            if size_key not in element:
+                raise Exception(f"{self.name}, {where}: the {source} image needs a {size_key}")
+            size = self._number(element[size_key], where)
+            width, height = (size, None) if size_key == 'width' else (None, size)
+            x_centered = 'center_x' in element
+            x = self._number(element.get('center_x', element.get('x', 0)), where)
+            y_centered = 'center_y' in element
+            if y_centered:
+                y, flow = self._number(element['center_y'], where), False
+            else:
+                y, flow = self._position(element, where)
+            self.ops.append(('image', source, width, height, x, y, x_centered, y_centered, flow))
+
+        elif kind == 'table':
+            self.ops.append(('table', self._compile_table(element, where)))
+            # The table leaves the canvas in its own font and colors
+            self._state = {}
+
+        elif kind == 'advance':
+            self.ops.append(('advance', self._number(element.get('by', 0), where)))
+
+        else:
+            raise Exception(f"{self.name}, {where}: unknown element type '{kind}'")
+
+    def _compile_table(self, element, where):
+        columns = element.get('columns') or []
+        if not columns:
+            raise Exception(f"{self.name}, {where}: a table needs columns")
+        x = self._number(element.get('x', 50), where)
+        width = self._number(element.get('width', 'page_width - 100'), where)
+        col_width = width / len(columns)
+        padding = self._number(element.get('padding', 10), where)
+
+        compiled_columns = []
+        for index, column in enumerate(columns):
+            rows = column.get('rows')
+            if isinstance(rows, str):
+                if rows not in self.row_sources:
+                    raise Exception(f"{self.name}, {where}: unknown rows '{rows}'; "
+                                    f"use one of {', '.join(self.row_sources)} or a list")
+                rows = self.row_sources[rows]
+            else:
+                rows = [(tuple(row['field']) if isinstance(row['field'], list) else (row['field'],), row['label'])
+                        for row in rows or []]
+            col_x = x + col_width * index
+            right = x + width - padding if index == len(columns) - 1 else col_x + col_width - padding
+            compiled_columns.append({
+                'x': col_x,
+                'text_x': col_x + padding,
+                'right_x': right,
+                'title': str(column.get('title', '')),
+                'total': str(column.get('total', '')),
+                'rows': [(tuple(names), label) for names, label in rows],
+            })
+
+        return {
+            'x': x,
+            'width': width,
+            'col_width': col_width,
+            'header_height': self._number(element.get('header_height', 25), where),
+            'row_height': self._number(element.get('row_height', 22), where),
+            'header_baseline': self._number(element.get('header_baseline', 17), where),
+            'row_baseline': self._number(element.get('row_baseline', 15), where),
+            'header_font': self._parse_font(element.get('header_font', ['Helvetica-Bold', 10]), where),
+            'header_color': self._parse_color(element.get('header_color', '#FFFFFF')),
+            'header_fill': self._parse_color(element.get('header_fill', '#0e8282')),
+            'row_font': self._parse_font(element.get('row_font', ['Helvetica', 9]), where),
+            'row_color': self._parse_color(element.get('row_color', '#000000')),
+            'row_fills': [self._parse_color(fill) for fill in element.get('row_fills', ['#F5F5F5', '#FFFFFF'])],
+            'total_font': self._parse_font(element.get('total_font', ['Helvetica-Bold', 9]), where),
+            'total_color': self._parse_color(element.get('total_color', '#000000')),
+            'total_fill': self._parse_color(element.get('total_fill', '#E0E0E0')),
+            'border_color': self._parse_color(element.get('border_color', '#073630')),
+            'border_width': self._number(element.get('border_width', 1), where),
+            'after': self._number(element.get('after', 15), where),
+            'columns': compiled_columns,
+        }
+
+    def field_value(self, record, names):
+        """
+        First non-empty value among a record's columns matching names
+
+        Same matching as PDFGenerator._get_field_value (exact name first,
+        then ignoring case), but the columns are worked out once per sheet
+        layout rather than for every slip.
+        """
+        headers = tuple(record)
+        key = (headers, names)
+        columns = self._columns.get(key)
+        if columns is None:
+            by_lower = {header.lower().strip(): header for header in headers}
+            columns = []
+            for field in names:
+                for column in (field if field in record else None, by_lower.get(field.lower())):
+                    if column is not None and column not in columns:
+                        columns.append(column)
+            self._columns[key] = columns
+        for column in columns:
+            if record[column]:
+                return record[column]
+        return None
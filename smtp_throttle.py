@@ -0,0 +1,253 @@
+import asyncio
+import contextlib
+import random
+import smtplib
+import socket
+import threading
+import time
+
+# Reply classes used by the throttle
+TRANSIENT = "transient"
+PERMANENT = "permanent"
+QUOTA = "quota"
+
+# 421 service not available, 450/451/452 mailbox busy / local error / storage,
+# 454 temporary authentication failure - all mean "try again later"
+TRANSIENT_SMTP_CODES = {421, 450, 451, 452, 454}
+
+# Markers Gmail and most relays use for sending limits that will not clear
+# within a single run (e.g. "550 5.4.5 Daily user sending quota exceeded")
+QUOTA_MARKERS = ("5.4.5", "quota exceeded", "sending limit exceeded", "daily user sending")
+
+
+class SendQuotaExceeded(Exception):
+    """Raised when the server reports that the sending quota is used up"""
+
+
+class SendCancelled(Exception):
+    """Raised by a send function when the run was stopped before the message went out"""
+
+
+def get_smtp_code(error):
+    """Get the SMTP reply code and text carried by an exception (if any)"""
+    # Unwrap errors re-raised by EmailSender
+    error = getattr(error, 'original', None) or error
+
+    if isinstance(error, smtplib.SMTPRecipientsRefused) and error.recipients:
+        code, message = next(iter(error.recipients.values()))
+        return code, message
+
+    # smtplib uses smtp_code/smtp_error, aiosmtplib uses code/message
+    code = getattr(error, 'smtp_code', None)
+    if code is None:
+        code = getattr(error, 'code', None)
+    message = getattr(error, 'smtp_error', None)
+    if message is None:
+        message = getattr(error, 'message', None)
+
+    if isinstance(message, bytes):
+        message = message.decode('utf-8', 'replace')
+    if not isinstance(code, int):
+        code = None
+    return code, message or str(error)
+
+
+def classify_smtp_error(error):
+    """
+    Classify a send failure as transient, permanent or quota
+
+    Args:
+        error: Exception raised while sending
+
+    Returns:
+        TRANSIENT, PERMANENT or QUOTA
+    """
+    code, message = get_smtp_code(error)
+    text = str(message).lower()
+
+    if any(marker in text for marker in QUOTA_MARKERS):
+        return QUOTA
+
+    if code is not None:
+        if code in TRANSIENT_SMTP_CODES or 400 <= code < 500:
+            return TRANSIENT
+        return PERMANENT
+
+    # No reply code: the connection dropped or timed out before the server
+    # answered, which is worth another attempt
+    original = getattr(error, 'original', None) or error
+    if isinstance(original, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError,
+                             ConnectionError, socket.timeout, TimeoutError)):
+        return TRANSIENT
+
+    return PERMANENT
+
+
+class AdaptiveSendThrottle:
+    """
+    Paces outgoing messages and retries transient SMTP failures.
+
+    The delay between messages grows when the server defers us and shrinks
+    again after a run of successful deliveries.
+    """
+
+    def __init__(self, min_delay=0.0, max_delay=60.0, initial_delay=0.5,
+                 backoff_factor=2.0, recovery_factor=0.8, recovery_after=5,
+                 deferral_floor=0.5, max_retries=4, retry_delay=5.0, sleep=time.sleep):
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.delay = max(min_delay, initial_delay)
+        self.backoff_factor = backoff_factor
+        self.recovery_factor = recovery_factor
+        self.recovery_after = recovery_after
+        self.deferral_floor = deferral_floor
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._sleep = sleep
+
+        self._lock = threading.Lock()
+        self._last_send = None
+        self._success_streak = 0
+
+        # Per-run counters
+        self.sent = 0
+        self.deferrals = 0
+        self.retries = 0
+        self.permanent_failures = 0
+        self.quota_exhausted = False
+
+    @classmethod
+    def from_config(cls, config):
+        """Create a throttle from the optional send_* keys in config.json"""
+        return cls(
+            min_delay=float(config.get('send_min_delay', 0.0)),
+            max_delay=float(config.get('send_max_delay', 60.0)),
+            initial_delay=float(config.get('send_initial_delay', 0.5)),
+            max_retries=int(config.get('send_max_retries', 4)),
+            retry_delay=float(config.get('send_retry_delay', 5.0)),
+        )
+
+    def reserve_slot(self):
+        """Reserve the next send slot and get how long to pause before it"""
+        with self._lock:
+            now = time.monotonic()
+            pause = 0.0
+            if self._last_send is not None:
+                pause = max(0.0, self._last_send + self.delay - now)
+            self._last_send = now + pause
+        return pause
+
+    def wait(self):
+        """Block until the current send rate allows another message"""
+        pause = self.reserve_slot()
+        if pause > 0:
+            self._sleep(pause)
+
+    def record_success(self):
+        """Speed back up after a streak of accepted messages"""
+        with self._lock:
+            self.sent += 1
+            self._success_streak += 1
+            if self._success_streak >= self.recovery_after:
+                self._success_streak = 0
+                self.delay = max(self.min_delay, self.delay * self.recovery_factor)
+
+    def record_deferral(self):
+        """Slow the overall rate down after the server deferred a message"""
+        with self._lock:
+            self.deferrals += 1
+            self._success_streak = 0
+            self.delay = min(self.max_delay, max(self.delay, self.deferral_floor) * self.backoff_factor)
+
+    def retry_pause(self, attempt):
+        """Exponential pause (with jitter) before retry number `attempt`"""
+        pause = min(self.max_delay, self.retry_delay * (2 ** (attempt - 1)))
+        return pause + random.uniform(0, pause * 0.1)
+
+    def send(self, func, *args, **kwargs):
+        """
+        Call func (normally EmailSender.send_email) under the throttle
+
+        Transient failures are retried up to max_retries times. A quota error
+        raises SendQuotaExceeded so the caller can stop the run.
+
+        Returns:
+            Whatever func returns
+        """
+        attempt = 0
+        while True:
+            self.wait()
+            try:
+                result = func(*args, **kwargs)
+            except (SendQuotaExceeded, SendCancelled):
+                raise
+            except Exception as e:
+                if not self._should_retry(e, attempt):
+                    raise
+                attempt += 1
+                self._sleep(self.retry_pause(attempt))
+                continue
+            self.record_success()
+            return result
+
+    async def send_async(self, func, *args, limiter=None, **kwargs):
+        """
+        Coroutine version of send() for the asyncio delivery engine
+
+        Args:
+            limiter: Optional async context manager (e.g. an asyncio.Semaphore)
+                held while the send slot is booked and func runs, but not
+                during retry pauses. Booking the slot only once a connection
+                is free means later sends follow the delay as it changes,
+                rather than slots booked up front at the initial delay.
+        """
+        attempt = 0
+        while True:
+            async with (limiter or contextlib.nullcontext()):
+                pause = self.reserve_slot()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                try:
+                    result = await func(*args, **kwargs)
+                    error = None
+                except (SendQuotaExceeded, SendCancelled):
+                    raise
+                except Exception as e:
+                    error = e
+            if error is None:
+                self.record_success()
+                return result
+            if not self._should_retry(error, attempt):
+                raise error
+            attempt += 1
+            await asyncio.sleep(self.retry_pause(attempt))
+
+    def _should_retry(self, error, attempt):
+        """Record a failed attempt and decide whether to try again"""
+        kind = classify_smtp_error(error)
+        if kind == QUOTA:
+            with self._lock:
+                self.quota_exhausted = True
+            raise SendQuotaExceeded(str(error)) from error
+        if kind == TRANSIENT:
+            self.record_deferral()
+            if attempt < self.max_retries:
+                with self._lock:
+                    self.retries += 1
+                return True
+        else:
+            with self._lock:
+                self.permanent_failures += 1
+        return False
+
+    def stats(self):
+        """Get the per-run delivery counters"""
+        with self._lock:
+            return {
+                'sent': self.sent,
+                'deferrals': self.deferrals,
+                'retries': self.retries,
+                'permanent_failures': self.permanent_failures,
+                'quota_exhausted': self.quota_exhausted,
+                'current_delay': round(self.delay, 3),
+            }
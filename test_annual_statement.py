@@ -0,0 +1,97 @@
+"""Annual statement check: one employee gets one statement across the year
+
+Builds statements from synthetic month records (no Google Sheets access)
+where some months leave the CNIC or email cell blank, and checks they are
+still combined into one statement per employee.
+
+Usage:
+    python test_annual_statement.py
+    python -m pytest test_annual_statement.py
+"""
+
+import sys
+
+from annual_statement import build_statements, select_statements
+from bench_pdf import make_records
+
+MONTH_NAMES = ["January 2025", "February 2025", "March 2025"]
+
+
+def make_months(blank=None):
+    """Three months of the same two employees; blank(month, record) may clear cells"""
+    months = []
+    for month_index, month_name in enumerate(MONTH_NAMES):
+        records = make_records(2)
+        if blank:
+            for record in records:
+                blank(month_index, record)
+        months.append((month_name, records))
+    return months
+
+
+def totals_by_name(statements):
+    return {statement['name']: (len(statement['months']), statement['totals']['net'])
+            for statement in statements}
+
+
+def test_blank_cnic_month_joins_statement():
+    def blank(month_index, record):
+        if month_index == 1 and record['Name'] == 'Employee 00000':
+            record['CNIC'] = ''
+
+    statements = build_statements(make_months(blank))
+    assert len(statements) == 2, [statement['key'] for statement in statements]
+    assert totals_by_name(statements)['Employee 00000'] == (3, 58500 * 3)
+    assert statements[0]['cnic'] == '35202-0000000-1'
+    # The selection that failed with "Several employees match" when the statement was split
+    assert len(select_statements(statements, ['Employee 00000'])) == 1
+
+
+def test_name_only_month_joins_statement():
+    def blank(month_index, record):
+        if month_index == 0:
+            record['CNIC'] = ''
+            record['email address'] = ''
+
+    statements = build_statements(make_months(blank))
+    assert len(statements) == 2, [statement['key'] for statement in statements]
+    assert totals_by_name(statements)['Employee 00001'] == (3, 58501 * 3)
+
+
+def test_same_name_different_cnic_stay_apart():
+    months = make_months()
+    for _, records in months:
+        records[1]['Name'] = records[0]['Name']
+
+    statements = build_statements(months)
+    assert len(statements) == 2
+    assert {statement['cnic'] for statement in statements} == {'35202-0000000-1', '35202-0000001-1'}
+
+
+def test_same_name_other_email_without_cnic_stays_apart():
+    # A CNIC-less row with the same name but another email may be someone else
+    def blank(month_index, record):
+        if month_index == 1 and record['Name'] == 'Employee 00000':
+            record['CNIC'] = ''
+            record['email address'] = 'someone.else@example.com'
+
+    statements = build_statements(make_months(blank))
+    assert len(statements) == 3, [statement['key'] for statement in statements]
+    by_cnic = {statement['cnic']: statement for statement in statements}
+    assert by_cnic['35202-0000000-1']['totals']['net'] == 58500 * 2
+    assert by_cnic['35202-0000000-1']['email'] == 'employee00000@example.com'
+    assert by_cnic['']['email'] == 'someone.else@example.com'
+    assert len(by_cnic['']['months']) == 1
+
+
+if __name__ == "__main__":
+    failed = 0
+    for test in (test_blank_cnic_month_joins_statement, test_name_only_month_joins_statement,
+                 test_same_name_different_cnic_stay_apart, test_same_name_other_email_without_cnic_stays_apart):
+        try:
+            test()
+            print(f"  [PASS] {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  [FAIL] {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,114 @@
+"""Async delivery check: the batch follows the throttle's delay as it changes
+
+Runs AsyncEmailSender.send_batch against a stand-in send_email_async (no
+SMTP server, nothing is sent) and checks that the gap between sends speeds
+up after successes, slows down after a deferral, and that a message backing
+off does not hold a connection slot.
+
+Usage:
+    python test_async_sender.py
+    python -m pytest test_async_sender.py
+"""
+
+import asyncio
+import smtplib
+import sys
+import time
+
+from async_email_sender import AsyncEmailSender
+from smtp_throttle import AdaptiveSendThrottle
+
+
+class StandInSender(AsyncEmailSender):
+    """AsyncEmailSender whose sends take a few milliseconds and fail as told"""
+
+    def __init__(self, concurrency, defer=()):
+        self.concurrency = concurrency
+        self.defer = set(defer)
+        self.starts = []
+        self.active = 0
+        self.peak = 0
+
+    def get_concurrency(self):
+        return self.concurrency
+
+    async def send_email_async(self, to_email, subject, body, pdf_path=None, stats=None):
+        self.starts.append((time.perf_counter(), to_email))
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.005)
+        finally:
+            self.active -= 1
+        if to_email in self.defer:
+            self.defer.discard(to_email)
+            raise smtplib.SMTPResponseException(451, b"4.7.0 Try again later")
+        return True
+
+
+def make_messages(count):
+    return [{'to_email': f"employee{i:03d}@example.com", 'subject': "Slip", 'body': ""} for i in range(count)]
+
+
+def test_sends_speed_up_as_the_delay_recovers():
+    # 0.1 s apart at first, halving after every accepted message
+    throttle = AdaptiveSendThrottle(min_delay=0.0, initial_delay=0.1, recovery_after=1, recovery_factor=0.5)
+    sender = StandInSender(concurrency=3)
+
+    start = time.perf_counter()
+    results = sender.send_batch(make_messages(30), throttle=throttle)
+    elapsed = time.perf_counter() - start
+
+    assert all(result['status'] == 'sent' for result in results)
+    # Slots booked up front at the initial delay would take 30 x 0.1 s
+    assert elapsed < 1.0, f"batch took {elapsed:.2f} s; sends did not follow the recovering delay"
+    starts = [when for when, _ in sender.starts]
+    assert max(b - a for a, b in zip(starts[-10:], starts[-9:])) < 0.05
+
+
+def test_sends_slow_down_after_a_deferral():
+    # No delay until the first message is deferred, then at least 0.4 s
+    throttle = AdaptiveSendThrottle(min_delay=0.0, initial_delay=0.0, deferral_floor=0.2,
+                                    backoff_factor=2.0, recovery_after=100, retry_delay=0.05)
+    messages = make_messages(5)
+    sender = StandInSender(concurrency=2, defer=[messages[0]['to_email']])
+
+    results = sender.send_batch(messages, throttle=throttle)
+
+    assert all(result['status'] == 'sent' for result in results)
+    assert results[0]['stats']['attempts'] == 2
+    deferred_at = sender.starts[0][0]
+    later = [when for when, _ in sender.starts if when > deferred_at + 0.01]
+    gaps = [b - a for a, b in zip(later, later[1:])]
+    assert gaps and min(gaps) > 0.3, f"gaps after the deferral: {[round(gap, 3) for gap in gaps]}"
+
+
+def test_backoff_does_not_hold_a_connection():
+    throttle = AdaptiveSendThrottle(min_delay=0.0, initial_delay=0.0, deferral_floor=0.0, retry_delay=1.0)
+    messages = make_messages(8)
+    sender = StandInSender(concurrency=2, defer=[messages[0]['to_email'], messages[1]['to_email']])
+    done_at = {}
+
+    def on_progress(done, total, message):
+        done_at[message['to_email']] = time.perf_counter()
+
+    start = time.perf_counter()
+    results = sender.send_batch(messages, throttle=throttle, progress_callback=on_progress)
+
+    assert all(result['status'] == 'sent' for result in results)
+    assert sender.peak <= 2
+    # The other six go out while the first two wait about a second to retry
+    assert all(done_at[message['to_email']] - start < 0.5 for message in messages[2:])
+
+
+if __name__ == "__main__":
+    failed = 0
+    for test in (test_sends_speed_up_as_the_delay_recovers, test_sends_slow_down_after_a_deferral,
+                 test_backoff_does_not_hold_a_connection):
+        try:
+            test()
+            print(f"  [PASS] {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  [FAIL] {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
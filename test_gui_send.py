@@ -0,0 +1,105 @@
+"""GUI send check: a send can start straight after the app opens
+
+Builds SalaryAutomationApp on a hidden Tk root in a scratch directory and
+starts a send before anything has loaded the email config. No mail is sent:
+the scratch directory has no pdfs folder, so the send stops at that check.
+Needs a display (or Xvfb); without one the tests are skipped.
+
+Usage:
+    python test_gui_send.py
+    python -m pytest test_gui_send.py
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tkinter as tk
+import unittest
+
+import main
+from main import SalaryAutomationApp
+
+RECORDS = [{'Name': 'Employee 00000', 'email address': 'employee00000@example.com', 'CNIC': '35202-0000000-1'}]
+
+
+class ScratchApp:
+    """A freshly constructed app running in a temporary working directory"""
+
+    def __init__(self, config=None):
+        try:
+            self.root = tk.Tk()
+        except tk.TclError as e:
+            raise unittest.SkipTest(f"No display for Tk: {str(e)}")
+        self.root.withdraw()
+        self.directory = tempfile.mkdtemp(prefix='gui_send_')
+        self.previous_dir = os.getcwd()
+        os.chdir(self.directory)
+        if config is not None:
+            with open('config.json', 'w') as f:
+                json.dump(config, f)
+        self.app = SalaryAutomationApp(self.root)
+        self.app.selected_month.set("January")
+        self.app.selected_year.set("2025")
+
+    def wait_for_jobs(self, timeout=10):
+        deadline = time.monotonic() + timeout
+        while self.app.jobs.running_kinds() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self.app.progress.drain()
+
+    def close(self):
+        try:
+            self.app.on_close()
+        finally:
+            os.chdir(self.previous_dir)
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def test_send_from_fresh_app():
+    scratch = ScratchApp({
+        'sender_email': 'payroll@example.com',
+        'sender_password': 'not-used',
+        'report_dir': 'out',
+    })
+    try:
+        assert scratch.app.email_sender.config is None
+        scratch.app._start_sending(RECORDS)
+        status, _, messages, _ = scratch.wait_for_jobs()
+
+        assert ('warning', "PDFs not found. Please generate PDFs first.") in messages, messages
+        # The run trace lands in the configured report_dir
+        assert status.startswith(f"Ready - trace saved to {os.path.join('out', 'trace_send_January_2025')}"), status
+    finally:
+        scratch.close()
+
+
+def test_send_without_email_config_shows_error():
+    errors = []
+    original = main.messagebox.showerror
+    main.messagebox.showerror = lambda title, message, **kwargs: errors.append(message)
+    scratch = ScratchApp()
+    try:
+        scratch.app._start_sending(RECORDS)
+
+        assert scratch.app.jobs.running_kinds() == []
+        assert len(errors) == 1 and "config.json" in errors[0], errors
+    finally:
+        main.messagebox.showerror = original
+        scratch.close()
+
+
+if __name__ == "__main__":
+    failed = 0
+    for test in (test_send_from_fresh_app, test_send_without_email_config_shows_error):
+        try:
+            test()
+            print(f"  [PASS] {test.__name__}")
+        except unittest.SkipTest as e:
+            print(f"  [SKIP] {test.__name__}: {e}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  [FAIL] {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)
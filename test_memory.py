@@ -0,0 +1,222 @@
+"""Memory-budget test: PDF generation and email sending over large batches
+
+Generates and sends 5,000 synthetic salary slips (emails go to a local SMTP
+stand-in, nothing leaves the machine) and fails if memory keeps growing
+after the first few hundred slips.
+
+Usage:
+    python test_memory.py            # 5,000 records
+    python test_memory.py 1000       # smaller batch
+    python -m pytest test_memory.py  # same checks, as assertions
+"""
+
+import gc
+import os
+import shutil
+import sys
+import tempfile
+import tracemalloc
+
+BATCH_SIZE = 5000
+
+# Items processed before the baseline is taken (imports, caches, first-use
+# allocations), then items run under tracemalloc. Tracing slows PDF
+# generation roughly 15x, so only this stretch is traced; the whole batch
+# is watched through RSS sampling.
+WARMUP = 100
+TRACED = 100
+SAMPLE_EVERY = 250
+
+# Allowed growth above the warmed-up baseline: retained traced memory
+# projected over the whole batch, and resident memory actually observed
+TRACED_BUDGET_MB = 8
+RSS_BUDGET_MB = 40
+
+
+def mb(value):
+    return value / (1024 * 1024)
+
+
+def current_rss_bytes():
+    """Resident set size right now (peak RSS where the current value is unavailable)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        from metrics_export import peak_rss_bytes
+        return peak_rss_bytes()
+
+
+def run_with_budget(name, count, step):
+    """
+    Call step(i) for i in range(count) and check memory stays within budget
+
+    Returns:
+        True if projected traced growth and observed RSS growth after warm-up
+        both stayed within budget
+    """
+    warmup = min(WARMUP, max(1, count // 10))
+    traced_end = min(count, warmup + TRACED)
+
+    for i in range(warmup):
+        step(i)
+    baseline_rss = current_rss_bytes()
+    max_rss = baseline_rss
+
+    # Retained memory per item over the traced stretch. PyPDF2 objects form
+    # reference cycles, so collect first to count only what is really kept
+    tracemalloc.start()
+    try:
+        gc.collect()
+        traced_start = tracemalloc.get_traced_memory()[0]
+        for i in range(warmup, traced_end):
+            step(i)
+        traced_peak = tracemalloc.get_traced_memory()[1]
+        gc.collect()
+        traced_current = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+    traced_items = max(1, traced_end - warmup)
+    per_item = (traced_current - traced_start) / traced_items
+    projected = mb(max(0.0, per_item) * count)
+    print(f"     Traced {traced_items} {name}: retained {mb(traced_current - traced_start):.3f} MB, "
+          f"peak {mb(traced_peak - traced_start):.2f} MB above start")
+
+    # Resident memory over the whole batch
+    for i in range(traced_end, count):
+        step(i)
+        if (i + 1) % SAMPLE_EVERY == 0 or i + 1 == count:
+            rss = current_rss_bytes()
+            if rss is not None:
+                max_rss = max(max_rss, rss)
+                print(f"     {i + 1:>6} {name}: RSS {mb(rss):7.1f} MB")
+
+    print(f"     Projected retained growth over {count} {name}: {projected:.2f} MB (budget {TRACED_BUDGET_MB} MB)")
+    passed = projected <= TRACED_BUDGET_MB
+    if baseline_rss is not None:
+        rss_growth = mb(max_rss - baseline_rss)
+        print(f"     RSS growth after warm-up: {rss_growth:.2f} MB (budget {RSS_BUDGET_MB} MB)")
+        passed = passed and rss_growth <= RSS_BUDGET_MB
+    return passed
+
+
+def check_pdf_memory(count=BATCH_SIZE):
+    """Generate `count` slips and check memory stays flat; returns True if within budget"""
+    print("\n" + "=" * 50)
+    print(f"Testing PDF Generator memory ({count} slips)...")
+    print("=" * 50)
+
+    work_dir = tempfile.mkdtemp(prefix='memory_pdf_')
+    try:
+        from pdf_generator import PDFGenerator
+        from bench_pdf import make_records, make_letterhead
+
+        generator = PDFGenerator(None)
+        generator.set_company_info("Test Company", "Test App")
+        if not os.path.exists(generator.letter_head_path):
+            generator.letter_head_path = make_letterhead(work_dir)
+            print("[OK] Using a blank stand-in letter head")
+
+        records = make_records(count)
+
+        def step(i):
+            pdf_path = generator.create_pdf(records[i], "Test Month 2025", work_dir)
+            # Only memory matters here; do not fill the disk
+            os.remove(pdf_path)
+
+        passed = run_with_budget("slips", count, step)
+        print("[OK] PDF memory within budget" if passed else "[ERROR] PDF memory grew beyond budget")
+        return passed
+    except Exception as e:
+        print(f"[ERROR] PDF memory test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def check_email_memory(count=BATCH_SIZE):
+    """
+    Send `count` emails with attachments to a local SMTP stand-in and check
+    memory stays flat; returns True if within budget
+    """
+    print("\n" + "=" * 50)
+    print(f"Testing Email Sender memory ({count} messages)...")
+    print("=" * 50)
+
+    work_dir = tempfile.mkdtemp(prefix='memory_email_')
+    try:
+        from bench_smtp import LocalSMTPServer, make_synthetic_slips
+        from email_sender import EmailSender
+
+        with LocalSMTPServer() as server:
+            sender = EmailSender(server.write_config(work_dir))
+            messages = make_synthetic_slips(work_dir, count, 140)
+            print(f"[OK] Local SMTP stand-in on {server.host}:{server.port}")
+
+            def step(i):
+                sender.send_email(**messages[i])
+
+            passed = run_with_budget("emails", count, step)
+            delivered = server.handler.received
+
+        if delivered != count:
+            print(f"[ERROR] Stand-in received {delivered} of {count} messages")
+            passed = False
+        print("[OK] Email memory within budget" if passed else "[ERROR] Email memory grew beyond budget")
+        return passed
+    except Exception as e:
+        print(f"[ERROR] Email memory test failed: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_pdf_memory():
+    assert check_pdf_memory(), "PDF generation memory grew beyond budget"
+
+
+def test_email_memory():
+    assert check_email_memory(), "Email sending memory grew beyond budget"
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else BATCH_SIZE
+
+    print("\n" + "=" * 60)
+    print("   SALARY AUTOMATION - MEMORY BUDGET TEST")
+    print("=" * 60)
+
+    results = {
+        'PDF Generator': check_pdf_memory(count),
+        'Email Sender': check_email_memory(count)
+    }
+
+    print("\n" + "=" * 60)
+    print("   TEST SUMMARY")
+    print("=" * 60)
+
+    all_passed = True
+    for test_name, passed in results.items():
+        status = "[PASS]" if passed else "[FAIL]"
+        print(f"  {status} {test_name}")
+        if not passed:
+            all_passed = False
+
+    print("=" * 60)
+
+    if all_passed:
+        print("\nMemory stayed within budget for both batches.")
+    else:
+        print("\nMemory grew beyond budget. Profile with SALARY_PROFILE=memory to find the leak.")
+
+    sys.exit(0 if all_passed else 1)
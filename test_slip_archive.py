@@ -0,0 +1,97 @@
+"""Slip archive check: several runs archiving the same month at once
+
+Starts processes that add the same slips to one archive at the same time
+(as overlapping payroll runs for a company would), each in a different
+order, and checks that none fails, each slip is recorded once and every
+slip reads back intact. The slips are random bytes standing in for PDFs.
+
+Usage:
+    python test_slip_archive.py
+    python -m pytest test_slip_archive.py
+"""
+
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import traceback
+
+from slip_archive import SlipArchive
+
+MONTH = "January 2025"
+SLIPS = 100
+WRITERS = 4
+
+
+def make_slips(directory):
+    """Slip files and records; every fifth employee shares a slip's bytes with the one before"""
+    slips = []
+    data = b''
+    for i in range(SLIPS):
+        if i % 5 or not data:
+            data = b'%PDF-1.4\n' + os.urandom(32 * 1024)
+        path = os.path.join(directory, f"slip_{i:03d}.pdf")
+        with open(path, 'wb') as f:
+            f.write(data)
+        record = {'Name': f"Employee {i:05d}", 'CNIC': f"35202-{i:07d}-1",
+                  'email address': f"employee{i:05d}@example.com"}
+        slips.append((path, record, data))
+    return slips
+
+
+def add_all(archive_dir, slips, seed, start, results):
+    try:
+        slips = list(slips)
+        random.Random(seed).shuffle(slips)
+        counts = {'new': 0, 'reissue': 0, 'unchanged': 0}
+        with SlipArchive(archive_dir) as archive:
+            start.wait()
+            for path, record, _ in slips:
+                counts[archive.add(path, MONTH, record)] += 1
+        results.put(counts)
+    except Exception:
+        results.put(traceback.format_exc())
+
+
+def test_parallel_writers():
+    work_dir = tempfile.mkdtemp(prefix='slip_archive_')
+    try:
+        archive_dir = os.path.join(work_dir, 'archive')
+        slips = make_slips(work_dir)
+        SlipArchive(archive_dir).close()
+
+        start = multiprocessing.Barrier(WRITERS)
+        results = multiprocessing.Queue()
+        writers = [multiprocessing.Process(target=add_all, args=(archive_dir, slips, seed, start, results))
+                   for seed in range(WRITERS)]
+        for writer in writers:
+            writer.start()
+        outcomes = [results.get(timeout=120) for _ in writers]
+        for writer in writers:
+            writer.join()
+
+        errors = [outcome for outcome in outcomes if not isinstance(outcome, dict)]
+        assert not errors, errors[0]
+        assert sum(outcome['new'] for outcome in outcomes) == SLIPS
+        assert sum(outcome['unchanged'] for outcome in outcomes) == SLIPS * (WRITERS - 1)
+
+        with SlipArchive(archive_dir) as archive:
+            assert len(archive.list(month=MONTH, all_versions=True)) == SLIPS
+            for _, record, data in slips:
+                assert archive.get(MONTH, record['CNIC'])[0] == data
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    failed = 0
+    for test in (test_parallel_writers,):
+        try:
+            test()
+            print(f"  [PASS] {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"  [FAIL] {test.__name__}: {e}")
+    sys.exit(1 if failed else 0)